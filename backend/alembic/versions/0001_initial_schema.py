@@ -0,0 +1,220 @@
+"""初始表结构
+
+与此前 Base.metadata.create_all 创建的表结构一致。
+已由 create_all 建好表的数据库执行本迁移时会跳过已存在的表。
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-16 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_tables() -> set:
+    """已存在的表（离线生成 SQL 时视为空库）"""
+    if context.is_offline_mode():
+        return set()
+    return set(sa.inspect(op.get_bind()).get_table_names())
+
+
+def upgrade() -> None:
+    existing = _existing_tables()
+
+    if 'users' not in existing:
+        op.create_table(
+            'users',
+            sa.Column('id', sa.Integer(), nullable=False, comment='用户ID'),
+            sa.Column('username', sa.String(length=50), nullable=False, comment='用户名'),
+            sa.Column('email', sa.String(length=100), nullable=False, comment='邮箱'),
+            sa.Column('hashed_password', sa.String(length=255), nullable=False, comment='密码哈希'),
+            sa.Column('full_name', sa.String(length=100), nullable=True, comment='真实姓名'),
+            sa.Column('role', sa.Enum('ADMIN', 'RESEARCHER', name='userrole'), nullable=True, comment='用户角色'),
+            sa.Column('is_active', sa.Boolean(), nullable=True, comment='是否激活'),
+            sa.Column('is_verified', sa.Boolean(), nullable=True, comment='是否验证'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.Column('last_login', sa.DateTime(timezone=True), nullable=True, comment='最后登录时间'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_users_id', 'users', ['id'])
+        op.create_index('ix_users_username', 'users', ['username'], unique=True)
+        op.create_index('ix_users_email', 'users', ['email'], unique=True)
+
+    if 'tag_categories' not in existing:
+        op.create_table(
+            'tag_categories',
+            sa.Column('id', sa.Integer(), nullable=False, comment='分类ID'),
+            sa.Column('name', sa.String(length=50), nullable=False, comment='分类名称'),
+            sa.Column('type', sa.Enum('THEME', 'CONTENT', 'ANALYSIS', name='tagcategorytype'), nullable=False, comment='分类类型'),
+            sa.Column('description', sa.Text(), nullable=True, comment='分类描述'),
+            sa.Column('color', sa.String(length=7), nullable=True, comment='分类颜色 (HEX)'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_tag_categories_id', 'tag_categories', ['id'])
+
+    if 'fields' not in existing:
+        op.create_table(
+            'fields',
+            sa.Column('id', sa.Integer(), nullable=False, comment='场域ID'),
+            sa.Column('region', sa.String(length=100), nullable=False, comment='区域 (省/市/区县)'),
+            sa.Column('location', sa.String(length=200), nullable=False, comment='具体地点'),
+            sa.Column('sub_field', sa.String(length=200), nullable=True, comment='子场域'),
+            sa.Column('latitude', sa.Float(), nullable=True, comment='纬度'),
+            sa.Column('longitude', sa.Float(), nullable=True, comment='经度'),
+            sa.Column('address', sa.Text(), nullable=True, comment='详细地址'),
+            sa.Column('description', sa.JSON(), nullable=True, comment='描述信息'),
+            sa.Column('time_attributes', sa.JSON(), nullable=True, comment='时间属性'),
+            sa.Column('created_by', sa.Integer(), nullable=False, comment='创建者ID'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_fields_id', 'fields', ['id'])
+
+    if 'participants' not in existing:
+        op.create_table(
+            'participants',
+            sa.Column('id', sa.Integer(), nullable=False, comment='参与者ID'),
+            sa.Column('name_or_code', sa.String(length=100), nullable=False, comment='姓名或代号'),
+            sa.Column('gender', sa.String(length=20), nullable=True, comment='性别'),
+            sa.Column('age_range', sa.String(length=20), nullable=True, comment='年龄段'),
+            sa.Column('occupation', sa.String(length=100), nullable=True, comment='职业/身份'),
+            sa.Column('education', sa.String(length=50), nullable=True, comment='教育背景'),
+            sa.Column('contact_info', sa.JSON(), nullable=True, comment='联系信息'),
+            sa.Column('social_attributes', sa.JSON(), nullable=True, comment='社会属性'),
+            sa.Column('research_related', sa.JSON(), nullable=True, comment='研究相关信息'),
+            sa.Column('is_anonymous', sa.Boolean(), nullable=True, comment='是否匿名化'),
+            sa.Column('data_sensitivity', sa.String(length=20), nullable=True, comment='数据敏感级别'),
+            sa.Column('notes', sa.Text(), nullable=True, comment='备注信息'),
+            sa.Column('created_by', sa.Integer(), nullable=False, comment='创建者ID'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_participants_id', 'participants', ['id'])
+
+    if 'tags' not in existing:
+        op.create_table(
+            'tags',
+            sa.Column('id', sa.Integer(), nullable=False, comment='标签ID'),
+            sa.Column('name', sa.String(length=50), nullable=False, comment='标签名称'),
+            sa.Column('description', sa.Text(), nullable=True, comment='标签描述'),
+            sa.Column('category_id', sa.Integer(), nullable=False, comment='分类ID'),
+            sa.Column('created_by', sa.Integer(), nullable=False, comment='创建者ID'),
+            sa.Column('usage_count', sa.Integer(), nullable=True, comment='使用次数'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.ForeignKeyConstraint(['category_id'], ['tag_categories.id']),
+            sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_tags_id', 'tags', ['id'])
+
+    if 'records' not in existing:
+        op.create_table(
+            'records',
+            sa.Column('id', sa.Integer(), nullable=False, comment='记录ID'),
+            sa.Column('title', sa.String(length=200), nullable=False, comment='记录标题'),
+            sa.Column('type', sa.Enum('FIELD_NOTE', 'INTERVIEW', 'OBSERVATION', 'OTHER', name='recordtype'), nullable=False, comment='记录类型'),
+            sa.Column('record_date', sa.DateTime(timezone=True), nullable=False, comment='记录日期'),
+            sa.Column('time_range', sa.String(length=50), nullable=True, comment='时间段'),
+            sa.Column('duration', sa.Integer(), nullable=True, comment='持续时间(分钟)'),
+            sa.Column('field_id', sa.Integer(), nullable=True, comment='场域ID'),
+            sa.Column('specific_location', sa.Text(), nullable=True, comment='具体位置描述'),
+            sa.Column('content', sa.JSON(), nullable=False, comment='记录内容'),
+            sa.Column('status', sa.Enum('DRAFT', 'COMPLETED', 'ARCHIVED', name='recordstatus'), nullable=True, comment='记录状态'),
+            sa.Column('version', sa.Integer(), nullable=True, comment='版本号'),
+            sa.Column('created_by', sa.Integer(), nullable=False, comment='创建者ID'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.ForeignKeyConstraint(['field_id'], ['fields.id']),
+            sa.ForeignKeyConstraint(['created_by'], ['users.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_records_id', 'records', ['id'])
+
+    if 'record_images' not in existing:
+        op.create_table(
+            'record_images',
+            sa.Column('id', sa.Integer(), nullable=False, comment='图片ID'),
+            sa.Column('record_id', sa.Integer(), nullable=False, comment='记录ID'),
+            sa.Column('filename', sa.String(length=255), nullable=False, comment='文件名'),
+            sa.Column('original_filename', sa.String(length=255), nullable=False, comment='原始文件名'),
+            sa.Column('file_path', sa.String(length=500), nullable=False, comment='文件路径'),
+            sa.Column('thumbnail_path', sa.String(length=500), nullable=True, comment='缩略图路径'),
+            sa.Column('file_size', sa.Integer(), nullable=False, comment='文件大小(字节)'),
+            sa.Column('mime_type', sa.String(length=100), nullable=False, comment='MIME类型'),
+            sa.Column('description', sa.Text(), nullable=True, comment='图片描述'),
+            sa.Column('sort_order', sa.Integer(), nullable=True, comment='排序顺序'),
+            sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+            sa.ForeignKeyConstraint(['record_id'], ['records.id']),
+            sa.PrimaryKeyConstraint('id'),
+        )
+        op.create_index('ix_record_images_id', 'record_images', ['id'])
+
+    if 'record_participants' not in existing:
+        op.create_table(
+            'record_participants',
+            sa.Column('record_id', sa.Integer(), nullable=False),
+            sa.Column('participant_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['record_id'], ['records.id']),
+            sa.ForeignKeyConstraint(['participant_id'], ['participants.id']),
+            sa.PrimaryKeyConstraint('record_id', 'participant_id'),
+        )
+
+    if 'record_tags' not in existing:
+        op.create_table(
+            'record_tags',
+            sa.Column('record_id', sa.Integer(), nullable=False),
+            sa.Column('tag_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['record_id'], ['records.id']),
+            sa.ForeignKeyConstraint(['tag_id'], ['tags.id']),
+            sa.PrimaryKeyConstraint('record_id', 'tag_id'),
+        )
+
+    if 'record_search_index' not in existing:
+        op.create_table(
+            'record_search_index',
+            sa.Column('record_id', sa.Integer(), nullable=False, comment='记录ID'),
+            sa.Column('title', sa.String(length=200), nullable=False, comment='记录标题'),
+            sa.Column('body', sa.Text().with_variant(mysql.LONGTEXT(), 'mysql'), nullable=False, comment='记录内容全文'),
+            sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+            sa.ForeignKeyConstraint(['record_id'], ['records.id'], ondelete='CASCADE'),
+            sa.PrimaryKeyConstraint('record_id'),
+        )
+        if op.get_context().dialect.name == 'mysql':
+            # ngram 解析器会丢弃包含停用词的词元，建索引前关闭停用词表
+            op.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+        op.create_index(
+            'ft_record_search_title_body', 'record_search_index', ['title', 'body'],
+            mysql_prefix='FULLTEXT', mysql_with_parser='ngram'
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('record_search_index')
+    op.drop_table('record_tags')
+    op.drop_table('record_participants')
+    op.drop_table('record_images')
+    op.drop_table('records')
+    op.drop_table('tags')
+    op.drop_table('participants')
+    op.drop_table('fields')
+    op.drop_table('tag_categories')
+    op.drop_table('users')
@@ -0,0 +1,83 @@
+"""热点查询索引
+
+为各接口的访问模式补充组合索引：
+- 数据隔离 + 排序：(created_by, record_date)、(created_by, created_at)
+- 多对多反向查询：record_participants.participant_id、record_tags.tag_id
+- 标签分类内查重/筛选：(category_id, name)
+
+在线变更：MySQL 下使用 ALTER TABLE ... ALGORITHM=INPLACE, LOCK=NONE 建索引，
+建索引期间表仍可读写，不会锁住大表 records。
+如需借助 gh-ost / pt-online-schema-change 执行，可通过 `alembic upgrade 0001:0002 --sql`
+导出 SQL 后交由工具执行，再 `alembic stamp 0002`。
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 10:00:00
+
+"""
+from typing import List, Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# (索引名, 表名, 列)
+INDEXES = [
+    ('ix_records_created_by_record_date', 'records', ['created_by', 'record_date']),
+    ('ix_records_created_by_created_at', 'records', ['created_by', 'created_at']),
+    ('ix_records_record_date', 'records', ['record_date']),
+    ('ix_records_field_id_record_date', 'records', ['field_id', 'record_date']),
+    ('ix_participants_created_by_created_at', 'participants', ['created_by', 'created_at']),
+    ('ix_fields_created_by_created_at', 'fields', ['created_by', 'created_at']),
+    ('ix_tags_created_by_created_at', 'tags', ['created_by', 'created_at']),
+    ('ix_tags_created_at', 'tags', ['created_at']),
+    ('ix_tags_category_id_name', 'tags', ['category_id', 'name']),
+    ('ix_record_participants_participant_id', 'record_participants', ['participant_id', 'record_id']),
+    ('ix_record_tags_tag_id', 'record_tags', ['tag_id', 'record_id']),
+    ('ix_record_images_record_id_sort_order', 'record_images', ['record_id', 'sort_order']),
+]
+
+
+def _index_exists(table: str, name: str) -> bool:
+    """索引是否已存在（离线生成 SQL 时视为不存在）"""
+    if context.is_offline_mode():
+        return False
+    return any(index['name'] == name for index in sa.inspect(op.get_bind()).get_indexes(table))
+
+
+def create_index_online(name: str, table: str, columns: List[str]) -> None:
+    """在线创建索引：MySQL 下不加锁，其他数据库使用普通建索引语句"""
+    if _index_exists(table, name):
+        return
+    if op.get_context().dialect.name == 'mysql':
+        column_list = ', '.join(f'`{column}`' for column in columns)
+        op.execute(
+            f'ALTER TABLE `{table}` ADD INDEX `{name}` ({column_list}), ALGORITHM=INPLACE, LOCK=NONE'
+        )
+    else:
+        op.create_index(name, table, columns)
+
+
+def drop_index_online(name: str, table: str) -> None:
+    """在线删除索引"""
+    if op.get_context().dialect.name == 'mysql':
+        op.execute(f'ALTER TABLE `{table}` DROP INDEX `{name}`, ALGORITHM=INPLACE, LOCK=NONE')
+    else:
+        op.drop_index(name, table_name=table)
+
+
+def upgrade() -> None:
+    for name, table, columns in INDEXES:
+        create_index_online(name, table, columns)
+
+
+def downgrade() -> None:
+    for name, table, _ in reversed(INDEXES):
+        drop_index_online(name, table)
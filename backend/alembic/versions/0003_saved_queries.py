@@ -0,0 +1,58 @@
+"""保存的查询
+
+新增 saved_queries（保存的筛选条件）与 saved_query_records（命中记录缓存）。
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'saved_queries',
+        sa.Column('id', sa.Integer(), nullable=False, comment='查询ID'),
+        sa.Column('name', sa.String(length=100), nullable=False, comment='查询名称'),
+        sa.Column('description', sa.Text(), nullable=True, comment='查询描述'),
+        sa.Column('filters', sa.JSON(), nullable=False, comment='筛选条件'),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='所属用户ID'),
+        sa.Column('is_stale', sa.Boolean(), nullable=False, comment='结果缓存是否需要重建'),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), nullable=True, comment='结果缓存重建时间'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='更新时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_saved_queries_id', 'saved_queries', ['id'])
+    op.create_index('ix_saved_queries_user_id_created_at', 'saved_queries', ['user_id', 'created_at'])
+
+    op.create_table(
+        'saved_query_records',
+        sa.Column('saved_query_id', sa.Integer(), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('record_date', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['saved_query_id'], ['saved_queries.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['record_id'], ['records.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('saved_query_id', 'record_id'),
+    )
+    op.create_index(
+        'ix_saved_query_records_query_date', 'saved_query_records', ['saved_query_id', 'record_date', 'record_id']
+    )
+    op.create_index('ix_saved_query_records_record_id', 'saved_query_records', ['record_id'])
+
+
+def downgrade() -> None:
+    op.drop_table('saved_query_records')
+    op.drop_table('saved_queries')
@@ -0,0 +1,33 @@
+"""记录图片内容摘要
+
+record_images 新增 content_hash（上传时流式计算的 SHA-256），用于校验与按内容查找图片。
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 12:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'record_images',
+        sa.Column('content_hash', sa.String(length=64), nullable=True, comment='文件内容SHA-256摘要')
+    )
+    op.create_index('ix_record_images_content_hash', 'record_images', ['content_hash'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_record_images_content_hash', table_name='record_images')
+    op.drop_column('record_images', 'content_hash')
@@ -0,0 +1,32 @@
+"""记录图片衍生图
+
+record_images 新增 medium_path（中等尺寸预览图）；thumbnail_path 已存在，此前一直为空。
+已有图片执行 `python scripts/generate_image_variants.py` 补生成衍生图。
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'record_images',
+        sa.Column('medium_path', sa.String(length=500), nullable=True, comment='中等尺寸图路径')
+    )
+
+
+def downgrade() -> None:
+    op.drop_column('record_images', 'medium_path')
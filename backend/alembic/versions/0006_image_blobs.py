@@ -0,0 +1,39 @@
+"""图片内容寻址存储
+
+新增 image_blobs：按 SHA-256 摘要保存图片内容，内容相同的图片共用文件与衍生图，
+ref_count 为引用数。已有图片执行 `python scripts/migrate_image_blobs.py` 迁入。
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 11:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'image_blobs',
+        sa.Column('content_hash', sa.String(length=64), nullable=False, comment='文件内容SHA-256摘要'),
+        sa.Column('file_path', sa.String(length=500), nullable=False, comment='文件路径'),
+        sa.Column('thumbnail_path', sa.String(length=500), nullable=True, comment='缩略图路径'),
+        sa.Column('medium_path', sa.String(length=500), nullable=True, comment='中等尺寸图路径'),
+        sa.Column('file_size', sa.Integer(), nullable=False, comment='文件大小(字节)'),
+        sa.Column('ref_count', sa.Integer(), nullable=False, comment='引用该内容的图片数'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+        sa.PrimaryKeyConstraint('content_hash'),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('image_blobs')
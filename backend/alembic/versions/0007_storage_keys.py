@@ -0,0 +1,66 @@
+"""图片路径改为存储键
+
+record_images、image_blobs 的 file_path / thumbnail_path / medium_path 由相对工作目录的路径
+（如 uploads/blobs/40/de/...jpg）改为相对存储根的存储键（如 blobs/40/de/...jpg），
+本地存储时存储根为 UPLOAD_DIR，对象存储时为桶（及 S3_PREFIX）。
+Windows 上写入的路径（如 uploads\\records\\...jpg）先将反斜杠统一为 /，存储键始终使用 /。
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 16:00:00
+
+"""
+from pathlib import PurePosixPath
+from typing import List, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PATH_COLUMNS = ('file_path', 'thumbnail_path', 'medium_path')
+TABLES = ('record_images', 'image_blobs')
+
+
+def upload_prefixes() -> List[str]:
+    """历史路径的前缀：UPLOAD_DIR，以及早期写死的 uploads 目录"""
+    prefixes = [PurePosixPath(settings.UPLOAD_DIR.replace('\\', '/')).as_posix().rstrip('/') + '/', 'uploads/']
+    return list(dict.fromkeys(prefix for prefix in prefixes if prefix not in ('./', '/')))
+
+
+def upgrade() -> None:
+    for table_name in TABLES:
+        table = sa.table(table_name, *(sa.column(column, sa.String) for column in PATH_COLUMNS))
+        for column_name in PATH_COLUMNS:
+            column = table.c[column_name]
+            op.execute(
+                table.update()
+                .where(column.contains('\\', autoescape=True))
+                .values({column_name: sa.func.replace(column, '\\', '/')})
+            )
+            for prefix in upload_prefixes():
+                op.execute(
+                    table.update()
+                    .where(column.like(f'{prefix}%'))
+                    .values({column_name: sa.func.substr(column, len(prefix) + 1)})
+                )
+
+
+def downgrade() -> None:
+    prefix = upload_prefixes()[0]
+    for table_name in TABLES:
+        table = sa.table(table_name, *(sa.column(column, sa.String) for column in PATH_COLUMNS))
+        for column_name in PATH_COLUMNS:
+            column = table.c[column_name]
+            op.execute(
+                table.update()
+                .where(column.isnot(None))
+                .values({column_name: sa.literal(prefix) + column})
+            )
@@ -0,0 +1,58 @@
+"""后台导出任务
+
+新增 export_jobs：导出任务的状态、进度与导出文件，相同内容且数据未变化时复用已完成的导出文件。
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 20:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'export_jobs',
+        sa.Column('id', sa.Integer(), nullable=False, comment='任务ID'),
+        sa.Column('user_id', sa.Integer(), nullable=False, comment='提交用户ID'),
+        sa.Column('format', sa.String(length=20), nullable=False, comment='导出格式'),
+        sa.Column('record_ids', sa.JSON(), nullable=True, comment='指定导出的记录ID列表，为空导出全部'),
+        sa.Column('fingerprint', sa.String(length=64), nullable=False, comment='内容标识（用户、格式、记录范围的摘要）'),
+        sa.Column('data_version', sa.String(length=64), nullable=False, comment='提交时的数据版本（导出范围内数据的聚合摘要）'),
+        sa.Column(
+            'status',
+            sa.Enum('PENDING', 'RUNNING', 'COMPLETED', 'FAILED', name='exportjobstatus'),
+            nullable=False,
+            comment='任务状态'
+        ),
+        sa.Column('processed_count', sa.Integer(), nullable=False, comment='已处理记录数'),
+        sa.Column('total_count', sa.Integer(), nullable=False, comment='记录总数'),
+        sa.Column('error', sa.Text(), nullable=True, comment='失败原因'),
+        sa.Column('file_key', sa.String(length=500), nullable=True, comment='导出文件存储键'),
+        sa.Column('file_size', sa.Integer(), nullable=True, comment='导出文件大小(字节)'),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True, comment='创建时间'),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True, comment='开始时间'),
+        sa.Column('progress_at', sa.DateTime(timezone=True), nullable=True, comment='最近一次进度更新时间'),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True, comment='完成时间'),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id']),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_export_jobs_id', 'export_jobs', ['id'])
+    op.create_index('ix_export_jobs_fingerprint_version', 'export_jobs', ['fingerprint', 'data_version'])
+    op.create_index('ix_export_jobs_user_id_created_at', 'export_jobs', ['user_id', 'created_at'])
+    op.create_index('ix_export_jobs_status', 'export_jobs', ['status'])
+    op.create_index('ix_export_jobs_finished_at', 'export_jobs', ['finished_at'])
+
+
+def downgrade() -> None:
+    op.drop_table('export_jobs')
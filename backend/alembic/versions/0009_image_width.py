@@ -0,0 +1,35 @@
+"""图片原图宽度
+
+image_blobs 与 record_images 新增 width（按 EXIF 方向旋转后的原图宽度），
+按需缩放时请求宽度超过原图宽度的请求共用同一个缓存文件。
+宽度在生成衍生图时写入；已有图片执行 `python scripts/generate_image_variants.py` 补写。
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18 09:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    for table in ('image_blobs', 'record_images'):
+        op.add_column(
+            table,
+            sa.Column('width', sa.Integer(), nullable=True, comment='原图宽度(像素，按EXIF方向)，生成衍生图时写入')
+        )
+
+
+def downgrade() -> None:
+    for table in ('record_images', 'image_blobs'):
+        op.drop_column(table, 'width')
@@ -0,0 +1,53 @@
+"""全文检索索引按单字切分
+
+SEARCH_NGRAM_TOKEN_SIZE 默认改为 1：MySQL 需在配置文件中设置 ngram_token_size=1 并重启
+（该参数只能在启动时设置），之后本迁移重建 record_search_index 的全文索引，
+单字检索词不再退化为全表子串匹配。仍使用其他词元长度时需同时设置 SEARCH_NGRAM_TOKEN_SIZE。
+
+Revision ID: 0010
+Revises: 0009
+Create Date: 2026-10-18 10:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import context, op
+
+from app.core.config import settings
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0010'
+down_revision: Union[str, None] = '0009'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def rebuild_fulltext_index() -> None:
+    """按服务器当前的 ngram_token_size 重建全文索引"""
+    if op.get_context().dialect.name != 'mysql':
+        return
+
+    if not context.is_offline_mode():
+        token_size = op.get_bind().exec_driver_sql('SELECT @@ngram_token_size').scalar()
+        if token_size != settings.SEARCH_NGRAM_TOKEN_SIZE:
+            raise RuntimeError(
+                f"MySQL ngram_token_size={token_size} 与 SEARCH_NGRAM_TOKEN_SIZE={settings.SEARCH_NGRAM_TOKEN_SIZE} 不一致，"
+                f"请修改 MySQL 配置并重启，或设置 SEARCH_NGRAM_TOKEN_SIZE={token_size}"
+            )
+
+    # ngram 解析器会丢弃包含停用词的词元，建索引前关闭停用词表
+    op.execute('SET SESSION innodb_ft_enable_stopword = OFF')
+    op.drop_index('ft_record_search_title_body', table_name='record_search_index')
+    op.create_index(
+        'ft_record_search_title_body', 'record_search_index', ['title', 'body'],
+        mysql_prefix='FULLTEXT', mysql_with_parser='ngram'
+    )
+
+
+def upgrade() -> None:
+    rebuild_fulltext_index()
+
+
+def downgrade() -> None:
+    rebuild_fulltext_index()
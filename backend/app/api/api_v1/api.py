@@ -3,7 +3,7 @@ API v1 路由汇总
 """
 from fastapi import APIRouter
 
-from .endpoints import auth, users, participants, fields, tags, records, stats, export
+from .endpoints import auth, users, participants, fields, tags, records, saved_queries, stats, export
 
 api_router = APIRouter()
 
@@ -14,5 +14,6 @@ api_router.include_router(participants.router, prefix="/participants", tags=["
 api_router.include_router(fields.router, prefix="/fields", tags=["场域管理"])
 api_router.include_router(tags.router, prefix="/tags", tags=["标签管理"])
 api_router.include_router(records.router, prefix="/records", tags=["记录管理"])
+api_router.include_router(saved_queries.router, prefix="/saved-queries", tags=["保存的查询"])
 api_router.include_router(stats.router, prefix="/stats", tags=["统计数据"])
 api_router.include_router(export.router, prefix="/export", tags=["数据导出"])
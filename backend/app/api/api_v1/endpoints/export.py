@@ -1,141 +1,141 @@
 """
 数据导出API
+- /records/{格式}：在请求中直接导出，边查询边发送
+- /jobs：后台导出任务，适合大批量导出；提交后轮询进度，完成后下载（支持断点续传），
+  数据未变化时复用之前的导出文件
 """
-import io
-import json
+import os
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, timezone
 from urllib.parse import quote
-from fastapi import APIRouter, Depends, HTTPException, Query
-from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
-from app.models.user import User, UserRole
-from app.models.record import Record, RecordType, RecordStatus
-from app.models.participant import Participant
-from app.models.tag import Tag
+from app.core.query_budget import query_budget
+from app.models.user import User
+from app.models.record import Record
+from app.models.export_job import ExportJob, ExportJobStatus
+from app.schemas.export_job import ExportJobCreate, ExportJobResponse
+from app.services.export_jobs import submit_export_job
+from app.services.file_delivery import ClosingStreamingResponse, content_etag, storage_response
+from app.services.storage import get_export_storage
+from app.services.record_export import (
+    EXPORT_FORMATS,
+    csv_export_stream,
+    export_owner_id,
+    json_export_stream,
+    markdown_export_stream,
+    record_conditions,
+    stream_export_file,
+    temp_export_path,
+    write_export_file,
+    zip_export_stream,
+)
 from app.api.api_v1.endpoints.auth import get_current_active_user
 
 router = APIRouter()
 
+# 任务列表返回的最近任务数
+RECENT_EXPORT_JOBS = 20
 
-def get_type_label(type_value: str) -> str:
-    """获取类型中文标签"""
-    labels = {
-        'field_note': '田野笔记',
-        'interview': '访谈记录',
-        'observation': '观察记录',
-        'other': '其他'
-    }
-    return labels.get(type_value, type_value)
-
-
-def get_status_label(status_value: str) -> str:
-    """获取状态中文标签"""
-    labels = {
-        'draft': '草稿',
-        'completed': '已完成',
-        'archived': '已归档'
-    }
-    return labels.get(status_value, status_value)
-
-
-def format_record_for_export(record: Record) -> dict:
-    """格式化记录用于导出"""
-    # 场域信息
-    field_info = ""
-    if record.field:
-        parts = [record.field.region, record.field.location]
-        if record.field.sub_field:
-            parts.append(record.field.sub_field)
-        field_info = " - ".join(parts)
-    if record.specific_location:
-        field_info = f"{field_info} ({record.specific_location})" if field_info else record.specific_location
-
-    # 参与者
-    participants = ", ".join([p.name_or_code for p in record.participants]) if record.participants else ""
-
-    # 标签
-    tags = ", ".join([t.name for t in record.tags]) if record.tags else ""
-
-    # 内容
-    content = record.content or {}
-    content_text = ""
-    if isinstance(content, dict):
-        if content.get('description'):
-            content_text += f"描述：{content['description']}\n"
-        if content.get('reflection'):
-            content_text += f"反思：{content['reflection']}\n"
-        if content.get('notes'):
-            content_text += f"备注：{content['notes']}\n"
-    content_text = content_text.strip() or str(content)
-
-    return {
-        'id': record.id,
-        'title': record.title,
-        'type': get_type_label(record.type.value),
-        'type_value': record.type.value,
-        'record_date': record.record_date.strftime('%Y-%m-%d %H:%M') if record.record_date else '',
-        'time_range': record.time_range or '',
-        'duration': record.duration or 0,
-        'field': field_info,
-        'participants': participants,
-        'tags': tags,
-        'content': content_text,
-        'content_raw': content,
-        'status': get_status_label(record.status.value),
-        'status_value': record.status.value,
-        'created_at': record.created_at.strftime('%Y-%m-%d %H:%M') if record.created_at else '',
-        'updated_at': record.updated_at.strftime('%Y-%m-%d %H:%M') if record.updated_at else '',
-    }
-
-
-@router.get("/records/json", summary="导出记录为JSON")
+
+def parse_record_ids(record_ids: Optional[str]) -> Optional[List[int]]:
+    """解析逗号分隔的记录ID列表，为空返回 None（导出全部）"""
+    if not record_ids:
+        return None
+    try:
+        return [int(id.strip()) for id in record_ids.split(',') if id.strip()]
+    except ValueError:
+        raise HTTPException(status_code=400, detail="无效的记录ID格式")
+
+
+def export_conditions(record_ids: Optional[str], current_user: User) -> list:
+    """导出记录的筛选条件：数据隔离 + 指定的记录ID列表"""
+    return record_conditions(parse_record_ids(record_ids), export_owner_id(current_user))
+
+
+async def ensure_export_records(db: AsyncSession, conditions: list) -> None:
+    """没有符合条件的记录时返回 404（流式导出在开始发送前检查）"""
+    if await db.scalar(select(Record.id).where(*conditions).limit(1)) is None:
+        raise HTTPException(status_code=404, detail="没有找到可导出的记录")
+
+
+def export_job_response(job: ExportJob) -> ExportJobResponse:
+    """导出任务响应，已完成时附带下载地址"""
+    response = ExportJobResponse.model_validate(job)
+    if job.status == ExportJobStatus.COMPLETED:
+        response.download_url = f"/api/v1/export/jobs/{job.id}/download"
+    return response
+
+
+async def get_user_export_job(db: AsyncSession, job_id: int, current_user: User) -> ExportJob:
+    """获取当前用户的导出任务，不存在或不属于当前用户时返回 404"""
+    job = await db.get(ExportJob, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="导出任务不存在")
+    return job
+
+
+def export_job_filename(job: ExportJob) -> str:
+    """导出文件的下载文件名（按完成时间，本地时区）"""
+    finished_at = job.finished_at
+    if finished_at.tzinfo is None:
+        finished_at = finished_at.replace(tzinfo=timezone.utc)
+    suffix, _ = EXPORT_FORMATS[job.format]
+    return f"田野记录导出_{finished_at.astimezone().strftime('%Y%m%d_%H%M%S')}{suffix}"
+
+
+async def export_file_response(export_format: str, conditions: list, total_count: int) -> ClosingStreamingResponse:
+    """生成需要整体生成的导出文件（xlsx、pdf、docx）到临时文件，发送后删除"""
+    suffix, media_type = EXPORT_FORMATS[export_format]
+    path = temp_export_path(suffix)
+    try:
+        await write_export_file(export_format, conditions, total_count, path)
+        size = (await run_in_threadpool(os.stat, path)).st_size
+    except Exception:
+        path.unlink(missing_ok=True)
+        raise
+
+    filename = f"field_records_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+    filename_cn = f"田野记录导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}{suffix}"
+
+    return ClosingStreamingResponse(
+        stream_export_file(path),
+        media_type=media_type,
+        headers={
+            'Content-Length': str(size),
+            'Content-Disposition': f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename_cn)}"
+        }
+    )
+
+
+@router.get(
+    "/records/json", summary="导出记录为JSON", dependencies=[Depends(query_budget("export.json", 2, 2))]
+)
 async def export_records_json(
     record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """导出记录为JSON格式"""
-    query = db.query(Record).options(
-        joinedload(Record.field),
-        joinedload(Record.participants),
-        joinedload(Record.tags)
-    )
+    """
+    导出记录为JSON格式
+    边查询边输出：记录经服务端游标分批加载，每条记录序列化后立即发送，不在内存中拼接整个文件
+    """
+    conditions = export_conditions(record_ids, current_user)
 
-    # 数据隔离：研究者只能导出自己的记录
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Record.created_by == current_user.id)
+    total_count = await db.scalar(select(func.count(Record.id)).where(*conditions))
 
-    # 如果指定了ID列表，则只导出指定记录
-    if record_ids:
-        try:
-            ids = [int(id.strip()) for id in record_ids.split(',') if id.strip()]
-            query = query.filter(Record.id.in_(ids))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="无效的记录ID格式")
-
-    records = query.order_by(Record.record_date.desc()).all()
-
-    if not records:
+    if not total_count:
         raise HTTPException(status_code=404, detail="没有找到可导出的记录")
 
-    # 格式化数据
-    export_data = {
-        'export_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-        'total_count': len(records),
-        'records': [format_record_for_export(r) for r in records]
-    }
-
-    # 生成JSON
-    json_content = json.dumps(export_data, ensure_ascii=False, indent=2)
-    
     filename = f"field_records_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     filename_cn = f"田野记录导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
     
-    return StreamingResponse(
-        io.BytesIO(json_content.encode('utf-8')),
+    return ClosingStreamingResponse(
+        json_export_stream(conditions, total_count),
         media_type='application/json',
         headers={
             'Content-Disposition': f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename_cn)}"
@@ -143,169 +143,236 @@ async def export_records_json(
     )
 
 
-@router.get("/records/csv", summary="导出记录为CSV")
+@router.get(
+    "/records/csv", summary="导出记录为CSV", dependencies=[Depends(query_budget("export.csv", 2, 2))]
+)
 async def export_records_csv(
     record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """导出记录为CSV格式（Excel兼容）"""
-    query = db.query(Record).options(
-        joinedload(Record.field),
-        joinedload(Record.participants),
-        joinedload(Record.tags)
-    )
-
-    # 数据隔离：研究者只能导出自己的记录
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Record.created_by == current_user.id)
-
-    if record_ids:
-        try:
-            ids = [int(id.strip()) for id in record_ids.split(',') if id.strip()]
-            query = query.filter(Record.id.in_(ids))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="无效的记录ID格式")
+    """
+    导出记录为CSV格式（Excel兼容）
+    边查询边输出：表头立即发送，之后每批记录写成一个数据块
+    """
+    conditions = export_conditions(record_ids, current_user)
+    await ensure_export_records(db, conditions)
 
-    records = query.order_by(Record.record_date.desc()).all()
-
-    if not records:
-        raise HTTPException(status_code=404, detail="没有找到可导出的记录")
-
-    # CSV头部
-    headers = ['ID', '标题', '类型', '记录日期', '时间段', '持续时间(分钟)', '场域', '参与者', '标签', '内容', '状态', '创建时间', '更新时间']
-    
-    # 生成CSV内容（使用BOM以支持Excel中文）
-    lines = ['\ufeff' + ','.join(headers)]
-    
-    for record in records:
-        data = format_record_for_export(record)
-        # CSV转义：双引号需要转义，字段用双引号包裹
-        row = [
-            str(data['id']),
-            f'"{data["title"].replace(chr(34), chr(34)+chr(34))}"',
-            f'"{data["type"]}"',
-            f'"{data["record_date"]}"',
-            f'"{data["time_range"]}"',
-            str(data['duration']),
-            f'"{data["field"].replace(chr(34), chr(34)+chr(34))}"',
-            f'"{data["participants"].replace(chr(34), chr(34)+chr(34))}"',
-            f'"{data["tags"].replace(chr(34), chr(34)+chr(34))}"',
-            f'"{data["content"].replace(chr(34), chr(34)+chr(34)).replace(chr(10), " ")}"',
-            f'"{data["status"]}"',
-            f'"{data["created_at"]}"',
-            f'"{data["updated_at"]}"',
-        ]
-        lines.append(','.join(row))
-    
-    csv_content = '\n'.join(lines)
     filename = f"field_records_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     filename_cn = f"田野记录导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
     
-    return StreamingResponse(
-        io.BytesIO(csv_content.encode('utf-8-sig')),
-        media_type='text/csv; charset=utf-8-sig',
+    return ClosingStreamingResponse(
+        csv_export_stream(conditions),
+        media_type='text/csv',
         headers={
             'Content-Disposition': f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename_cn)}"
         }
     )
 
 
-@router.get("/records/markdown", summary="导出记录为Markdown")
-async def export_records_markdown(
+@router.get(
+    "/records/xlsx", summary="导出记录为Excel", dependencies=[Depends(query_budget("export.xlsx", 2, 2))]
+)
+async def export_records_xlsx(
     record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """导出记录为Markdown格式"""
-    query = db.query(Record).options(
-        joinedload(Record.field),
-        joinedload(Record.participants),
-        joinedload(Record.tags)
-    )
+    """
+    导出记录为Excel（XLSX）格式
+    日期为 Excel 日期、时长为数值，可直接排序筛选；第二个工作表按行列出每条记录的参与者与标签。
+    记录按批写入临时文件，内存占用与导出总数无关
+    """
+    conditions = export_conditions(record_ids, current_user)
+    await ensure_export_records(db, conditions)
 
-    # 数据隔离：研究者只能导出自己的记录
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Record.created_by == current_user.id)
+    return await export_file_response('xlsx', conditions, 0)
 
-    if record_ids:
-        try:
-            ids = [int(id.strip()) for id in record_ids.split(',') if id.strip()]
-            query = query.filter(Record.id.in_(ids))
-        except ValueError:
-            raise HTTPException(status_code=400, detail="无效的记录ID格式")
 
-    records = query.order_by(Record.record_date.desc()).all()
+@router.get(
+    "/records/markdown", summary="导出记录为Markdown", dependencies=[Depends(query_budget("export.markdown", 2, 2))]
+)
+async def export_records_markdown(
+    record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """导出记录为Markdown格式（边查询边输出）"""
+    conditions = export_conditions(record_ids, current_user)
+
+    total_count = await db.scalar(select(func.count(Record.id)).where(*conditions))
 
-    if not records:
+    if not total_count:
         raise HTTPException(status_code=404, detail="没有找到可导出的记录")
 
-    # 生成Markdown
-    md_lines = [
-        f"# 田野记录导出",
-        f"",
-        f"导出时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
-        f"",
-        f"共 {len(records)} 条记录",
-        f"",
-        f"---",
-        f""
-    ]
-
-    for record in records:
-        data = format_record_for_export(record)
-        content = record.content or {}
-        
-        md_lines.extend([
-            f"## {data['title']}",
-            f"",
-            f"| 属性 | 值 |",
-            f"|------|-----|",
-            f"| 类型 | {data['type']} |",
-            f"| 记录日期 | {data['record_date']} |",
-            f"| 时间段 | {data['time_range'] or '-'} |",
-            f"| 持续时间 | {data['duration']}分钟 |" if data['duration'] else f"| 持续时间 | - |",
-            f"| 场域 | {data['field'] or '-'} |",
-            f"| 参与者 | {data['participants'] or '-'} |",
-            f"| 标签 | {data['tags'] or '-'} |",
-            f"| 状态 | {data['status']} |",
-            f""
-        ])
-
-        # 内容部分
-        if isinstance(content, dict):
-            if content.get('description'):
-                md_lines.extend([
-                    f"### 描述",
-                    f"",
-                    content['description'],
-                    f""
-                ])
-            if content.get('reflection'):
-                md_lines.extend([
-                    f"### 反思",
-                    f"",
-                    content['reflection'],
-                    f""
-                ])
-            if content.get('notes'):
-                md_lines.extend([
-                    f"### 备注",
-                    f"",
-                    content['notes'],
-                    f""
-                ])
-        
-        md_lines.extend([f"---", f""])
-
-    md_content = '\n'.join(md_lines)
     filename = f"field_records_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
     filename_cn = f"田野记录导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}.md"
     
-    return StreamingResponse(
-        io.BytesIO(md_content.encode('utf-8')),
-        media_type='text/markdown; charset=utf-8',
+    return ClosingStreamingResponse(
+        markdown_export_stream(conditions, total_count),
+        media_type='text/markdown',
+        headers={
+            'Content-Disposition': f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename_cn)}"
+        }
+    )
+
+
+@router.get(
+    "/records/zip", summary="导出记录及图片为ZIP", dependencies=[Depends(query_budget("export.zip", 2, 2))]
+)
+async def export_records_zip(
+    record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    导出记录及其图片为ZIP压缩包（附件打包下载）
+    每条记录一个目录，包含 record.json、record.md 与 images/ 下的原图；
+    压缩包边生成边发送，内存占用与记录数、图片总大小无关
+    """
+    conditions = export_conditions(record_ids, current_user)
+    await ensure_export_records(db, conditions)
+
+    filename = f"field_records_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    filename_cn = f"田野记录导出_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+
+    return ClosingStreamingResponse(
+        zip_export_stream(conditions),
+        media_type='application/zip',
         headers={
             'Content-Disposition': f"attachment; filename=\"{filename}\"; filename*=UTF-8''{quote(filename_cn)}"
         }
     )
+
+
+@router.get(
+    "/records/pdf", summary="导出记录为PDF报告", dependencies=[Depends(query_budget("export.pdf", 2, 2))]
+)
+async def export_records_pdf(
+    record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    导出记录为PDF报告
+    封面之后每条记录一页起：属性表、内容各段落及图片缩略图。
+    排版在渲染进程池中按组并行执行后合并，大批量导出建议使用后台导出任务
+    """
+    conditions = export_conditions(record_ids, current_user)
+
+    total_count = await db.scalar(select(func.count(Record.id)).where(*conditions))
+
+    if not total_count:
+        raise HTTPException(status_code=404, detail="没有找到可导出的记录")
+
+    return await export_file_response('pdf', conditions, total_count)
+
+
+@router.get(
+    "/records/docx", summary="导出记录为Word文档", dependencies=[Depends(query_budget("export.docx", 2, 2))]
+)
+async def export_records_docx(
+    record_ids: Optional[str] = Query(None, description="记录ID列表(逗号分隔)，为空则导出全部"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    导出记录为可编辑的Word（DOCX）文档
+    内容与PDF报告相同，渲染方式同PDF导出
+    """
+    conditions = export_conditions(record_ids, current_user)
+
+    total_count = await db.scalar(select(func.count(Record.id)).where(*conditions))
+
+    if not total_count:
+        raise HTTPException(status_code=404, detail="没有找到可导出的记录")
+
+    return await export_file_response('docx', conditions, total_count)
+
+
+@router.post(
+    "/jobs",
+    response_model=ExportJobResponse,
+    status_code=status.HTTP_202_ACCEPTED,
+    summary="提交后台导出任务",
+    dependencies=[Depends(query_budget("export.jobs.create", 12, 12))]
+)
+async def create_export_job(
+    job_data: ExportJobCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    提交后台导出任务，立即返回任务状态
+    相同格式与记录范围的导出在数据未变化时直接返回之前的任务（已完成时可立即下载）
+    """
+    conditions = record_conditions(job_data.record_ids, export_owner_id(current_user))
+    await ensure_export_records(db, conditions)
+
+    job = await submit_export_job(db, current_user, job_data.format.value, job_data.record_ids)
+    return export_job_response(job)
+
+
+@router.get(
+    "/jobs",
+    response_model=List[ExportJobResponse],
+    summary="获取导出任务列表",
+    dependencies=[Depends(query_budget("export.jobs.list", 2, 1 + RECENT_EXPORT_JOBS))]
+)
+async def list_export_jobs(
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取当前用户最近的导出任务"""
+    jobs = (await db.scalars(
+        select(ExportJob)
+        .where(ExportJob.user_id == current_user.id)
+        .order_by(ExportJob.id.desc())
+        .limit(RECENT_EXPORT_JOBS)
+    )).all()
+    return [export_job_response(job) for job in jobs]
+
+
+@router.get(
+    "/jobs/{job_id}",
+    response_model=ExportJobResponse,
+    summary="获取导出任务进度",
+    dependencies=[Depends(query_budget("export.jobs.detail", 2, 2))]
+)
+async def get_export_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取导出任务的状态与进度（已处理记录数 / 总数）"""
+    return export_job_response(await get_user_export_job(db, job_id, current_user))
+
+
+@router.get(
+    "/jobs/{job_id}/download", summary="下载导出文件", dependencies=[Depends(query_budget("export.jobs.download", 2, 2))]
+)
+async def download_export_job(
+    job_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """下载已完成任务的导出文件，支持 Range 断点续传与 ETag 校验"""
+    job = await get_user_export_job(db, job_id, current_user)
+    if job.status != ExportJobStatus.COMPLETED:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail="导出任务尚未完成")
+
+    _, media_type = EXPORT_FORMATS[job.format]
+    try:
+        return await storage_response(
+            request,
+            job.file_key,
+            media_type,
+            export_job_filename(job),
+            etag=content_etag(job.data_version, str(job.id)),
+            private=True,
+            attachment=True,
+            storage=get_export_storage(),
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="导出文件已过期，请重新导出")
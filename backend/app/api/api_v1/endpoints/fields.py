@@ -3,8 +3,8 @@
 """
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
 
 from app.core.database import get_db
 from app.models.user import User, UserRole
@@ -16,40 +16,58 @@ from app.schemas.field import (
     FieldListResponse
 )
 from app.api.api_v1.endpoints.auth import get_current_active_user
+from app.services.counting import CountStrategy, count_cache, make_count_signature, resolve_total
+from app.services.saved_queries import mark_saved_queries_stale
 
 router = APIRouter()
 
 
-@router.get("/", summary="获取场域列表")
-async def get_fields(
-    skip: int = Query(0, ge=0, description="跳过的记录数"),
-    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
-    region: Optional[str] = Query(None, description="区域筛选"),
-    search: Optional[str] = Query(None, description="搜索关键词"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """获取场域列表"""
-    query = db.query(Field)
-    
+def filter_fields(query, current_user: User, region: Optional[str], search: Optional[str]):
+    """为场域查询添加数据隔离与筛选条件"""
     # 数据隔离：研究者只能看到自己创建的场域，管理员可以看到所有
     if current_user.role != UserRole.ADMIN:
         query = query.filter(Field.created_by == current_user.id)
-    
+
     # 区域筛选
     if region:
         query = query.filter(Field.region == region)
-    
+
     # 搜索
     if search:
         query = query.filter(
             Field.location.contains(search) |
             Field.sub_field.contains(search)
         )
-    
-    fields = query.offset(skip).limit(limit).all()
-    total = query.count()
-    
+
+    return query
+
+
+def field_count_signature(current_user: User, region: Optional[str], search: Optional[str]) -> str:
+    """场域总数缓存签名"""
+    user_scope = None if current_user.role == UserRole.ADMIN else current_user.id
+    return make_count_signature(user_scope, region=region, search=search)
+
+
+@router.get("/", summary="获取场域列表")
+async def get_fields(
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    region: Optional[str] = Query(None, description="区域筛选"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    count: CountStrategy = Query(CountStrategy.EXACT, description="总数统计策略: exact/cached/none"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取场域列表"""
+    query = filter_fields(select(Field), current_user, region, search)
+
+    # 获取总数（分页前）
+    total = await resolve_total(
+        db, query, Field.id, count, "fields", field_count_signature(current_user, region, search)
+    )
+
+    fields = (await db.scalars(query.offset(skip).limit(limit))).all()
+
     return {
         "items": fields,
         "total": total,
@@ -58,10 +76,30 @@ async def get_fields(
     }
 
 
+@router.get("/count", summary="获取场域总数")
+async def count_fields(
+    region: Optional[str] = Query(None, description="区域筛选"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    count: CountStrategy = Query(CountStrategy.CACHED, description="总数统计策略: exact/cached"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取符合筛选条件的场域总数，供前端在列表加载后按需获取"""
+    if count == CountStrategy.NONE:
+        count = CountStrategy.EXACT
+
+    query = filter_fields(select(Field), current_user, region, search)
+    total = await resolve_total(
+        db, query, Field.id, count, "fields", field_count_signature(current_user, region, search)
+    )
+
+    return {"total": total}
+
+
 @router.post("/", summary="创建场域", response_model=FieldResponse)
 async def create_field(
     field_data: FieldCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -83,30 +121,31 @@ async def create_field(
     )
 
     db.add(db_field)
-    db.commit()
-    db.refresh(db_field)
+    await db.commit()
+    await db.refresh(db_field)
+    count_cache.invalidate("fields")
 
     return db_field
 
 
 @router.get("/regions", summary="获取区域列表")
 async def get_regions(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取所有区域列表"""
-    regions = db.query(Field.region).distinct().all()
-    return [region[0] for region in regions if region[0]]
+    regions = await db.scalars(select(Field.region).distinct())
+    return [region for region in regions if region]
 
 
 @router.get("/{field_id}", summary="获取场域详情")
 async def get_field(
     field_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取场域详情"""
-    field = db.query(Field).filter(Field.id == field_id).first()
+    field = await db.get(Field, field_id)
     if not field:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -120,7 +159,7 @@ async def get_field(
 async def update_field(
     field_id: int,
     field_data: FieldUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -129,7 +168,7 @@ async def update_field(
     - 管理员可以编辑任何场域
     """
     # 查找场域
-    field = db.query(Field).filter(Field.id == field_id).first()
+    field = await db.get(Field, field_id)
     if not field:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -148,8 +187,9 @@ async def update_field(
     for key, value in update_data.items():
         setattr(field, key, value)
 
-    db.commit()
-    db.refresh(field)
+    await db.commit()
+    await db.refresh(field)
+    count_cache.invalidate("fields")
 
     return field
 
@@ -157,11 +197,11 @@ async def update_field(
 @router.delete("/{field_id}", summary="删除场域")
 async def delete_field(
     field_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除场域"""
-    field = db.query(Field).filter(Field.id == field_id).first()
+    field = await db.get(Field, field_id)
     if not field:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -175,7 +215,11 @@ async def delete_field(
             detail="权限不足，只能删除自己创建的场域"
         )
     
-    db.delete(field)
-    db.commit()
+    # 删除场域会清空其记录的 field_id，按场域筛选的保存查询需要重建结果缓存
+    await mark_saved_queries_stale(db, "field_id")
+
+    await db.delete(field)
+    await db.commit()
+    count_cache.invalidate("fields", "records", "saved_queries")
     
     return {"message": "场域删除成功"}
@@ -3,13 +3,16 @@
 """
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import or_, select
 
 from app.core.database import get_db
 from app.models.user import User, UserRole
 from app.models.participant import Participant
 from app.api.api_v1.endpoints.auth import get_current_active_user
+from app.services.bitmap_index import relation_index
+from app.services.saved_queries import mark_saved_queries_stale
+from app.services.counting import CountStrategy, count_cache, make_count_signature, resolve_total
 from app.schemas.participant import (
     ParticipantCreate,
     ParticipantUpdate,
@@ -20,25 +23,25 @@ from app.schemas.participant import (
 router = APIRouter()
 
 
-@router.get("/", summary="获取参与者列表", response_model=ParticipantListResponse)
-async def get_participants(
-    skip: int = Query(0, ge=0, description="跳过的记录数"),
-    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
-    search: Optional[str] = Query(None, description="搜索关键词"),
-    gender: Optional[str] = Query(None, description="性别筛选"),
-    is_anonymous: Optional[bool] = Query(None, description="是否匿名化"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
-):
-    """
-    获取参与者列表
+def participant_count_signature(
+    current_user: User,
+    search: Optional[str],
+    gender: Optional[str],
+    is_anonymous: Optional[bool]
+) -> str:
+    """参与者总数缓存签名"""
+    user_scope = None if current_user.role == UserRole.ADMIN else current_user.id
+    return make_count_signature(user_scope, search=search, gender=gender, is_anonymous=is_anonymous)
 
-    - 支持按姓名/代号、职业搜索
-    - 支持按性别、匿名状态筛选
-    - 支持分页
-    """
-    query = db.query(Participant)
 
+def filter_participants(
+    query,
+    current_user: User,
+    search: Optional[str],
+    gender: Optional[str],
+    is_anonymous: Optional[bool]
+):
+    """为参与者查询添加数据隔离与筛选条件"""
     # 数据隔离：研究者只能看到自己创建的参与者，管理员可以看到所有
     if current_user.role != UserRole.ADMIN:
         query = query.filter(Participant.created_by == current_user.id)
@@ -62,14 +65,41 @@ async def get_participants(
     if is_anonymous is not None:
         query = query.filter(Participant.is_anonymous == is_anonymous)
 
+    return query
+
+
+@router.get("/", summary="获取参与者列表", response_model=ParticipantListResponse)
+async def get_participants(
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    gender: Optional[str] = Query(None, description="性别筛选"),
+    is_anonymous: Optional[bool] = Query(None, description="是否匿名化"),
+    count: CountStrategy = Query(CountStrategy.EXACT, description="总数统计策略: exact/cached/none"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    获取参与者列表
+
+    - 支持按姓名/代号、职业搜索
+    - 支持按性别、匿名状态筛选
+    - 支持分页
+    - 总数可精确统计、缓存或不统计（count=none 时 total 为空）
+    """
+    query = filter_participants(select(Participant), current_user, search, gender, is_anonymous)
+
     # 按创建时间倒序排列
     query = query.order_by(Participant.created_at.desc())
 
     # 获取总数（在分页之前）
-    total = query.count()
+    total = await resolve_total(
+        db, query, Participant.id, count, "participants",
+        participant_count_signature(current_user, search, gender, is_anonymous)
+    )
 
     # 分页
-    participants = query.offset(skip).limit(limit).all()
+    participants = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     return ParticipantListResponse(
         items=participants,
@@ -79,10 +109,32 @@ async def get_participants(
     )
 
 
+@router.get("/count", summary="获取参与者总数")
+async def count_participants(
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    gender: Optional[str] = Query(None, description="性别筛选"),
+    is_anonymous: Optional[bool] = Query(None, description="是否匿名化"),
+    count: CountStrategy = Query(CountStrategy.CACHED, description="总数统计策略: exact/cached"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取符合筛选条件的参与者总数，供前端在列表加载后按需获取"""
+    if count == CountStrategy.NONE:
+        count = CountStrategy.EXACT
+
+    query = filter_participants(select(Participant), current_user, search, gender, is_anonymous)
+    total = await resolve_total(
+        db, query, Participant.id, count, "participants",
+        participant_count_signature(current_user, search, gender, is_anonymous)
+    )
+
+    return {"total": total}
+
+
 @router.post("/", summary="创建参与者", response_model=ParticipantResponse)
 async def create_participant(
     participant_data: ParticipantCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """创建新参与者"""
@@ -103,8 +155,9 @@ async def create_participant(
     )
 
     db.add(participant)
-    db.commit()
-    db.refresh(participant)
+    await db.commit()
+    await db.refresh(participant)
+    count_cache.invalidate("participants")
 
     return participant
 
@@ -112,11 +165,11 @@ async def create_participant(
 @router.get("/{participant_id}", summary="获取参与者详情", response_model=ParticipantResponse)
 async def get_participant(
     participant_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取参与者详情"""
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
+    participant = await db.get(Participant, participant_id)
 
     if not participant:
         raise HTTPException(
@@ -131,12 +184,12 @@ async def get_participant(
 async def update_participant(
     participant_id: int,
     participant_data: ParticipantUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """更新参与者信息"""
     # 查找参与者
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
+    participant = await db.get(Participant, participant_id)
 
     if not participant:
         raise HTTPException(
@@ -156,8 +209,9 @@ async def update_participant(
     for field, value in update_data.items():
         setattr(participant, field, value)
 
-    db.commit()
-    db.refresh(participant)
+    await db.commit()
+    await db.refresh(participant)
+    count_cache.invalidate("participants")
 
     return participant
 
@@ -165,11 +219,11 @@ async def update_participant(
 @router.delete("/{participant_id}", summary="删除参与者")
 async def delete_participant(
     participant_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除参与者"""
-    participant = db.query(Participant).filter(Participant.id == participant_id).first()
+    participant = await db.get(Participant, participant_id)
 
     if not participant:
         raise HTTPException(
@@ -184,7 +238,12 @@ async def delete_participant(
             detail="权限不足，只能删除自己创建的参与者"
         )
 
-    db.delete(participant)
-    db.commit()
+    # 使用该参与者筛选的保存查询需要重建结果缓存
+    await mark_saved_queries_stale(db, "participant_ids", "participant_expr")
+
+    await db.delete(participant)
+    await db.commit()
+    count_cache.invalidate("participants", "records", "saved_queries")
+    relation_index.remove_participant(participant_id)
 
     return {"message": "参与者删除成功", "id": participant_id}
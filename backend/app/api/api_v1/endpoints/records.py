@@ -1,131 +1,286 @@
 """
 记录管理API
 """
+import asyncio
+import logging
 import os
-import uuid
 import shutil
+from concurrent.futures.process import BrokenProcessPool
 from typing import Optional, List
 from datetime import datetime
 from pathlib import Path
-from fastapi import APIRouter, Depends, HTTPException, status, Query, UploadFile, File
-from fastapi.responses import FileResponse
-from sqlalchemy.orm import Session, joinedload
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Query, UploadFile, File
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
+from starlette.background import BackgroundTask
 
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.query_budget import query_budget
 from app.models.user import User, UserRole
 from app.models.record import Record, RecordType, RecordStatus, RecordImage
 from app.models.participant import Participant
 from app.models.tag import Tag
 from app.schemas.record import (
     RecordCreate, RecordUpdate, RecordResponse, RecordListResponse,
-    RecordImageResponse, RecordImageListResponse
+    RecordImageResponse, RecordImageListResponse, RecordFilters,
+    RecordImageUploadResult, RecordImageBatchResponse,
+    RecordListItem, RecordSortEnum
+)
+from app.services.record_query import (
+    apply_record_filters, apply_record_cursor, order_records_by_date,
+    encode_cursor, parse_id_list, record_count_signature,
+    parse_record_facets, compute_record_facets, parse_record_fields,
+    apply_record_projection, project_record, load_record_detail
+)
+from app.services.bitmap_index import relation_index
+from app.services.uploads import StoredUpload, receive_upload
+from app.services.blob_store import (
+    BLOB_STAGING_DIR, acquire_blob, apply_blob_to_image, release_blob
+)
+from app.services.image_variants import VARIANT_SIZES, generate_blob_variants, generate_blobs_variants
+from app.services.image_cache import (
+    IMAGE_FORMATS, MAX_IMAGE_WIDTH, MIN_IMAGE_WIDTH, image_cache, image_source_key, resolve_image_width
+)
+from app.services.file_delivery import content_etag, file_response, storage_response
+from app.services.file_cleanup import FileReleases
+from app.services.saved_queries import refresh_saved_queries_for_record, remove_record_from_saved_queries
+from app.services.counting import CountStrategy, count_cache, resolve_total
+from app.services.search import (
+    sync_record_search_index, remove_record_search_index,
+    relevance_score, load_record_highlights
 )
 from app.api.api_v1.endpoints.auth import get_current_active_user
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 # 图片上传配置
-UPLOAD_DIR = Path("uploads/records")
 ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif", ".webp"}
-MAX_FILE_SIZE = 5 * 1024 * 1024  # 5MB
-
-
-@router.get("/", summary="获取记录列表", response_model=RecordListResponse)
-async def get_records(
-    skip: int = Query(0, ge=0, description="跳过的记录数"),
-    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+MAX_FILE_SIZE = settings.MAX_FILE_SIZE
+MAX_BATCH_UPLOAD_FILES = settings.MAX_BATCH_UPLOAD_FILES
+# 批量上传时同时接收（写盘与计算摘要）的文件数
+BATCH_RECEIVE_CONCURRENCY = 4
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+}
+
+
+def get_record_filters(
     type: Optional[RecordType] = Query(None, description="记录类型"),
     record_status: Optional[RecordStatus] = Query(None, alias="status", description="记录状态"),
-    search: Optional[str] = Query(None, description="搜索关键词"),
+    search: Optional[str] = Query(None, description="搜索关键词（全文检索标题与内容，空格分隔多个词）"),
     created_by: Optional[int] = Query(None, description="创建者ID"),
-    # 新增筛选参数
     start_date: Optional[datetime] = Query(None, description="开始日期"),
     end_date: Optional[datetime] = Query(None, description="结束日期"),
     field_id: Optional[int] = Query(None, description="场域ID"),
     participant_ids: Optional[str] = Query(None, description="参与者ID列表(逗号分隔)"),
     tag_ids: Optional[str] = Query(None, description="标签ID列表(逗号分隔)"),
-    db: Session = Depends(get_db),
+    tag_expr: Optional[str] = Query(
+        None, max_length=500, description="标签布尔表达式：&(且) |(或) !(非) 及括号，如 1&(2|3)&!4"
+    ),
+    participant_expr: Optional[str] = Query(None, max_length=500, description="参与者布尔表达式，语法同 tag_expr"),
+) -> RecordFilters:
+    """记录列表筛选参数依赖"""
+    return RecordFilters(
+        type=type.value if type else None,
+        status=record_status.value if record_status else None,
+        search=search,
+        created_by=created_by,
+        start_date=start_date,
+        end_date=end_date,
+        field_id=field_id,
+        participant_ids=parse_id_list(participant_ids),
+        tag_ids=parse_id_list(tag_ids),
+        tag_expr=tag_expr.strip() if tag_expr and tag_expr.strip() else None,
+        participant_expr=participant_expr.strip() if participant_expr and participant_expr.strip() else None,
+    )
+
+
+def image_variant_key(image: RecordImage, variant: str) -> Optional[str]:
+    """已生成的衍生图存储键"""
+    return {"thumbnail": image.thumbnail_path, "medium": image.medium_path}.get(variant)
+
+
+async def release_image(db: AsyncSession, image: RecordImage, releases: FileReleases) -> None:
+    """
+    删除图片时释放其内容引用（不提交事务）
+    引用归零的内容及历史图片（无内容摘要）的文件记入 releases，提交后在后台删除
+    """
+    if not image.content_hash:
+        releases.add_image(image)
+        return
+
+    blob = await release_blob(db, image.content_hash)
+    if blob is not None:
+        releases.add_blob(blob)
+
+
+def image_extension(file: UploadFile) -> str:
+    """上传文件的扩展名，格式不支持时返回 400"""
+    file_ext = Path(file.filename or "").suffix.lower()
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的文件格式。支持的格式: {', '.join(ALLOWED_EXTENSIONS)}"
+        )
+    return file_ext
+
+
+def image_version(image: RecordImage) -> Optional[str]:
+    """图片内容版本（内容摘要前缀），写入 URL 后该 URL 的内容不会再变化"""
+    return image.content_hash[:16] if image.content_hash else None
+
+
+def build_image_response(image: RecordImage) -> RecordImageResponse:
+    """
+    图片响应，附带原图与各衍生图的访问 URL（不包含 /api/v1 前缀，前端会自动添加）
+    URL 带有内容版本参数 v，客户端可长期缓存
+    """
+    base = f"/records/{image.record_id}/images/{image.id}/file"
+    version = image_version(image)
+
+    def file_url(**params: str) -> str:
+        if version:
+            params["v"] = version
+        query = "&".join(f"{key}={value}" for key, value in params.items())
+        return f"{base}?{query}" if query else base
+
+    response = RecordImageResponse.model_validate(image)
+    response.url = file_url()
+    response.thumbnail_url = file_url(variant="thumbnail") if image.thumbnail_path else None
+    response.medium_url = file_url(variant="medium") if image.medium_path else None
+    return response
+
+
+@router.get(
+    "/", summary="获取记录列表", response_model=RecordListResponse, response_model_exclude_unset=True,
+    dependencies=[Depends(query_budget("records.list", 8, 10, rows_per_record=20))]
+)
+async def get_records(
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（传入上一页的 next_cursor，此时忽略 skip）"),
+    count: CountStrategy = Query(CountStrategy.EXACT, description="总数统计策略: exact/cached/none"),
+    sort: RecordSortEnum = Query(RecordSortEnum.DATE, description="排序方式: date/relevance"),
+    fields: Optional[str] = Query(
+        None,
+        description="返回字段(逗号分隔)，为空时返回精简字段，* 表示全部字段。"
+                    "可选: title,type,record_date,status,created_at,updated_at,content,time_range,"
+                    "duration,field_id,specific_location,created_by,field,participants,tags"
+    ),
+    facets: Optional[str] = Query(
+        None, description="分面统计字段(逗号分隔)，可选: type,status,field_id,tag_ids,participant_ids"
+    ),
+    filters: RecordFilters = Depends(get_record_filters),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """获取记录列表，支持多条件筛选"""
-    query = db.query(Record).options(
-        joinedload(Record.field),
-        joinedload(Record.participants),
-        joinedload(Record.tags)
-    )
+    """
+    获取记录列表，支持多条件筛选
+    - 默认按 (记录日期, ID) 倒序排列；检索时可按相关度排序（sort=relevance）
+    - 支持 skip/limit 偏移分页与 cursor 游标分页，深分页时建议使用游标
+    - 总数可精确统计、缓存或不统计（count=none 时 total 为空，可通过 /records/count 单独获取）
+    - 检索时每条记录附带关键词上下文摘要 highlights
+    - 通过 fields 选择返回字段，未请求的列与关联既不从数据库加载也不序列化
+    - 通过 facets 返回当前筛选结果的分面统计，如各类型/状态的记录数
+    - 查询次数与页大小无关：认证、总数、分面（列与关联各一条）、分页、参与者、标签、高亮各最多一条；
+      分页查询每条记录只返回一行，关联数据不与主查询相乘
+    """
+    selected_fields = parse_record_fields(fields)
+    selected_facets = parse_record_facets(facets)
+
+    # 相关度得分，仅在有可索引的检索词时可用
+    score = None
+    if sort == RecordSortEnum.RELEVANCE and filters.search:
+        score = relevance_score(filters.search)
+    if score is not None and cursor:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="按相关度排序时不支持游标分页，请使用 skip/limit"
+        )
 
-    # 数据隔离：研究者只能看到自己的记录，管理员可以看到所有记录
-    if current_user.role != UserRole.ADMIN:
-        query = query.filter(Record.created_by == current_user.id)
-
-    # 类型筛选
-    if type:
-        query = query.filter(Record.type == type)
-
-    # 状态筛选
-    if record_status:
-        query = query.filter(Record.status == record_status)
-
-    # 创建者筛选
-    if created_by:
-        query = query.filter(Record.created_by == created_by)
-
-    # 搜索
-    if search:
-        query = query.filter(Record.title.contains(search))
-
-    # 日期范围筛选
-    if start_date:
-        query = query.filter(Record.record_date >= start_date)
-    if end_date:
-        query = query.filter(Record.record_date <= end_date)
-
-    # 场域筛选
-    if field_id:
-        query = query.filter(Record.field_id == field_id)
-
-    # 参与者筛选（需要关联查询）
-    if participant_ids:
-        try:
-            pid_list = [int(pid.strip()) for pid in participant_ids.split(',') if pid.strip()]
-            if pid_list:
-                query = query.filter(Record.participants.any(Participant.id.in_(pid_list)))
-        except ValueError:
-            pass  # 忽略无效的ID格式
-
-    # 标签筛选（需要关联查询）
-    if tag_ids:
-        try:
-            tid_list = [int(tid.strip()) for tid in tag_ids.split(',') if tid.strip()]
-            if tid_list:
-                query = query.filter(Record.tags.any(Tag.id.in_(tid_list)))
-        except ValueError:
-            pass  # 忽略无效的ID格式
-
-    # 按记录日期倒序（更符合使用场景）
-    query = query.order_by(Record.record_date.desc())
-
-    # 去重（因为关联查询可能产生重复）
-    query = query.distinct()
+    query = await apply_record_filters(db, select(Record), filters, current_user)
 
     # 统计总数（在分页前）
-    total = query.count()
-
-    # 分页
-    records = query.offset(skip).limit(limit).all()
+    total = await resolve_total(
+        db, query, Record.id, count, "records", record_count_signature(filters, current_user)
+    )
 
-    return RecordListResponse(
-        items=records,
+    # 分面统计（在分页前，基于完整的筛选结果）
+    facet_counts = await compute_record_facets(db, query, selected_facets) if selected_facets else None
+
+    # 只加载请求的列与关联
+    query = apply_record_projection(query, selected_fields)
+
+    # 游标分页：从上一页最后一条记录之后继续，代价与第一页相同
+    if cursor:
+        query = apply_record_cursor(query, cursor)
+        skip = 0
+
+    # 按相关度或记录日期倒序（更符合使用场景）
+    # 相关度排序配合 LIMIT 时 MySQL 使用优先队列只保留前 k 条，无需对全部命中结果排序
+    if score is not None:
+        query = query.order_by(score.desc(), Record.id.desc())
+    else:
+        query = order_records_by_date(query)
+
+    # 多取一条用于判断是否还有下一页
+    records = (await db.scalars(query.offset(skip).limit(limit + 1))).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        if score is None:
+            next_cursor = encode_cursor(records[-1].record_date, records[-1].id)
+
+    items = [RecordListItem.model_validate(project_record(record, selected_fields)) for record in records]
+
+    # 检索时为当前页生成关键词高亮摘要
+    if filters.search:
+        highlights = await load_record_highlights(db, [item.id for item in items], filters.search)
+        for item in items:
+            item.highlights = highlights.get(item.id, [])
+
+    response = RecordListResponse(
+        items=items,
         total=total,
         skip=skip,
-        limit=limit
+        limit=limit,
+        next_cursor=next_cursor
+    )
+    if facet_counts is not None:
+        response.facets = facet_counts
+    return response
+
+
+@router.get("/count", summary="获取记录总数", dependencies=[Depends(query_budget("records.count", 2, 2))])
+async def count_records(
+    count: CountStrategy = Query(CountStrategy.CACHED, description="总数统计策略: exact/cached"),
+    filters: RecordFilters = Depends(get_record_filters),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取符合筛选条件的记录总数，供前端在列表加载后按需获取"""
+    if count == CountStrategy.NONE:
+        count = CountStrategy.EXACT
+
+    query = await apply_record_filters(db, select(Record), filters, current_user)
+    total = await resolve_total(
+        db, query, Record.id, count, "records", record_count_signature(filters, current_user)
     )
 
+    return {"total": total}
+
 
 @router.post("/", summary="创建记录", response_model=RecordResponse)
 async def create_record(
     record_data: RecordCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """创建新记录"""
@@ -148,38 +303,51 @@ async def create_record(
     )
 
     # 添加参与者关联
+    participants = []
     if record_data.participant_ids:
-        participants = db.query(Participant).filter(
+        participants = (await db.scalars(select(Participant).where(
             Participant.id.in_(record_data.participant_ids)
-        ).all()
-        record.participants = participants
+        ))).all()
+    record.participants = list(participants)
 
     # 添加标签关联
+    tags = []
     if record_data.tag_ids:
-        tags = db.query(Tag).filter(
+        tags = (await db.scalars(select(Tag).where(
             Tag.id.in_(record_data.tag_ids)
-        ).all()
-        record.tags = tags
+        ))).all()
+    record.tags = list(tags)
 
     db.add(record)
-    db.commit()
-    db.refresh(record)
+    await db.flush()
 
-    return record
+    # 同步全文检索索引
+    await sync_record_search_index(db, record)
+    tag_ids = [tag.id for tag in record.tags]
+    participant_ids = [participant.id for participant in record.participants]
 
+    await db.commit()
+    relation_index.set_record_relations(record.id, tag_ids, participant_ids)
 
-@router.get("/{record_id}", summary="获取记录详情", response_model=RecordResponse)
+    # 增量更新保存的查询结果缓存（依赖已提交的检索索引与关联位图）
+    await refresh_saved_queries_for_record(db, record.id, record.created_by)
+    await db.commit()
+    count_cache.invalidate("records", "saved_queries")
+
+    return await load_record_detail(db, record.id)
+
+
+@router.get(
+    "/{record_id}", summary="获取记录详情", response_model=RecordResponse,
+    dependencies=[Depends(query_budget("records.detail", 4, 100))]
+)
 async def get_record(
     record_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取记录详情"""
-    record = db.query(Record).options(
-        joinedload(Record.field),
-        joinedload(Record.participants),
-        joinedload(Record.tags)
-    ).filter(Record.id == record_id).first()
+    record = await load_record_detail(db, record_id)
 
     if not record:
         raise HTTPException(
@@ -201,11 +369,14 @@ async def get_record(
 async def update_record(
     record_id: int,
     record_data: RecordUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """更新记录信息"""
-    record = db.query(Record).filter(Record.id == record_id).first()
+    # 预先加载参与者与标签，替换关联时需要对比原有集合
+    record = await db.get(
+        Record, record_id, options=[selectinload(Record.participants), selectinload(Record.tags)]
+    )
     if not record:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -225,18 +396,18 @@ async def update_record(
     # 处理参与者关联
     if "participant_ids" in update_data:
         participant_ids = update_data.pop("participant_ids")
-        participants = db.query(Participant).filter(
+        participants = (await db.scalars(select(Participant).where(
             Participant.id.in_(participant_ids)
-        ).all()
-        record.participants = participants
+        ))).all()
+        record.participants = list(participants)
 
     # 处理标签关联
     if "tag_ids" in update_data:
         tag_ids = update_data.pop("tag_ids")
-        tags = db.query(Tag).filter(
+        tags = (await db.scalars(select(Tag).where(
             Tag.id.in_(tag_ids)
-        ).all()
-        record.tags = tags
+        ))).all()
+        record.tags = list(tags)
 
     # 更新类型枚举
     if "type" in update_data and update_data["type"]:
@@ -253,20 +424,31 @@ async def update_record(
     # 增加版本号
     record.version += 1
 
-    db.commit()
-    db.refresh(record)
+    # 同步全文检索索引
+    await sync_record_search_index(db, record)
+    tag_ids = [tag.id for tag in record.tags]
+    participant_ids = [participant.id for participant in record.participants]
 
-    return record
+    await db.commit()
+    relation_index.set_record_relations(record.id, tag_ids, participant_ids)
+
+    # 增量更新保存的查询结果缓存（依赖已提交的检索索引与关联位图）
+    await refresh_saved_queries_for_record(db, record.id, record.created_by)
+    await db.commit()
+    count_cache.invalidate("records", "saved_queries")
+
+    return await load_record_detail(db, record.id)
 
 
 @router.delete("/{record_id}", summary="删除记录")
 async def delete_record(
     record_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除记录"""
-    record = db.query(Record).filter(Record.id == record_id).first()
+    record = await db.get(Record, record_id)
     if not record:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -280,27 +462,22 @@ async def delete_record(
             detail="权限不足，只能删除自己创建的记录"
         )
 
-    # 删除关联的图片文件
-    images = db.query(RecordImage).filter(RecordImage.record_id == record_id).all()
+    # 删除关联的图片，释放其内容引用（文件在提交后删除）
+    images = (await db.scalars(select(RecordImage).where(RecordImage.record_id == record_id))).all()
+    releases = FileReleases()
     for image in images:
-        file_path = Path(image.file_path)
-        if file_path.exists():
-            file_path.unlink()
-        if image.thumbnail_path:
-            thumb_path = Path(image.thumbnail_path)
-            if thumb_path.exists():
-                thumb_path.unlink()
-
-    # 删除图片目录（如果为空）
-    record_upload_dir = UPLOAD_DIR / str(record_id)
-    if record_upload_dir.exists():
-        try:
-            record_upload_dir.rmdir()
-        except OSError:
-            pass  # 目录不为空，忽略
-
-    db.delete(record)
-    db.commit()
+        await release_image(db, image, releases)
+        await db.delete(image)
+
+    # 删除全文检索索引与保存的查询结果缓存
+    await remove_record_search_index(db, record_id)
+    await remove_record_from_saved_queries(db, record_id)
+
+    await db.delete(record)
+    await db.commit()
+    count_cache.invalidate("records", "saved_queries")
+    relation_index.remove_record(record_id)
+    releases.schedule(background_tasks)
 
     return {"message": "记录删除成功", "id": record_id}
 
@@ -308,38 +485,23 @@ async def delete_record(
 @router.get("/{record_id}/images", summary="获取记录图片列表", response_model=RecordImageListResponse)
 async def get_record_images(
     record_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取记录的所有图片"""
     # 检查记录是否存在
-    record = db.query(Record).filter(Record.id == record_id).first()
+    record = await db.get(Record, record_id)
     if not record:
         raise HTTPException(status_code=404, detail="记录不存在")
 
     # 获取图片列表
-    images = db.query(RecordImage).filter(
-        RecordImage.record_id == record_id
-    ).order_by(RecordImage.sort_order, RecordImage.created_at).all()
-
-    # 添加 URL 信息（不包含 /api/v1 前缀，前端会自动添加）
-    items = []
-    for img in images:
-        img_dict = {
-            "id": img.id,
-            "record_id": img.record_id,
-            "filename": img.filename,
-            "original_filename": img.original_filename,
-            "file_path": img.file_path,
-            "thumbnail_path": img.thumbnail_path,
-            "file_size": img.file_size,
-            "mime_type": img.mime_type,
-            "description": img.description,
-            "sort_order": img.sort_order,
-            "created_at": img.created_at,
-            "url": f"/records/{record_id}/images/{img.id}/file"
-        }
-        items.append(RecordImageResponse(**img_dict))
+    images = (await db.scalars(
+        select(RecordImage)
+        .where(RecordImage.record_id == record_id)
+        .order_by(RecordImage.sort_order, RecordImage.created_at)
+    )).all()
+
+    items = [build_image_response(img) for img in images]
 
     return RecordImageListResponse(items=items, total=len(items))
 
@@ -347,14 +509,19 @@ async def get_record_images(
 @router.post("/{record_id}/images", summary="上传记录图片", response_model=RecordImageResponse)
 async def upload_record_image(
     record_id: int,
+    background_tasks: BackgroundTasks,
     file: UploadFile = File(..., description="图片文件"),
     description: Optional[str] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
-    """为记录上传图片"""
+    """
+    为记录上传图片
+    - 按内容去重存储：与已有图片内容相同时共用同一文件及其衍生图
+    - 缩略图与中等尺寸图在响应返回后由后台进程生成，生成前对应 URL 为空
+    """
     # 检查记录是否存在
-    record = db.query(Record).filter(Record.id == record_id).first()
+    record = await db.get(Record, record_id)
     if not record:
         raise HTTPException(status_code=404, detail="记录不存在")
 
@@ -363,141 +530,281 @@ async def upload_record_image(
         raise HTTPException(status_code=403, detail="无权为此记录上传图片")
 
     # 验证文件类型
-    file_ext = Path(file.filename).suffix.lower()
-    if file_ext not in ALLOWED_EXTENSIONS:
-        raise HTTPException(
-            status_code=400,
-            detail=f"不支持的文件格式。支持的格式: {', '.join(ALLOWED_EXTENSIONS)}"
-        )
+    file_ext = image_extension(file)
 
-    # 读取文件内容并检查大小
-    content = await file.read()
-    if len(content) > MAX_FILE_SIZE:
-        raise HTTPException(
-            status_code=400,
-            detail=f"文件过大。最大允许大小: {MAX_FILE_SIZE // 1024 // 1024}MB"
-        )
-
-    # 生成唯一文件名
-    unique_filename = f"{uuid.uuid4().hex}{file_ext}"
-
-    # 创建目录
-    record_upload_dir = UPLOAD_DIR / str(record_id)
-    record_upload_dir.mkdir(parents=True, exist_ok=True)
-
-    # 保存文件
-    file_path = record_upload_dir / unique_filename
-    with open(file_path, "wb") as f:
-        f.write(content)
+    # 流式接收文件（边写边检查大小并计算内容摘要），按内容去重存储
+    stored = await receive_upload(file, BLOB_STAGING_DIR, MAX_FILE_SIZE)
+    blob = await acquire_blob(db, stored, file_ext)
 
     # 获取 MIME 类型
-    mime_types = {
-        ".jpg": "image/jpeg",
-        ".jpeg": "image/jpeg",
-        ".png": "image/png",
-        ".gif": "image/gif",
-        ".webp": "image/webp",
-    }
-    mime_type = mime_types.get(file_ext, "image/jpeg")
+    mime_type = MIME_TYPES.get(file_ext, "image/jpeg")
 
     # 获取当前最大排序值
-    max_sort = db.query(RecordImage).filter(
-        RecordImage.record_id == record_id
-    ).count()
+    max_sort = await db.scalar(
+        select(func.count(RecordImage.id)).where(RecordImage.record_id == record_id)
+    )
 
     # 创建数据库记录
     db_image = RecordImage(
         record_id=record_id,
-        filename=unique_filename,
+        filename=Path(blob.file_path).name,
         original_filename=file.filename,
-        file_path=str(file_path),
-        file_size=len(content),
         mime_type=mime_type,
         description=description,
         sort_order=max_sort
     )
+    apply_blob_to_image(db_image, blob)
 
     db.add(db_image)
-    db.commit()
-    db.refresh(db_image)
-
-    return RecordImageResponse(
-        id=db_image.id,
-        record_id=db_image.record_id,
-        filename=db_image.filename,
-        original_filename=db_image.original_filename,
-        file_path=db_image.file_path,
-        thumbnail_path=db_image.thumbnail_path,
-        file_size=db_image.file_size,
-        mime_type=db_image.mime_type,
-        description=db_image.description,
-        sort_order=db_image.sort_order,
-        created_at=db_image.created_at,
-        url=f"/records/{record_id}/images/{db_image.id}/file"
+    await db.commit()
+    await db.refresh(db_image)
+
+    if not (blob.thumbnail_path and blob.medium_path):
+        background_tasks.add_task(generate_blob_variants, blob.content_hash)
+
+    return build_image_response(db_image)
+
+
+@router.post("/{record_id}/images/batch", summary="批量上传记录图片", response_model=RecordImageBatchResponse)
+async def upload_record_images(
+    record_id: int,
+    background_tasks: BackgroundTasks,
+    files: List[UploadFile] = File(..., description="图片文件（可多个）"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    一次请求上传多张图片
+    - 各文件并行接收（写盘并计算内容摘要），全部图片在同一事务中按上传顺序连续分配排序值
+    - 单个文件格式不支持或过大只导致该文件失败，逐个返回上传结果（与请求中的文件顺序一致）
+    - 缩略图与中等尺寸图在响应返回后并行生成
+    """
+    # 检查记录是否存在
+    record = await db.get(Record, record_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="记录不存在")
+
+    # 检查权限（只有创建者或管理员可以上传）
+    if record.created_by != current_user.id and current_user.role != "admin":
+        raise HTTPException(status_code=403, detail="无权为此记录上传图片")
+
+    if len(files) > MAX_BATCH_UPLOAD_FILES:
+        raise HTTPException(status_code=400, detail=f"单次最多上传 {MAX_BATCH_UPLOAD_FILES} 个文件")
+
+    semaphore = asyncio.Semaphore(BATCH_RECEIVE_CONCURRENCY)
+
+    async def receive(file: UploadFile) -> StoredUpload:
+        image_extension(file)
+        async with semaphore:
+            return await receive_upload(file, BLOB_STAGING_DIR, MAX_FILE_SIZE)
+
+    received = await asyncio.gather(*(receive(file) for file in files), return_exceptions=True)
+    stored_uploads = [outcome for outcome in received if isinstance(outcome, StoredUpload)]
+    unexpected = next((outcome for outcome in received if isinstance(outcome, BaseException)
+                       and not isinstance(outcome, HTTPException)), None)
+    if unexpected is not None:
+        for stored in stored_uploads:
+            await stored.discard()
+        raise unexpected
+
+    # 获取当前最大排序值
+    max_sort = await db.scalar(
+        select(func.count(RecordImage.id)).where(RecordImage.record_id == record_id)
+    )
+
+    created = []  # (结果序号, 图片)
+    results = []
+    pending_hashes = []
+    try:
+        for file, outcome in zip(files, received):
+            if isinstance(outcome, HTTPException):
+                results.append(RecordImageUploadResult(filename=file.filename or "", success=False, error=outcome.detail))
+                continue
+
+            file_ext = Path(file.filename).suffix.lower()
+            blob = await acquire_blob(db, outcome, file_ext)
+            stored_uploads.remove(outcome)
+
+            db_image = RecordImage(
+                record_id=record_id,
+                filename=Path(blob.file_path).name,
+                original_filename=file.filename,
+                mime_type=MIME_TYPES.get(file_ext, "image/jpeg"),
+                sort_order=max_sort + len(created)
+            )
+            apply_blob_to_image(db_image, blob)
+            db.add(db_image)
+            created.append((len(results), db_image))
+            results.append(RecordImageUploadResult(filename=file.filename, success=True))
+
+            if not (blob.thumbnail_path and blob.medium_path) and blob.content_hash not in pending_hashes:
+                pending_hashes.append(blob.content_hash)
+
+        await db.flush()
+        await db.commit()
+    except BaseException:
+        for stored in stored_uploads:
+            await stored.discard()
+        raise
+
+    # 一次查询取回数据库生成的字段（创建时间等）
+    if created:
+        await db.scalars(
+            select(RecordImage)
+            .where(RecordImage.id.in_([image.id for _, image in created]))
+            .execution_options(populate_existing=True)
+        )
+    for index, db_image in created:
+        results[index].image = build_image_response(db_image)
+
+    if pending_hashes:
+        background_tasks.add_task(generate_blobs_variants, pending_hashes)
+
+    return RecordImageBatchResponse(
+        items=results,
+        succeeded=len(created),
+        failed=len(results) - len(created)
     )
 
 
 @router.get("/{record_id}/images/{image_id}/file", summary="获取图片文件")
 async def get_image_file(
+    request: Request,
     record_id: int,
     image_id: int,
-    db: Session = Depends(get_db)
+    variant: Optional[str] = Query(
+        None, description=f"衍生图: {'/'.join(VARIANT_SIZES)}，为空返回原图；衍生图尚未生成时返回原图"
+    ),
+    w: Optional[int] = Query(
+        None, ge=MIN_IMAGE_WIDTH, le=MAX_IMAGE_WIDTH,
+        description="按需缩放到指定宽度（像素），向上取整到固定档位且不超过原图宽度"
+    ),
+    image_format: Optional[str] = Query(
+        None, alias="format", description=f"按需转码格式: {'/'.join(IMAGE_FORMATS)}，仅指定 w 时默认 jpeg"
+    ),
+    v: Optional[str] = Query(None, description="内容版本（由图片 URL 提供），与当前内容一致时允许客户端长期缓存"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
 ):
-    """获取图片文件"""
-    image = db.query(RecordImage).filter(
+    """
+    获取图片文件
+    - variant 返回上传后预生成的缩略图/中等尺寸图
+    - w/format 首次请求时按需缩放转码，结果缓存在磁盘上；宽度按档位取整并以原图宽度为上限
+    - 支持 ETag/If-None-Match 与 Range；可配置由 nginx 等前置代理发送文件
+    """
+    image = await db.scalar(select(RecordImage).where(
         RecordImage.id == image_id,
         RecordImage.record_id == record_id
-    ).first()
+    ))
 
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
 
-    file_path = Path(image.file_path)
-    if not file_path.exists():
-        raise HTTPException(status_code=404, detail="图片文件不存在")
+    if variant is not None and variant not in VARIANT_SIZES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"不支持的衍生图: {variant}。可选: {', '.join(VARIANT_SIZES)}"
+        )
 
-    return FileResponse(
-        path=str(file_path),
-        media_type=image.mime_type,
-        filename=image.original_filename
-    )
+    # URL 中的内容版本与当前一致时，该 URL 的内容不会再变化
+    versioned = v is not None and v == image_version(image)
+
+    if w is not None or image_format is not None:
+        if variant is not None:
+            raise HTTPException(status_code=400, detail="variant 不能与 w/format 同时使用")
+        image_format = image_format or "jpeg"
+        if image_format not in IMAGE_FORMATS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"不支持的图片格式: {image_format}。可选: {', '.join(IMAGE_FORMATS)}"
+            )
+        _, media_type = IMAGE_FORMATS[image_format]
+        width = resolve_image_width(w, image.width)
+        # 缓存文件可能在发送前被其他进程淘汰，此时重新生成一次
+        for _ in range(2):
+            try:
+                file_path = await image_cache.get(
+                    image_source_key(image.content_hash, image.id), image.file_path, width, image_format
+                )
+            except FileNotFoundError:
+                raise HTTPException(status_code=404, detail="图片文件不存在")
+            except OSError:
+                raise HTTPException(status_code=422, detail="图片无法解码，请下载原图")
+            except BrokenProcessPool:
+                # 图片处理进程异常退出（进程池已重建），本次临时返回原图
+                logger.exception("按需缩放图片失败，返回原图: image_id=%s", image.id)
+                break
+
+            try:
+                response = await file_response(
+                    request,
+                    file_path,
+                    media_type,
+                    f"{Path(image.original_filename).stem}_{width if w else 'full'}.{image_format}",
+                    etag=content_etag(image.content_hash, f"{width}.{image_format}"),
+                    immutable=versioned
+                )
+            except FileNotFoundError:
+                image_cache.release(file_path)
+                continue
+            except BaseException:
+                image_cache.release(file_path)
+                raise
+            # 响应发送完成后解除固定，期间本进程不会淘汰该文件
+            response.background = BackgroundTask(image_cache.release, file_path)
+            return response
+        else:
+            raise HTTPException(status_code=404, detail="图片文件不存在")
+        versioned = False
+
+    variant_key = image_variant_key(image, variant) if variant else None
+    if variant_key:
+        storage_key = variant_key
+        media_type = "image/jpeg"
+        filename = f"{Path(image.original_filename).stem}_{variant}.jpg"
+        etag = content_etag(image.content_hash, variant)
+    else:
+        storage_key = image.file_path
+        media_type = image.mime_type
+        filename = image.original_filename
+        etag = content_etag(image.content_hash)
+        # 衍生图尚未生成时临时返回原图，之后同一 URL 会返回衍生图，不能长期缓存
+        versioned = versioned and variant is None
+
+    try:
+        return await storage_response(request, storage_key, media_type, filename, etag=etag, immutable=versioned)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="图片文件不存在")
 
 
 @router.delete("/{record_id}/images/{image_id}", summary="删除记录图片")
 async def delete_record_image(
     record_id: int,
     image_id: int,
-    db: Session = Depends(get_db),
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """删除记录图片"""
     # 检查图片是否存在
-    image = db.query(RecordImage).filter(
+    image = await db.scalar(select(RecordImage).where(
         RecordImage.id == image_id,
         RecordImage.record_id == record_id
-    ).first()
+    ))
 
     if not image:
         raise HTTPException(status_code=404, detail="图片不存在")
 
     # 检查权限
-    record = db.query(Record).filter(Record.id == record_id).first()
+    record = await db.get(Record, record_id)
     if record.created_by != current_user.id and current_user.role != "admin":
         raise HTTPException(status_code=403, detail="无权删除此图片")
 
-    # 删除文件
-    file_path = Path(image.file_path)
-    if file_path.exists():
-        file_path.unlink()
-
-    # 删除缩略图（如果存在）
-    if image.thumbnail_path:
-        thumb_path = Path(image.thumbnail_path)
-        if thumb_path.exists():
-            thumb_path.unlink()
-
-    # 删除数据库记录
-    db.delete(image)
-    db.commit()
+    # 释放内容引用（最后一个引用删除时才删除文件）并删除数据库记录，文件在提交后由后台任务删除
+    releases = FileReleases()
+    await release_image(db, image, releases)
+    await db.delete(image)
+    await db.commit()
+    releases.schedule(background_tasks)
 
     return {"message": "图片删除成功", "id": image_id}
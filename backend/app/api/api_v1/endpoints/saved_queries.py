@@ -0,0 +1,199 @@
+"""
+保存的查询API
+保存常用的记录筛选条件，并缓存其命中的记录，打开时直接按缓存分页读取
+"""
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.database import get_db
+from app.core.query_budget import query_budget
+from app.models.user import User
+from app.models.record import Record
+from app.models.saved_query import SavedQuery
+from app.schemas.record import RecordListItem, RecordListResponse
+from app.schemas.saved_query import (
+    SavedQueryCreate,
+    SavedQueryUpdate,
+    SavedQueryResponse,
+    SavedQueryListResponse
+)
+from app.api.api_v1.endpoints.auth import get_current_active_user
+from app.services.counting import CountStrategy, count_cache, make_count_signature, resolve_total
+from app.services.record_query import (
+    apply_record_projection, encode_cursor, parse_record_fields, project_record
+)
+from app.services.saved_queries import rebuild_saved_query, saved_query_records_query
+
+router = APIRouter()
+
+
+async def get_own_saved_query(saved_query_id: int, db: AsyncSession, current_user: User) -> SavedQuery:
+    """获取当前用户保存的查询，不存在或不属于当前用户时报错"""
+    saved_query = await db.get(SavedQuery, saved_query_id)
+    if not saved_query:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="查询不存在"
+        )
+
+    # 保存的查询仅对所属用户可见
+    if saved_query.user_id != current_user.id:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="权限不足，只能访问自己保存的查询"
+        )
+
+    return saved_query
+
+
+@router.get("/", summary="获取保存的查询列表", response_model=SavedQueryListResponse)
+async def get_saved_queries(
+    skip: int = Query(0, ge=0, description="跳过的记录数"),
+    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取当前用户保存的查询"""
+    query = select(SavedQuery).where(SavedQuery.user_id == current_user.id)
+    total = await db.scalar(query.with_only_columns(func.count(SavedQuery.id)))
+    saved_queries = (await db.scalars(
+        query.order_by(SavedQuery.created_at.desc()).offset(skip).limit(limit)
+    )).all()
+
+    return {
+        "items": saved_queries,
+        "total": total,
+        "skip": skip,
+        "limit": limit
+    }
+
+
+@router.post("/", summary="保存查询", response_model=SavedQueryResponse)
+async def create_saved_query(
+    saved_query_data: SavedQueryCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    保存查询条件
+    - 筛选条件与记录列表接口相同
+    - 保存时生成命中记录缓存，之后随记录增删改增量更新
+    """
+    saved_query = SavedQuery(
+        name=saved_query_data.name,
+        description=saved_query_data.description,
+        filters=saved_query_data.filters.model_dump(mode="json"),
+        user_id=current_user.id
+    )
+
+    db.add(saved_query)
+    await db.flush()
+    await rebuild_saved_query(db, saved_query, current_user)
+
+    await db.commit()
+    await db.refresh(saved_query)
+
+    return saved_query
+
+
+@router.get("/{saved_query_id}", summary="获取保存的查询详情", response_model=SavedQueryResponse)
+async def get_saved_query(
+    saved_query_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取保存的查询详情"""
+    return await get_own_saved_query(saved_query_id, db, current_user)
+
+
+@router.put("/{saved_query_id}", summary="更新保存的查询", response_model=SavedQueryResponse)
+async def update_saved_query(
+    saved_query_id: int,
+    saved_query_data: SavedQueryUpdate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """更新查询名称、描述或筛选条件，筛选条件变化时重建命中记录缓存"""
+    saved_query = await get_own_saved_query(saved_query_id, db, current_user)
+
+    update_data = saved_query_data.model_dump(exclude_unset=True, exclude={"filters"})
+    for key, value in update_data.items():
+        setattr(saved_query, key, value)
+
+    if saved_query_data.filters is not None:
+        saved_query.filters = saved_query_data.filters.model_dump(mode="json")
+        await rebuild_saved_query(db, saved_query, current_user)
+
+    await db.commit()
+    await db.refresh(saved_query)
+    count_cache.invalidate("saved_queries")
+
+    return saved_query
+
+
+@router.delete("/{saved_query_id}", summary="删除保存的查询")
+async def delete_saved_query(
+    saved_query_id: int,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """删除保存的查询及其命中记录缓存"""
+    saved_query = await get_own_saved_query(saved_query_id, db, current_user)
+
+    await db.delete(saved_query)
+    await db.commit()
+    count_cache.invalidate("saved_queries")
+
+    return {"message": "查询删除成功", "id": saved_query_id}
+
+
+@router.get(
+    "/{saved_query_id}/records", summary="打开保存的查询", response_model=RecordListResponse,
+    response_model_exclude_unset=True,
+    dependencies=[Depends(query_budget("saved_queries.records", 8, 10, rows_per_record=20))]
+)
+async def get_saved_query_records(
+    saved_query_id: int,
+    limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
+    cursor: Optional[str] = Query(None, description="分页游标（传入上一页的 next_cursor）"),
+    count: CountStrategy = Query(CountStrategy.CACHED, description="总数统计策略: exact/cached/none"),
+    fields: Optional[str] = Query(None, description="返回字段(逗号分隔)，同记录列表接口"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """
+    按 (记录日期, ID) 倒序分页返回查询命中的记录
+    - 直接读取命中记录缓存，不重新执行筛选条件
+    - 缓存被标记为待重建时（如删除了筛选中用到的标签），先全量重建
+    """
+    saved_query = await get_own_saved_query(saved_query_id, db, current_user)
+    selected_fields = parse_record_fields(fields)
+
+    if saved_query.is_stale:
+        await rebuild_saved_query(db, saved_query, current_user)
+        await db.commit()
+        count_cache.invalidate("saved_queries")
+
+    query = saved_query_records_query(saved_query)
+    total = await resolve_total(
+        db, query, Record.id, count, "saved_queries", make_count_signature(None, saved_query_id=saved_query_id)
+    )
+
+    query = apply_record_projection(saved_query_records_query(saved_query, cursor), selected_fields)
+
+    # 多取一条用于判断是否还有下一页
+    records = (await db.scalars(query.limit(limit + 1))).all()
+    next_cursor = None
+    if len(records) > limit:
+        records = records[:limit]
+        next_cursor = encode_cursor(records[-1].record_date, records[-1].id)
+
+    return RecordListResponse(
+        items=[RecordListItem.model_validate(project_record(record, selected_fields)) for record in records],
+        total=total,
+        skip=0,
+        limit=limit,
+        next_cursor=next_cursor
+    )
@@ -5,8 +5,8 @@
 from typing import List, Optional
 from datetime import datetime
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, desc, or_, select
 from pydantic import BaseModel
 
 from app.core.database import get_db
@@ -52,7 +52,7 @@ class RecentActivitiesResponse(BaseModel):
 
 @router.get("/overview", summary="获取统计概览", response_model=OverviewStats)
 async def get_overview_stats(
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -63,28 +63,28 @@ async def get_overview_stats(
     is_admin = current_user.role.value == "admin"
 
     # 统计田野记录数
-    records_query = db.query(func.count(Record.id))
+    records_query = select(func.count(Record.id))
     if not is_admin:
-        records_query = records_query.filter(Record.created_by == current_user.id)
-    records_count = records_query.scalar() or 0
+        records_query = records_query.where(Record.created_by == current_user.id)
+    records_count = await db.scalar(records_query) or 0
 
     # 统计参与者数
-    participants_query = db.query(func.count(Participant.id))
+    participants_query = select(func.count(Participant.id))
     if not is_admin:
-        participants_query = participants_query.filter(Participant.created_by == current_user.id)
-    participants_count = participants_query.scalar() or 0
+        participants_query = participants_query.where(Participant.created_by == current_user.id)
+    participants_count = await db.scalar(participants_query) or 0
 
     # 统计场域数
-    fields_query = db.query(func.count(Field.id))
+    fields_query = select(func.count(Field.id))
     if not is_admin:
-        fields_query = fields_query.filter(Field.created_by == current_user.id)
-    fields_count = fields_query.scalar() or 0
+        fields_query = fields_query.where(Field.created_by == current_user.id)
+    fields_count = await db.scalar(fields_query) or 0
 
     # 统计标签数
-    tags_query = db.query(func.count(Tag.id))
+    tags_query = select(func.count(Tag.id))
     if not is_admin:
-        tags_query = tags_query.filter(Tag.created_by == current_user.id)
-    tags_count = tags_query.scalar() or 0
+        tags_query = tags_query.where(Tag.created_by == current_user.id)
+    tags_count = await db.scalar(tags_query) or 0
 
     return OverviewStats(
         records_count=records_count,
@@ -97,7 +97,7 @@ async def get_overview_stats(
 @router.get("/recent-activities", summary="获取最近活动", response_model=RecentActivitiesResponse)
 async def get_recent_activities(
     limit: int = Query(10, ge=1, le=50, description="返回的活动数量"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -110,13 +110,13 @@ async def get_recent_activities(
     activities: List[RecentActivity] = []
 
     # 获取最近的田野记录
-    records_query = db.query(Record).join(User, Record.created_by == User.id)
+    records_query = select(Record).join(User, Record.created_by == User.id)
     if not is_admin:
-        records_query = records_query.filter(Record.created_by == current_user.id)
-    recent_records = records_query.order_by(desc(Record.created_at)).limit(limit).all()
+        records_query = records_query.where(Record.created_by == current_user.id)
+    recent_records = (await db.scalars(records_query.order_by(desc(Record.created_at)).limit(limit))).all()
 
     for record in recent_records:
-        creator = db.query(User).filter(User.id == record.created_by).first()
+        creator = await db.get(User, record.created_by)
         activities.append(RecentActivity(
             id=record.id,
             type="record",
@@ -127,13 +127,15 @@ async def get_recent_activities(
         ))
 
     # 获取最近的参与者
-    participants_query = db.query(Participant)
+    participants_query = select(Participant)
     if not is_admin:
-        participants_query = participants_query.filter(Participant.created_by == current_user.id)
-    recent_participants = participants_query.order_by(desc(Participant.created_at)).limit(limit).all()
+        participants_query = participants_query.where(Participant.created_by == current_user.id)
+    recent_participants = (await db.scalars(
+        participants_query.order_by(desc(Participant.created_at)).limit(limit)
+    )).all()
 
     for participant in recent_participants:
-        creator = db.query(User).filter(User.id == participant.created_by).first()
+        creator = await db.get(User, participant.created_by)
         activities.append(RecentActivity(
             id=participant.id,
             type="participant",
@@ -144,13 +146,13 @@ async def get_recent_activities(
         ))
 
     # 获取最近的场域
-    fields_query = db.query(Field)
+    fields_query = select(Field)
     if not is_admin:
-        fields_query = fields_query.filter(Field.created_by == current_user.id)
-    recent_fields = fields_query.order_by(desc(Field.created_at)).limit(limit).all()
+        fields_query = fields_query.where(Field.created_by == current_user.id)
+    recent_fields = (await db.scalars(fields_query.order_by(desc(Field.created_at)).limit(limit))).all()
 
     for field in recent_fields:
-        creator = db.query(User).filter(User.id == field.created_by).first()
+        creator = await db.get(User, field.created_by)
         # 使用 Field 模型的 full_location 属性构建完整地点标题
         field_title = field.full_location
 
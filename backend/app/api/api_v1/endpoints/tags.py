@@ -3,13 +3,17 @@
 """
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy import func, select
 
 from app.core.database import get_db
 from app.models.user import User
 from app.models.tag import Tag, TagCategory, TagCategoryType
 from app.api.api_v1.endpoints.auth import get_current_active_user
+from app.services.bitmap_index import relation_index
+from app.services.saved_queries import mark_saved_queries_stale
+from app.services.counting import CountStrategy, count_cache, make_count_signature, resolve_total
 from app.schemas.tag import (
     TagCategoryCreate,
     TagCategoryUpdate,
@@ -28,7 +32,7 @@ router = APIRouter()
 @router.get("/categories", summary="获取标签分类列表")
 async def get_tag_categories(
     type: Optional[TagCategoryType] = Query(None, description="分类类型"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -36,17 +40,21 @@ async def get_tag_categories(
     - 可选按类型筛选
     - 返回每个分类下的标签数量
     """
-    query = db.query(TagCategory)
+    query = select(TagCategory)
 
     if type:
-        query = query.filter(TagCategory.type == type)
+        query = query.where(TagCategory.type == type)
 
-    categories = query.order_by(TagCategory.created_at.desc()).all()
+    categories = (await db.scalars(query.order_by(TagCategory.created_at.desc()))).all()
+
+    # 计算每个分类下的标签数量（一次分组统计）
+    tag_counts = dict((await db.execute(
+        select(Tag.category_id, func.count(Tag.id)).group_by(Tag.category_id)
+    )).all())
 
-    # 计算每个分类下的标签数量
     result = []
     for category in categories:
-        tag_count = db.query(func.count(Tag.id)).filter(Tag.category_id == category.id).scalar()
+        tag_count = tag_counts.get(category.id, 0)
         result.append({
             "id": category.id,
             "name": category.name,
@@ -64,7 +72,7 @@ async def get_tag_categories(
 @router.post("/categories", summary="创建标签分类", response_model=TagCategoryResponse)
 async def create_tag_category(
     category_data: TagCategoryCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -72,7 +80,7 @@ async def create_tag_category(
     - 分类名称不能重复
     """
     # 检查分类名是否已存在
-    existing = db.query(TagCategory).filter(TagCategory.name == category_data.name).first()
+    existing = await db.scalar(select(TagCategory).where(TagCategory.name == category_data.name))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -88,8 +96,8 @@ async def create_tag_category(
     )
 
     db.add(category)
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
 
     return {
         "id": category.id,
@@ -106,18 +114,18 @@ async def create_tag_category(
 @router.get("/categories/{category_id}", summary="获取标签分类详情")
 async def get_tag_category(
     category_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取标签分类详情"""
-    category = db.query(TagCategory).filter(TagCategory.id == category_id).first()
+    category = await db.get(TagCategory, category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="分类不存在"
         )
 
-    tag_count = db.query(func.count(Tag.id)).filter(Tag.category_id == category.id).scalar()
+    tag_count = await db.scalar(select(func.count(Tag.id)).where(Tag.category_id == category.id))
 
     return {
         "id": category.id,
@@ -135,7 +143,7 @@ async def get_tag_category(
 async def update_tag_category(
     category_id: int,
     category_data: TagCategoryUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -143,7 +151,7 @@ async def update_tag_category(
     - 管理员可以更新所有分类
     """
     # 查找分类
-    category = db.query(TagCategory).filter(TagCategory.id == category_id).first()
+    category = await db.get(TagCategory, category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -159,7 +167,7 @@ async def update_tag_category(
 
     # 如果更新名称，检查是否重复
     if category_data.name and category_data.name != category.name:
-        existing = db.query(TagCategory).filter(TagCategory.name == category_data.name).first()
+        existing = await db.scalar(select(TagCategory).where(TagCategory.name == category_data.name))
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -171,10 +179,10 @@ async def update_tag_category(
     for key, value in update_data.items():
         setattr(category, key, value)
 
-    db.commit()
-    db.refresh(category)
+    await db.commit()
+    await db.refresh(category)
 
-    tag_count = db.query(func.count(Tag.id)).filter(Tag.category_id == category.id).scalar()
+    tag_count = await db.scalar(select(func.count(Tag.id)).where(Tag.category_id == category.id))
 
     return {
         "id": category.id,
@@ -191,7 +199,7 @@ async def update_tag_category(
 @router.delete("/categories/{category_id}", summary="删除标签分类")
 async def delete_tag_category(
     category_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -199,7 +207,7 @@ async def delete_tag_category(
     - 如果分类下有标签，不能删除
     - 只有管理员可以删除分类
     """
-    category = db.query(TagCategory).filter(TagCategory.id == category_id).first()
+    category = await db.get(TagCategory, category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -214,28 +222,42 @@ async def delete_tag_category(
         )
 
     # 检查是否有标签使用此分类
-    tag_count = db.query(func.count(Tag.id)).filter(Tag.category_id == category_id).scalar()
+    tag_count = await db.scalar(select(func.count(Tag.id)).where(Tag.category_id == category_id))
     if tag_count > 0:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"该分类下还有 {tag_count} 个标签，请先删除或移动这些标签"
         )
 
-    db.delete(category)
-    db.commit()
+    await db.delete(category)
+    await db.commit()
 
     return {"message": "分类删除成功", "id": category_id}
 
 
 # ============ 标签 API ============
 
+def filter_tags(query, category_id: Optional[int], search: Optional[str]):
+    """为标签查询添加筛选条件"""
+    # 分类筛选
+    if category_id:
+        query = query.filter(Tag.category_id == category_id)
+
+    # 搜索
+    if search:
+        query = query.filter(Tag.name.contains(search))
+
+    return query
+
+
 @router.get("/", summary="获取标签列表", response_model=TagListResponse)
 async def get_tags(
     skip: int = Query(0, ge=0, description="跳过的记录数"),
     limit: int = Query(100, ge=1, le=1000, description="返回的记录数"),
     category_id: Optional[int] = Query(None, description="分类ID"),
     search: Optional[str] = Query(None, description="搜索关键词"),
-    db: Session = Depends(get_db),
+    count: CountStrategy = Query(CountStrategy.EXACT, description="总数统计策略: exact/cached/none"),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -243,25 +265,21 @@ async def get_tags(
     - 支持按分类筛选
     - 支持按名称搜索
     - 支持分页
+    - 总数可精确统计、缓存或不统计（count=none 时 total 为空）
     """
-    query = db.query(Tag).options(joinedload(Tag.category))
-
-    # 分类筛选
-    if category_id:
-        query = query.filter(Tag.category_id == category_id)
+    query = filter_tags(select(Tag), category_id, search)
 
-    # 搜索
-    if search:
-        query = query.filter(Tag.name.contains(search))
+    # 获取总数（分页前，统计时不需要关联分类）
+    total = await resolve_total(
+        db, query, Tag.id, count, "tags",
+        make_count_signature(None, category_id=category_id, search=search)
+    )
 
     # 按创建时间倒序
-    query = query.order_by(Tag.created_at.desc())
-
-    # 获取总数（分页前）
-    total = query.count()
+    query = query.options(joinedload(Tag.category)).order_by(Tag.created_at.desc())
 
     # 分页
-    tags = query.offset(skip).limit(limit).all()
+    tags = (await db.scalars(query.offset(skip).limit(limit))).all()
 
     return TagListResponse(
         items=tags,
@@ -271,10 +289,31 @@ async def get_tags(
     )
 
 
+@router.get("/count", summary="获取标签总数")
+async def count_tags(
+    category_id: Optional[int] = Query(None, description="分类ID"),
+    search: Optional[str] = Query(None, description="搜索关键词"),
+    count: CountStrategy = Query(CountStrategy.CACHED, description="总数统计策略: exact/cached"),
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_active_user)
+):
+    """获取符合筛选条件的标签总数，供前端在列表加载后按需获取"""
+    if count == CountStrategy.NONE:
+        count = CountStrategy.EXACT
+
+    query = filter_tags(select(Tag), category_id, search)
+    total = await resolve_total(
+        db, query, Tag.id, count, "tags",
+        make_count_signature(None, category_id=category_id, search=search)
+    )
+
+    return {"total": total}
+
+
 @router.post("/", summary="创建标签", response_model=TagResponse)
 async def create_tag(
     tag_data: TagCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -282,7 +321,7 @@ async def create_tag(
     - 标签名在同一分类下不能重复
     """
     # 检查分类是否存在
-    category = db.query(TagCategory).filter(TagCategory.id == tag_data.category_id).first()
+    category = await db.get(TagCategory, tag_data.category_id)
     if not category:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -290,10 +329,10 @@ async def create_tag(
         )
 
     # 检查同一分类下是否有重名标签
-    existing = db.query(Tag).filter(
+    existing = await db.scalar(select(Tag).where(
         Tag.name == tag_data.name,
         Tag.category_id == tag_data.category_id
-    ).first()
+    ))
     if existing:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -310,12 +349,12 @@ async def create_tag(
     )
 
     db.add(tag)
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
+    count_cache.invalidate("tags")
 
     # 重新加载以获取关联的category
-    db.refresh(tag)
-    tag = db.query(Tag).options(joinedload(Tag.category)).filter(Tag.id == tag.id).first()
+    await db.refresh(tag, ["category"])
 
     return tag
 
@@ -323,11 +362,11 @@ async def create_tag(
 @router.get("/{tag_id}", summary="获取标签详情", response_model=TagResponse)
 async def get_tag(
     tag_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取标签详情"""
-    tag = db.query(Tag).options(joinedload(Tag.category)).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id, options=[joinedload(Tag.category)])
     if not tag:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -341,7 +380,7 @@ async def get_tag(
 async def update_tag(
     tag_id: int,
     tag_data: TagUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -350,7 +389,7 @@ async def update_tag(
     - 管理员可以编辑任何标签
     """
     # 查找标签
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id)
     if not tag:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -366,7 +405,7 @@ async def update_tag(
 
     # 如果更新分类，检查新分类是否存在
     if tag_data.category_id and tag_data.category_id != tag.category_id:
-        category = db.query(TagCategory).filter(TagCategory.id == tag_data.category_id).first()
+        category = await db.get(TagCategory, tag_data.category_id)
         if not category:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -376,11 +415,11 @@ async def update_tag(
     # 如果更新名称，检查同一分类下是否有重名
     new_category_id = tag_data.category_id or tag.category_id
     if tag_data.name and tag_data.name != tag.name:
-        existing = db.query(Tag).filter(
+        existing = await db.scalar(select(Tag).where(
             Tag.name == tag_data.name,
             Tag.category_id == new_category_id,
             Tag.id != tag_id
-        ).first()
+        ))
         if existing:
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
@@ -392,11 +431,12 @@ async def update_tag(
     for key, value in update_data.items():
         setattr(tag, key, value)
 
-    db.commit()
-    db.refresh(tag)
+    await db.commit()
+    await db.refresh(tag)
+    count_cache.invalidate("tags")
 
     # 重新加载关联
-    tag = db.query(Tag).options(joinedload(Tag.category)).filter(Tag.id == tag.id).first()
+    await db.refresh(tag, ["category"])
 
     return tag
 
@@ -404,7 +444,7 @@ async def update_tag(
 @router.delete("/{tag_id}", summary="删除标签")
 async def delete_tag(
     tag_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """
@@ -412,7 +452,7 @@ async def delete_tag(
     - 研究者只能删除自己创建的标签
     - 管理员可以删除任何标签
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    tag = await db.get(Tag, tag_id)
     if not tag:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -426,7 +466,12 @@ async def delete_tag(
             detail="权限不足，只能删除自己创建的标签"
         )
 
-    db.delete(tag)
-    db.commit()
+    # 使用该标签筛选的保存查询需要重建结果缓存
+    await mark_saved_queries_stale(db, "tag_ids", "tag_expr")
+
+    await db.delete(tag)
+    await db.commit()
+    count_cache.invalidate("tags", "records", "saved_queries")
+    relation_index.remove_tag(tag_id)
 
     return {"message": "标签删除成功", "id": tag_id}
@@ -3,7 +3,9 @@
 """
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
 from app.core.security import get_password_hash, verify_password
@@ -31,15 +33,15 @@ async def get_users(
     search: Optional[str] = Query(None, description="搜索关键词"),
     role: Optional[str] = Query(None, description="角色筛选"),
     is_active: Optional[bool] = Query(None, description="状态筛选"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
 ):
     """获取用户列表 (仅管理员)"""
-    query = db.query(User)
+    query = select(User)
     
     # 搜索
     if search:
-        query = query.filter(
+        query = query.where(
             (User.username.contains(search)) |
             (User.email.contains(search)) |
             (User.full_name.contains(search))
@@ -47,39 +49,39 @@ async def get_users(
     
     # 角色筛选
     if role:
-        query = query.filter(User.role == role)
+        query = query.where(User.role == role)
     
     # 状态筛选
     if is_active is not None:
-        query = query.filter(User.is_active == is_active)
+        query = query.where(User.is_active == is_active)
     
-    users = query.order_by(User.created_at.desc()).offset(skip).limit(limit).all()
+    users = (await db.scalars(query.order_by(User.created_at.desc()).offset(skip).limit(limit))).all()
     return users
 
 
 @router.post("/", response_model=UserResponse, summary="创建用户")
 async def create_user(
     user_data: UserCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
 ):
     """创建新用户 (仅管理员)"""
     # 检查用户名是否已存在
-    if db.query(User).filter(User.username == user_data.username).first():
+    if await db.scalar(select(User.id).where(User.username == user_data.username)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="用户名已存在"
         )
     
     # 检查邮箱是否已存在
-    if db.query(User).filter(User.email == user_data.email).first():
+    if await db.scalar(select(User.id).where(User.email == user_data.email)):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="邮箱已存在"
         )
     
-    # 创建用户
-    hashed_password = get_password_hash(user_data.password)
+    # 创建用户（bcrypt 哈希在线程池中计算）
+    hashed_password = await run_in_threadpool(get_password_hash, user_data.password)
     db_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -90,8 +92,8 @@ async def create_user(
     )
     
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     
     return db_user
 
@@ -99,7 +101,7 @@ async def create_user(
 @router.get("/{user_id}", response_model=UserResponse, summary="获取用户详情")
 async def get_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """获取用户详情"""
@@ -110,7 +112,7 @@ async def get_user(
             detail="权限不足"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -124,7 +126,7 @@ async def get_user(
 async def update_user(
     user_id: int,
     user_data: UserUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """更新用户信息"""
@@ -135,7 +137,7 @@ async def update_user(
             detail="权限不足"
         )
     
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -153,8 +155,8 @@ async def update_user(
         if value is not None:
             setattr(user, field, value)
     
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
     
     return user
 
@@ -162,11 +164,11 @@ async def update_user(
 @router.delete("/{user_id}", summary="删除用户")
 async def delete_user(
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
 ):
     """删除用户 (仅管理员)"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -180,8 +182,8 @@ async def delete_user(
             detail="不能删除自己的账号"
         )
     
-    db.delete(user)
-    db.commit()
+    await db.delete(user)
+    await db.commit()
     
     return {"message": "用户删除成功"}
 
@@ -190,11 +192,11 @@ async def delete_user(
 async def change_password(
     user_id: int,
     password_data: PasswordChange,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_active_user)
 ):
     """修改用户密码"""
-    user = db.query(User).filter(User.id == user_id).first()
+    user = await db.get(User, user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -218,14 +220,14 @@ async def change_password(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="请提供旧密码"
             )
-        if not verify_password(password_data.old_password, user.hashed_password):
+        if not await run_in_threadpool(verify_password, password_data.old_password, user.hashed_password):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="旧密码错误"
             )
     
     # 更新密码
-    user.hashed_password = get_password_hash(password_data.new_password)
-    db.commit()
+    user.hashed_password = await run_in_threadpool(get_password_hash, password_data.new_password)
+    await db.commit()
     
     return {"message": "密码修改成功"}
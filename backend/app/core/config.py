@@ -12,6 +12,7 @@ class Settings(BaseSettings):
     APP_NAME: str = "田野笔记系统"
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = True
+    QUERY_BUDGET_ENFORCE: bool = False  # 接口查询次数超出预算时请求失败（测试/开发环境开启），否则只记录警告
 
     # 数据库配置
     DATABASE_URL: str
@@ -20,6 +21,8 @@ class Settings(BaseSettings):
     DB_USER: str = "root"
     DB_PASSWORD: str = "root"
     DB_NAME: str = "fieldwork_notes"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
 
     # JWT配置
     SECRET_KEY: str
@@ -29,7 +32,48 @@ class Settings(BaseSettings):
     # 文件上传配置
     UPLOAD_DIR: str = "uploads"
     MAX_FILE_SIZE: int = 5242880  # 5MB
+    MAX_BATCH_UPLOAD_FILES: int = 50  # 批量上传单次最多文件数
+    MAX_BATCH_UPLOAD_SIZE: int = 209715200  # 200MB，批量上传单次请求总大小上限
     ALLOWED_EXTENSIONS: str = "jpg,jpeg,png,webp"
+    IMAGE_WORKERS: int = 2  # 生成缩略图等衍生图的进程数
+    IMAGE_CACHE_DIR: str = "cache/images"  # 按需缩放/转码图片的磁盘缓存目录
+    IMAGE_CACHE_MAX_BYTES: int = 536870912  # 512MB，超出后按最近最少使用淘汰
+
+    # 文件存储后端：local（UPLOAD_DIR 下的本地磁盘）/ s3（S3 兼容对象存储，需要安装 boto3）
+    STORAGE_BACKEND: str = "local"
+    S3_BUCKET: str = ""
+    S3_PREFIX: str = ""  # 桶内的键前缀
+    S3_ENDPOINT_URL: str = ""  # MinIO 等自建服务的地址，AWS S3 留空
+    S3_REGION: str = ""
+    S3_ACCESS_KEY_ID: str = ""
+    S3_SECRET_ACCESS_KEY: str = ""
+    S3_PRESIGN_EXPIRES: int = 3600  # 图片下载临时 URL 的有效期（秒）
+
+    # 孤儿文件清理（存储中未被数据库引用的文件）
+    ORPHAN_SWEEP_INTERVAL: int = 3600  # 清理周期（秒），0 表示不在服务进程中定期清理
+    ORPHAN_SWEEP_BATCH_SIZE: int = 500  # 每批检查的文件数
+    ORPHAN_GRACE_SECONDS: int = 3600  # 修改时间在此之内的文件不清理（可能是尚未提交的上传）
+
+    # 后台导出任务
+    EXPORT_WORKERS: int = 2  # 同时执行的导出任务数
+    EXPORT_RETENTION_SECONDS: int = 86400  # 导出文件保留时间（秒），期间数据未变化的相同导出直接复用
+    EXPORT_STALE_SECONDS: int = 600  # 执行中的任务超过此时间没有进度更新视为中断（服务重启等）
+    EXPORT_RENDER_WORKERS: int = 2  # 渲染 PDF / Word 导出的进程数
+    EXPORT_DIR: str = "exports"  # 本地存储时导出文件的目录，不能位于公开访问的 UPLOAD_DIR 之下
+
+    # 文件发送方式：direct（应用直接发送）/ x-accel（nginx X-Accel-Redirect）/ x-sendfile（X-Sendfile）
+    FILE_DELIVERY_MODE: str = "direct"
+    X_ACCEL_PREFIX: str = "/protected-files/"  # nginx 中 internal location 的前缀
+    X_ACCEL_ROOT: str = "."  # 该 location 对应（alias）的目录，文件路径相对它计算
+
+    # 列表总数缓存配置
+    COUNT_CACHE_TTL: int = 300  # 秒
+
+    # 全文检索配置（需与 MySQL 的 ngram_token_size 保持一致，设为 1 时单字检索也能命中全文索引）
+    SEARCH_NGRAM_TOKEN_SIZE: int = 1
+
+    # 标签/参与者位图索引的全量重建周期（多进程部署时用于同步其他进程的写入）
+    RELATION_INDEX_TTL: int = 60  # 秒
 
     # CORS配置
     ALLOWED_ORIGINS: str = "http://localhost:3000,http://127.0.0.1:3000"
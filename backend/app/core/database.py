@@ -1,12 +1,32 @@
 """
 数据库连接配置
+- 接口使用异步引擎与 AsyncSession（get_db），数据库 IO 不阻塞事件循环
+- 同步引擎与 Session 供迁移、脚本以及尚未迁移到异步的接口使用（get_sync_db）
 """
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
 from .config import settings
 
+# 同步驱动对应的异步驱动
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str) -> str:
+    """由同步连接串得到异步驱动的连接串"""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
 # 创建数据库引擎
 engine = create_engine(
     settings.DATABASE_URL,
@@ -15,15 +35,67 @@ engine = create_engine(
     pool_recycle=3600,    # 连接回收时间
 )
 
+def async_pool_options(url: str) -> dict:
+    """异步引擎的连接池参数（SQLite 的异步驱动不使用连接池，不支持这些参数）"""
+    if make_url(url).get_backend_name() == "sqlite":
+        return {}
+    return {
+        "pool_recycle": 3600,
+        "pool_size": settings.DB_POOL_SIZE,        # 常驻连接数
+        "max_overflow": settings.DB_MAX_OVERFLOW,  # 高峰时允许额外创建的连接数
+    }
+
+
+# 创建异步数据库引擎
+async_engine = create_async_engine(
+    async_database_url(settings.DATABASE_URL),
+    echo=settings.DEBUG,
+    pool_pre_ping=True,
+    **async_pool_options(settings.DATABASE_URL),
+)
+
+def enable_sqlite_wal(engine) -> None:
+    """
+    SQLite 使用 WAL 日志模式：默认的回滚日志模式下，未结束的读事务（如导出时的服务端游标）
+    会使其他连接的写入失败（database is locked）；WAL 模式下读写互不阻塞
+    """
+    if engine.url.get_backend_name() != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_journal_mode(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
+
+enable_sqlite_wal(engine)
+enable_sqlite_wal(async_engine.sync_engine)
+
 # 创建会话工厂
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 创建异步会话工厂（提交后不过期对象，避免在响应序列化时触发隐式 IO）
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+
 # 创建基础模型类
 Base = declarative_base()
 
 
-def get_db():
-    """获取数据库会话依赖"""
+async def get_db():
+    """获取异步数据库会话依赖"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
+    """
+    获取同步数据库会话依赖（线程池回退模式）
+    仅用于以 def（而非 async def）声明的接口，FastAPI 会在线程池中执行这类接口，
+    同步查询不会阻塞事件循环
+    """
     db = SessionLocal()
     try:
         yield db
@@ -0,0 +1,171 @@
+"""
+数据库查询预算
+统计每个请求执行的 SQL 语句数与返回行数，并检查接口声明的查询次数与返回行数上限
+"""
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class QueryBudgetExceeded(RuntimeError):
+    """接口查询次数或返回行数超出预算（QUERY_BUDGET_ENFORCE 开启时抛出）"""
+
+
+class QueryStats:
+    """单个请求（或 query_scope 中一批查询）的查询统计"""
+
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.budget: Optional[Tuple[str, int, int]] = None  # 声明的 (标识, 查询次数上限, 返回行数上限)
+
+    def check_budget(self) -> None:
+        """检查查询次数与返回行数是否超出声明的预算"""
+        if self.budget is None:
+            return
+        name, max_queries, max_rows = self.budget
+        if self.queries <= max_queries and self.rows <= max_rows:
+            return
+        message = (
+            f"接口 {name} 查询超出预算: {self.queries} 次查询（上限 {max_queries}），"
+            f"返回 {self.rows} 行（上限 {max_rows}）"
+        )
+        if settings.QUERY_BUDGET_ENFORCE:
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+# 当前请求的查询统计（由中间件在请求开始时设置）
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_query_stats() -> Optional[QueryStats]:
+    """获取当前请求的查询统计"""
+    return _current_stats.get()
+
+
+def untrack_queries() -> None:
+    """
+    在请求中创建的后台任务开头调用：任务复制了请求的上下文，
+    之后执行的查询不再计入发起它的请求
+    """
+    _current_stats.set(None)
+
+
+@contextmanager
+def query_scope(name: str, max_queries: int, max_rows: int):
+    """
+    其中执行的查询单独统计并检查预算，不计入当前请求
+    用于次数随数据量增长、按批执行的查询（如导出每批记录），每批的查询次数与行数有固定上限
+    只能包住不跨越 yield 的代码
+    """
+    stats = QueryStats()
+    stats.budget = (name, max_queries, max_rows)
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+    stats.check_budget()
+
+
+@contextmanager
+def queries_untracked():
+    """
+    其中执行的查询不计入当前请求（如导出的服务端游标：返回行数随导出数量增长，也无法得知）
+    只能包住不跨越 yield 的代码
+    """
+    token = _current_stats.set(None)
+    try:
+        yield
+    finally:
+        _current_stats.reset(token)
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    """每条 SQL 执行后累计语句数与返回行数"""
+    stats = _current_stats.get()
+    if stats is None:
+        return
+    stats.queries += 1
+    if cursor.description is not None:
+        stats.rows += _selected_rows(cursor)
+
+
+def _selected_rows(cursor) -> int:
+    """
+    查询返回的行数：MySQL 驱动（缓冲结果）由 rowcount 给出；
+    SQLite 驱动的 rowcount 恒为 -1，其异步适配层在执行时已缓冲全部结果，取缓冲的行数；
+    服务端游标无法得知，记为 0
+    """
+    if cursor.rowcount is not None and cursor.rowcount >= 0:
+        return cursor.rowcount
+    return len(getattr(cursor, "_rows", None) or ())
+
+
+class QueryStatsMiddleware:
+    """为每个请求建立查询统计，响应开始时检查接口的查询预算，调试模式下通过响应头返回统计结果"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats()
+        token = _current_stats.set(stats)
+
+        async def send_with_stats(message):
+            if message["type"] == "http.response.start":
+                stats.check_budget()
+                if settings.DEBUG:
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-db-query-count", str(stats.queries).encode()))
+                    headers.append((b"x-db-row-count", str(stats.rows).encode()))
+                    message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_stats)
+        finally:
+            _current_stats.reset(token)
+
+
+def query_budget(name: str, max_queries: int, max_rows: int, rows_per_record: int = 0, default_limit: int = 100):
+    """
+    接口查询预算依赖
+    - name 为接口标识，用于日志
+    - max_queries 为响应开始发送前（含身份认证）允许执行的 SQL 语句数，与返回的记录条数无关；
+      流式响应发送过程中的查询不计入
+    - max_rows 为同一期间数据库返回的总行数；列表接口另按分页参数 limit（缺省为 default_limit）
+      每条记录允许 rows_per_record 行。关联按 IN 查询批量加载时行数随参与者、标签数线性增长，
+      多个一对多关联 JOIN 在一起时按乘积增长，会超出预算
+    - 超出预算时记录警告日志，用于发现 N+1 查询等退化；QUERY_BUDGET_ENFORCE 开启时请求失败（500），
+      测试与开发环境中直接暴露退化
+    """
+    async def declare_budget(request: Request):
+        stats = _current_stats.get()
+        if stats is None:
+            return
+        rows = max_rows
+        if rows_per_record:
+            try:
+                limit = int(request.query_params.get("limit", default_limit))
+            except ValueError:
+                limit = default_limit
+            rows += rows_per_record * limit
+        stats.budget = (name, max_queries, rows)
+
+    return declare_budget
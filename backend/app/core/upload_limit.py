@@ -0,0 +1,103 @@
+"""
+上传请求大小限制
+FastAPI 会在调用接口前完整解析 multipart 请求体，接口内的大小检查无法阻止超大请求被接收；
+该中间件在读取请求体之前按 Content-Length 拒绝超出上限的上传请求；
+没有 Content-Length 的分块传输请求在读取过程中累计字节数，超出上限时中止读取并返回 413
+批量上传等接口可按路径后缀单独设置上限
+"""
+import json
+from typing import Dict, Optional
+
+from fastapi import HTTPException, status
+
+
+class RequestBodyTooLarge(HTTPException):
+    """读取请求体时超出上限（HTTPException 子类：请求体解析中抛出时由 FastAPI 原样返回 413）"""
+
+    def __init__(self, max_body_size: int):
+        super().__init__(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"请求过大。最大允许大小: {max_body_size // 1024 // 1024}MB",
+            headers={"connection": "close"},
+        )
+
+
+class UploadSizeLimitMiddleware:
+    """
+    拒绝超过上限的 multipart 请求（path_limits: 路径后缀 -> 该路径的上限）
+    声明的 Content-Length 超限时直接拒绝；否则按实际接收的字节数检查
+    """
+
+    def __init__(self, app, max_body_size: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_body_size = max_body_size
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_body_size = self._limit_for(scope["path"])
+        if not self._is_multipart(scope):
+            await self.app(scope, receive, send)
+            return
+        if self._declared_too_large(scope, max_body_size):
+            await self._reject(send, max_body_size)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_size:
+                    raise RequestBodyTooLarge(max_body_size)
+            return message
+
+        async def tracked_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracked_send)
+        except RequestBodyTooLarge:
+            # 通常由异常处理返回 413；在此之前未处理（如在中间件中读取请求体）时由这里返回
+            if response_started:
+                raise
+            await self._reject(send, max_body_size)
+
+    async def _reject(self, send, max_body_size: int) -> None:
+        body = json.dumps({"detail": RequestBodyTooLarge(max_body_size).detail}, ensure_ascii=False).encode("utf-8")
+        await send({
+            "type": "http.response.start",
+            "status": status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+                (b"connection", b"close"),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+    def _limit_for(self, path: str) -> int:
+        for suffix, limit in self.path_limits.items():
+            if path.rstrip("/").endswith(suffix):
+                return limit
+        return self.max_body_size
+
+    def _is_multipart(self, scope) -> bool:
+        headers = dict(scope.get("headers", []))
+        return headers.get(b"content-type", b"").startswith(b"multipart/form-data")
+
+    def _declared_too_large(self, scope, max_body_size: int) -> bool:
+        headers = dict(scope.get("headers", []))
+        try:
+            return int(headers.get(b"content-length", b"0")) > max_body_size
+        except ValueError:
+            return False
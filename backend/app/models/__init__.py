@@ -6,7 +6,9 @@ from .user import User
 from .participant import Participant
 from .field import Field
 from .tag import Tag, TagCategory
-from .record import Record, RecordImage
+from .record import Record, RecordImage, ImageBlob, RecordSearchIndex
+from .saved_query import SavedQuery
+from .export_job import ExportJob, ExportJobStatus
 
 __all__ = [
     "Base",
@@ -17,4 +19,9 @@ __all__ = [
     "TagCategory",
     "Record",
     "RecordImage",
+    "ImageBlob",
+    "RecordSearchIndex",
+    "SavedQuery",
+    "ExportJob",
+    "ExportJobStatus",
 ]
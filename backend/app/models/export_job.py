@@ -0,0 +1,63 @@
+"""
+导出任务模型
+"""
+import enum
+
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Enum, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+
+class ExportJobStatus(str, enum.Enum):
+    """导出任务状态"""
+    PENDING = "pending"      # 排队中
+    RUNNING = "running"      # 导出中
+    COMPLETED = "completed"  # 已完成
+    FAILED = "failed"        # 失败
+
+
+class ExportJob(Base):
+    """导出任务模型"""
+    __tablename__ = "export_jobs"
+
+    id = Column(Integer, primary_key=True, index=True, comment="任务ID")
+
+    # 导出内容
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="提交用户ID")
+    format = Column(String(20), nullable=False, comment="导出格式")
+    record_ids = Column(JSON, nullable=True, comment="指定导出的记录ID列表，为空导出全部")
+
+    # 缓存复用：相同内容标识且数据版本一致的已完成任务可直接复用
+    fingerprint = Column(String(64), nullable=False, comment="内容标识（用户、格式、记录范围的摘要）")
+    data_version = Column(String(64), nullable=False, comment="提交时的数据版本（导出范围内数据的聚合摘要）")
+
+    # 执行状态与进度
+    status = Column(Enum(ExportJobStatus), default=ExportJobStatus.PENDING, nullable=False, comment="任务状态")
+    processed_count = Column(Integer, default=0, nullable=False, comment="已处理记录数")
+    total_count = Column(Integer, default=0, nullable=False, comment="记录总数")
+    error = Column(Text, nullable=True, comment="失败原因")
+
+    # 导出文件
+    file_key = Column(String(500), nullable=True, comment="导出文件存储键")
+    file_size = Column(Integer, nullable=True, comment="导出文件大小(字节)")
+
+    # 时间戳（除创建时间外均由应用写入，用于进度心跳与过期清理）
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    started_at = Column(DateTime(timezone=True), nullable=True, comment="开始时间")
+    progress_at = Column(DateTime(timezone=True), nullable=True, comment="最近一次进度更新时间")
+    finished_at = Column(DateTime(timezone=True), nullable=True, comment="完成时间")
+
+    # 关系
+    owner = relationship("User", backref="export_jobs")
+
+    __table_args__ = (
+        Index("ix_export_jobs_fingerprint_version", "fingerprint", "data_version"),
+        Index("ix_export_jobs_user_id_created_at", "user_id", "created_at"),
+        Index("ix_export_jobs_status", "status"),
+        Index("ix_export_jobs_finished_at", "finished_at"),
+    )
+
+    def __repr__(self):
+        return f"<ExportJob(id={self.id}, format='{self.format}', status='{self.status}')>"
@@ -1,7 +1,7 @@
 """
 场域模型
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Float
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Float, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -39,6 +39,10 @@ class Field(Base):
     
     # 关系
     creator = relationship("User", backref="created_fields")
+
+    __table_args__ = (
+        Index("ix_fields_created_by_created_at", "created_by", "created_at"),
+    )
     
     def __repr__(self):
         return f"<Field(id={self.id}, location='{self.location}')>"
@@ -1,7 +1,7 @@
 """
 参与者模型
 """
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 
@@ -46,6 +46,10 @@ class Participant(Base):
     
     # 关系
     creator = relationship("User", backref="created_participants")
+
+    __table_args__ = (
+        Index("ix_participants_created_by_created_at", "created_by", "created_at"),
+    )
     
     def __repr__(self):
         return f"<Participant(id={self.id}, name='{self.name_or_code}')>"
@@ -1,7 +1,8 @@
 """
 记录模型
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Enum, Table
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Enum, Table, Index
+from sqlalchemy.dialects.mysql import LONGTEXT
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -13,7 +14,9 @@ record_participants = Table(
     'record_participants',
     Base.metadata,
     Column('record_id', Integer, ForeignKey('records.id'), primary_key=True),
-    Column('participant_id', Integer, ForeignKey('participants.id'), primary_key=True)
+    Column('participant_id', Integer, ForeignKey('participants.id'), primary_key=True),
+    # 按参与者反查记录
+    Index('ix_record_participants_participant_id', 'participant_id', 'record_id')
 )
 
 # 记录与标签的多对多关联表
@@ -21,7 +24,9 @@ record_tags = Table(
     'record_tags',
     Base.metadata,
     Column('record_id', Integer, ForeignKey('records.id'), primary_key=True),
-    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True)
+    Column('tag_id', Integer, ForeignKey('tags.id'), primary_key=True),
+    # 按标签反查记录
+    Index('ix_record_tags_tag_id', 'tag_id', 'record_id')
 )
 
 
@@ -76,11 +81,44 @@ class Record(Base):
     creator = relationship("User", backref="created_records")
     participants = relationship("Participant", secondary=record_participants, backref="records")
     tags = relationship("Tag", secondary=record_tags, backref="records")
+
+    __table_args__ = (
+        Index("ix_records_created_by_record_date", "created_by", "record_date"),
+        Index("ix_records_created_by_created_at", "created_by", "created_at"),
+        Index("ix_records_record_date", "record_date"),
+        Index("ix_records_field_id_record_date", "field_id", "record_date"),
+    )
     
     def __repr__(self):
         return f"<Record(id={self.id}, title='{self.title}', type='{self.type}')>"
 
 
+class ImageBlob(Base):
+    """
+    图片内容模型（按 SHA-256 内容寻址）
+    内容相同的图片共用一个文件及其衍生图，ref_count 为引用它的记录图片数，归零时删除文件
+    """
+    __tablename__ = "image_blobs"
+
+    content_hash = Column(String(64), primary_key=True, comment="文件内容SHA-256摘要")
+
+    # 文件信息
+    file_path = Column(String(500), nullable=False, comment="文件路径")
+    thumbnail_path = Column(String(500), nullable=True, comment="缩略图路径")
+    medium_path = Column(String(500), nullable=True, comment="中等尺寸图路径")
+    file_size = Column(Integer, nullable=False, comment="文件大小(字节)")
+    width = Column(Integer, nullable=True, comment="原图宽度(像素，按EXIF方向)，生成衍生图时写入")
+
+    # 引用计数
+    ref_count = Column(Integer, nullable=False, default=0, comment="引用该内容的图片数")
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+
+    def __repr__(self):
+        return f"<ImageBlob(content_hash='{self.content_hash}', ref_count={self.ref_count})>"
+
+
 class RecordImage(Base):
     """记录图片模型"""
     __tablename__ = "record_images"
@@ -95,7 +133,10 @@ class RecordImage(Base):
     original_filename = Column(String(255), nullable=False, comment="原始文件名")
     file_path = Column(String(500), nullable=False, comment="文件路径")
     thumbnail_path = Column(String(500), nullable=True, comment="缩略图路径")
+    medium_path = Column(String(500), nullable=True, comment="中等尺寸图路径")
     file_size = Column(Integer, nullable=False, comment="文件大小(字节)")
+    content_hash = Column(String(64), nullable=True, index=True, comment="文件内容SHA-256摘要")
+    width = Column(Integer, nullable=True, comment="原图宽度(像素，按EXIF方向)，生成衍生图时写入")
     mime_type = Column(String(100), nullable=False, comment="MIME类型")
     
     # 图片描述
@@ -109,6 +150,36 @@ class RecordImage(Base):
     
     # 关系
     record = relationship("Record", backref="images")
+
+    __table_args__ = (
+        Index("ix_record_images_record_id_sort_order", "record_id", "sort_order"),
+    )
     
     def __repr__(self):
         return f"<RecordImage(id={self.id}, filename='{self.filename}')>"
+
+
+class RecordSearchIndex(Base):
+    """记录全文检索索引模型（MySQL ngram 全文索引，按 ngram_token_size 切分中文）"""
+    __tablename__ = "record_search_index"
+
+    record_id = Column(
+        Integer, ForeignKey("records.id", ondelete="CASCADE"), primary_key=True, comment="记录ID"
+    )
+
+    # 检索文本
+    title = Column(String(200), nullable=False, comment="记录标题")
+    body = Column(Text().with_variant(LONGTEXT(), "mysql"), nullable=False, comment="记录内容全文")
+
+    # 时间戳
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    __table_args__ = (
+        Index(
+            "ft_record_search_title_body", "title", "body",
+            mysql_prefix="FULLTEXT", mysql_with_parser="ngram"
+        ),
+    )
+
+    def __repr__(self):
+        return f"<RecordSearchIndex(record_id={self.record_id})>"
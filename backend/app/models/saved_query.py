@@ -0,0 +1,54 @@
+"""
+保存的查询模型
+"""
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, JSON, Boolean, Table, Index
+from sqlalchemy.sql import func
+from sqlalchemy.orm import relationship
+
+from app.core.database import Base
+
+# 保存的查询与命中记录的关联表（查询结果缓存）
+# 冗余记录日期，使打开查询时可直接按 (查询ID, 记录日期, 记录ID) 索引顺序分页
+saved_query_records = Table(
+    'saved_query_records',
+    Base.metadata,
+    Column('saved_query_id', Integer, ForeignKey('saved_queries.id', ondelete='CASCADE'), primary_key=True),
+    Column('record_id', Integer, ForeignKey('records.id', ondelete='CASCADE'), primary_key=True),
+    Column('record_date', DateTime(timezone=True), nullable=False),
+    Index('ix_saved_query_records_query_date', 'saved_query_id', 'record_date', 'record_id'),
+    # 记录变更时按记录反查所在的查询结果
+    Index('ix_saved_query_records_record_id', 'record_id')
+)
+
+
+class SavedQuery(Base):
+    """保存的查询模型"""
+    __tablename__ = "saved_queries"
+
+    id = Column(Integer, primary_key=True, index=True, comment="查询ID")
+    name = Column(String(100), nullable=False, comment="查询名称")
+    description = Column(Text, nullable=True, comment="查询描述")
+
+    # 记录列表筛选条件 (JSON格式存储，结构同 RecordFilters)
+    filters = Column(JSON, nullable=False, comment="筛选条件")
+
+    # 所属用户（查询按该用户的数据权限执行）
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, comment="所属用户ID")
+
+    # 结果缓存状态：为真时下次打开前全量重建
+    is_stale = Column(Boolean, default=False, nullable=False, comment="结果缓存是否需要重建")
+    refreshed_at = Column(DateTime(timezone=True), nullable=True, comment="结果缓存重建时间")
+
+    # 时间戳
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), comment="创建时间")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), comment="更新时间")
+
+    # 关系
+    owner = relationship("User", backref="saved_queries")
+
+    __table_args__ = (
+        Index("ix_saved_queries_user_id_created_at", "user_id", "created_at"),
+    )
+
+    def __repr__(self):
+        return f"<SavedQuery(id={self.id}, name='{self.name}')>"
@@ -1,7 +1,7 @@
 """
 标签模型
 """
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey, Enum, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 import enum
@@ -58,6 +58,12 @@ class Tag(Base):
     # 关系
     category = relationship("TagCategory", backref="tags")
     creator = relationship("User", backref="created_tags")
+
+    __table_args__ = (
+        Index("ix_tags_created_by_created_at", "created_by", "created_at"),
+        Index("ix_tags_created_at", "created_at"),
+        Index("ix_tags_category_id_name", "category_id", "name"),
+    )
     
     def __repr__(self):
         return f"<Tag(id={self.id}, name='{self.name}', category='{self.category.name if self.category else None}')>"
@@ -0,0 +1,56 @@
+"""
+导出任务相关的 Pydantic 模型
+"""
+from typing import List, Optional
+from datetime import datetime
+from enum import Enum
+from pydantic import BaseModel, Field
+
+
+class ExportFormatEnum(str, Enum):
+    """导出格式"""
+    JSON = "json"
+    CSV = "csv"
+    XLSX = "xlsx"
+    MARKDOWN = "markdown"
+    ZIP = "zip"
+    PDF = "pdf"
+    DOCX = "docx"
+
+
+class ExportJobStatusEnum(str, Enum):
+    """导出任务状态"""
+    PENDING = "pending"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+
+# ============ 提交任务 ============
+class ExportJobCreate(BaseModel):
+    """提交导出任务请求"""
+    format: ExportFormatEnum = Field(..., description="导出格式")
+    record_ids: Optional[List[int]] = Field(None, description="指定导出的记录ID列表，为空则导出全部")
+
+
+# ============ 任务响应 ============
+class ExportJobResponse(BaseModel):
+    """导出任务响应"""
+    id: int
+    format: ExportFormatEnum
+    record_ids: Optional[List[int]] = None
+    status: ExportJobStatusEnum
+    processed_count: int
+    total_count: int
+    error: Optional[str] = None
+    file_size: Optional[int] = None
+
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    # 已完成时的下载地址（支持 Range 断点续传）
+    download_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
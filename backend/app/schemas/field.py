@@ -90,7 +90,7 @@ class FieldListItem(BaseModel):
 class FieldListResponse(BaseModel):
     """场域列表响应"""
     items: list[FieldListItem]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
 
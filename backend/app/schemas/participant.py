@@ -110,7 +110,7 @@ class ParticipantListItem(BaseModel):
 class ParticipantListResponse(BaseModel):
     """参与者列表响应"""
     items: list[ParticipantListItem]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
 
@@ -1,7 +1,7 @@
 """
 记录相关的 Pydantic 模型
 """
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
 from datetime import datetime
 from pydantic import BaseModel, Field
 from enum import Enum
@@ -22,6 +22,12 @@ class RecordStatusEnum(str, Enum):
     ARCHIVED = "archived"
 
 
+class RecordSortEnum(str, Enum):
+    """记录列表排序方式"""
+    DATE = "date"            # 按记录日期
+    RELEVANCE = "relevance"  # 按检索相关度（需配合 search 使用）
+
+
 # ============ 参与者简要信息 ============
 class ParticipantBrief(BaseModel):
     """参与者简要信息"""
@@ -127,35 +133,87 @@ class RecordResponse(BaseModel):
 
 
 # ============ 记录列表项 ============
+# 列表可选返回的字段（fields 参数），列字段与关联字段分开以便控制 SQL 加载
+RECORD_LIST_COLUMN_FIELDS = (
+    "title", "type", "record_date", "status", "created_at", "updated_at",
+    "content", "time_range", "duration", "field_id", "specific_location", "created_by",
+)
+RECORD_LIST_RELATION_FIELDS = ("field", "participants", "tags")
+
+# 可统计分面的字段：前三个为记录列，后两个为多对多关联
+RECORD_FACET_FIELDS = ("type", "status", "field_id", "tag_ids", "participant_ids")
+
+# 默认的精简列表字段（列表页表格所需）
+DEFAULT_RECORD_LIST_FIELDS = (
+    "title", "type", "record_date", "status", "created_at",
+    "specific_location", "field", "participants",
+)
+
+
 class RecordListItem(BaseModel):
-    """记录列表项（精简版）"""
+    """
+    记录列表项（精简版）
+    - 除 id 外均为可选字段，只返回 fields 参数请求的字段
+    """
     id: int
-    title: str
-    type: RecordTypeEnum
-    record_date: datetime
-    status: RecordStatusEnum
-    created_at: datetime
+    title: Optional[str] = None
+    type: Optional[RecordTypeEnum] = None
+    record_date: Optional[datetime] = None
+    status: Optional[RecordStatusEnum] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
 
-    # 添加 content 字段，确保编辑/查看时能获取到内容
-    content: Dict[str, Any] = Field(default_factory=dict, description="记录内容")
+    content: Optional[Dict[str, Any]] = Field(None, description="记录内容")
     time_range: Optional[str] = None
     duration: Optional[int] = None
+    field_id: Optional[int] = None
     specific_location: Optional[str] = None
+    created_by: Optional[int] = None
 
     field: Optional[FieldBrief] = None
-    participants: List[ParticipantBrief] = []
+    participants: Optional[List[ParticipantBrief]] = None
+    tags: Optional[List[TagBrief]] = None
+
+    # 检索时的关键词上下文摘要（命中词以 <mark> 标记）
+    highlights: List[str] = []
 
     class Config:
         from_attributes = True
 
 
 # ============ 记录列表响应 ============
+class FacetBucket(BaseModel):
+    """分面统计项：某个取值及其命中记录数"""
+    value: Optional[Union[int, str]] = None
+    count: int
+
+
 class RecordListResponse(BaseModel):
     """记录列表响应"""
     items: List[RecordListItem]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
+    # 游标分页：下一页游标，为空表示没有更多数据
+    next_cursor: Optional[str] = None
+    # 分面统计：按请求的字段统计当前筛选结果中各取值的记录数
+    facets: Optional[Dict[str, List[FacetBucket]]] = None
+
+
+# ============ 记录筛选条件 ============
+class RecordFilters(BaseModel):
+    """记录列表筛选条件"""
+    type: Optional[RecordTypeEnum] = None
+    status: Optional[RecordStatusEnum] = None
+    search: Optional[str] = None
+    created_by: Optional[int] = None
+    start_date: Optional[datetime] = None
+    end_date: Optional[datetime] = None
+    field_id: Optional[int] = None
+    participant_ids: List[int] = Field(default_factory=list, description="参与者ID列表")
+    tag_ids: List[int] = Field(default_factory=list, description="标签ID列表")
+    tag_expr: Optional[str] = Field(None, description="标签布尔表达式，如 1&(2|3)&!4")
+    participant_expr: Optional[str] = Field(None, description="参与者布尔表达式")
 
 
 # ============ 记录内容结构 ============
@@ -191,7 +249,9 @@ class RecordImageResponse(BaseModel):
     original_filename: str
     file_path: str
     thumbnail_path: Optional[str] = None
+    medium_path: Optional[str] = None
     file_size: int
+    content_hash: Optional[str] = None
     mime_type: str
     description: Optional[str] = None
     sort_order: int
@@ -199,6 +259,8 @@ class RecordImageResponse(BaseModel):
 
     # 生成完整的访问URL
     url: Optional[str] = None
+    thumbnail_url: Optional[str] = None  # 缩略图，尚未生成时为空
+    medium_url: Optional[str] = None     # 中等尺寸图，尚未生成时为空
 
     class Config:
         from_attributes = True
@@ -209,3 +271,18 @@ class RecordImageListResponse(BaseModel):
     items: List[RecordImageResponse]
     total: int
 
+
+class RecordImageUploadResult(BaseModel):
+    """批量上传中单个文件的结果"""
+    filename: str
+    success: bool
+    image: Optional[RecordImageResponse] = None  # 上传成功时的图片
+    error: Optional[str] = None                  # 上传失败原因
+
+
+class RecordImageBatchResponse(BaseModel):
+    """批量上传响应（items 与请求中的文件顺序一致）"""
+    items: List[RecordImageUploadResult]
+    succeeded: int
+    failed: int
+
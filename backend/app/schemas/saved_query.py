@@ -0,0 +1,50 @@
+"""
+保存的查询相关的 Pydantic 模型
+"""
+from typing import Optional
+from datetime import datetime
+from pydantic import BaseModel, Field
+
+from app.schemas.record import RecordFilters
+
+
+# ============ 创建查询 ============
+class SavedQueryCreate(BaseModel):
+    """保存查询请求"""
+    name: str = Field(..., min_length=1, max_length=100, description="查询名称")
+    description: Optional[str] = Field(None, description="查询描述")
+    filters: RecordFilters = Field(default_factory=RecordFilters, description="记录列表筛选条件")
+
+
+# ============ 更新查询 ============
+class SavedQueryUpdate(BaseModel):
+    """更新查询请求"""
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = None
+    filters: Optional[RecordFilters] = None
+
+
+# ============ 查询响应 ============
+class SavedQueryResponse(BaseModel):
+    """保存的查询响应"""
+    id: int
+    name: str
+    description: Optional[str] = None
+    filters: RecordFilters
+
+    user_id: int
+    refreshed_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+# ============ 查询列表响应 ============
+class SavedQueryListResponse(BaseModel):
+    """保存的查询列表响应"""
+    items: list[SavedQueryResponse]
+    total: Optional[int] = None
+    skip: int
+    limit: int
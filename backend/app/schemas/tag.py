@@ -112,7 +112,7 @@ class TagListItem(BaseModel):
 class TagListResponse(BaseModel):
     """标签列表响应"""
     items: List[TagListItem]
-    total: int
+    total: Optional[int] = None
     skip: int
     limit: int
 
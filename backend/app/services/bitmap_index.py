@@ -0,0 +1,431 @@
+"""
+记录关联位图索引
+在内存中为每个标签、每个参与者维护一份记录ID位图，用于多标签/多参与者的布尔组合筛选：
+- 位图采用 Roaring 思路压缩：按ID高16位分桶，稀疏桶用有序数组，稠密桶用位串
+- 支持 AND(&)、OR(|)、NOT(!) 与括号，例如 "1&2&!3"、"(1|2)&!5"
+- 记录创建/更新/删除时同步更新；多进程部署时按 RELATION_INDEX_TTL 定期全量重建
+- 全量重建在后台任务中进行（独立的数据库会话，构建位图在线程池中），完成后整体替换，
+  不阻塞请求，也不计入请求的查询预算；重建期间的增量变更在替换后重放，不会丢失
+"""
+import asyncio
+import logging
+import re
+import threading
+import time
+from array import array
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fastapi import HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.query_budget import untrack_queries
+from app.models.record import Record, record_participants, record_tags
+
+logger = logging.getLogger(__name__)
+
+# 稀疏桶（有序数组）的最大元素数，超过后转为位串
+ARRAY_CONTAINER_LIMIT = 4096
+
+Container = Union[array, int]
+
+
+def _container_to_bits(container: Container) -> int:
+    """将桶转换为位串表示"""
+    if isinstance(container, int):
+        return container
+    bits = 0
+    for value in container:
+        bits |= 1 << value
+    return bits
+
+
+def _bits_to_values(bits: int) -> Iterator[int]:
+    """遍历位串中为 1 的位"""
+    while bits:
+        low = bits & -bits
+        yield low.bit_length() - 1
+        bits ^= low
+
+
+def _compact(bits: int) -> Optional[Container]:
+    """按基数选择桶的表示方式，空桶返回 None"""
+    if not bits:
+        return None
+    if bits.bit_count() <= ARRAY_CONTAINER_LIMIT:
+        return array('H', _bits_to_values(bits))
+    return bits
+
+
+class RoaringBitmap:
+    """Roaring 风格的压缩整数位图"""
+
+    __slots__ = ("_containers",)
+
+    def __init__(self, values: Iterable[int] = ()):
+        self._containers: Dict[int, Container] = {}
+        for value in values:
+            self.add(value)
+
+    def add(self, value: int) -> None:
+        """加入一个ID"""
+        high, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(high)
+        if container is None:
+            self._containers[high] = array('H', [low])
+        elif isinstance(container, int):
+            self._containers[high] = container | (1 << low)
+        else:
+            position = _bisect(container, low)
+            if position < len(container) and container[position] == low:
+                return
+            container.insert(position, low)
+            if len(container) > ARRAY_CONTAINER_LIMIT:
+                self._containers[high] = _container_to_bits(container)
+
+    def discard(self, value: int) -> None:
+        """移除一个ID"""
+        high, low = value >> 16, value & 0xFFFF
+        container = self._containers.get(high)
+        if container is None:
+            return
+        if isinstance(container, int):
+            compacted = _compact(container & ~(1 << low))
+        else:
+            position = _bisect(container, low)
+            if position < len(container) and container[position] == low:
+                del container[position]
+            compacted = container if len(container) else None
+        if compacted is None:
+            del self._containers[high]
+        else:
+            self._containers[high] = compacted
+
+    def __contains__(self, value: int) -> bool:
+        container = self._containers.get(value >> 16)
+        if container is None:
+            return False
+        low = value & 0xFFFF
+        if isinstance(container, int):
+            return bool(container >> low & 1)
+        position = _bisect(container, low)
+        return position < len(container) and container[position] == low
+
+    def __len__(self) -> int:
+        return sum(
+            container.bit_count() if isinstance(container, int) else len(container)
+            for container in self._containers.values()
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self._containers)
+
+    def __iter__(self) -> Iterator[int]:
+        for high in sorted(self._containers):
+            container = self._containers[high]
+            base = high << 16
+            values = _bits_to_values(container) if isinstance(container, int) else container
+            for low in values:
+                yield base | low
+
+    def _combine(self, other: "RoaringBitmap", highs: Iterable[int], operation) -> "RoaringBitmap":
+        result = RoaringBitmap()
+        for high in highs:
+            left = self._containers.get(high)
+            right = other._containers.get(high)
+            container = _compact(operation(
+                _container_to_bits(left) if left is not None else 0,
+                _container_to_bits(right) if right is not None else 0,
+            ))
+            if container is not None:
+                result._containers[high] = container
+        return result
+
+    def __and__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        highs = self._containers.keys() & other._containers.keys()
+        return self._combine(other, highs, lambda a, b: a & b)
+
+    def __or__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        highs = self._containers.keys() | other._containers.keys()
+        return self._combine(other, highs, lambda a, b: a | b)
+
+    def __sub__(self, other: "RoaringBitmap") -> "RoaringBitmap":
+        return self._combine(other, list(self._containers), lambda a, b: a & ~b)
+
+
+def _bisect(container: array, value: int) -> int:
+    """有序数组二分查找插入位置"""
+    low, high = 0, len(container)
+    while low < high:
+        middle = (low + high) // 2
+        if container[middle] < value:
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+# ============ 布尔表达式 ============
+
+_TOKEN_PATTERN = re.compile(r"\s*(?:(\d+)|(AND|OR|NOT)\b|([&|!()]))", re.IGNORECASE)
+_WORD_OPERATORS = {"AND": "&", "OR": "|", "NOT": "!"}
+
+# 括号与取反的最大嵌套层数，避免深层嵌套耗尽递归栈
+MAX_EXPRESSION_DEPTH = 32
+
+
+def _tokenize(expression: str) -> List[str]:
+    tokens = []
+    position = 0
+    expression = expression.rstrip()
+    while position < len(expression):
+        matched = _TOKEN_PATTERN.match(expression, position)
+        if not matched:
+            raise ValueError(f"无法解析的位置: {position}")
+        number, word, symbol = matched.groups()
+        tokens.append(number or _WORD_OPERATORS.get((word or "").upper()) or symbol)
+        position = matched.end()
+    return tokens
+
+
+class _ExpressionParser:
+    """
+    递归下降解析布尔表达式
+    expr   := term ('|' term)*
+    term   := factor ('&' factor)*
+    factor := '!' factor | '(' expr ')' | ID
+    嵌套超过 MAX_EXPRESSION_DEPTH 层时抛出 ValueError
+    """
+
+    def __init__(self, tokens: List[str], lookup, universe: RoaringBitmap):
+        self.tokens = tokens
+        self.position = 0
+        self.depth = 0
+        self.lookup = lookup
+        self.universe = universe
+
+    def parse(self) -> RoaringBitmap:
+        result = self._expr()
+        if self.position != len(self.tokens):
+            raise ValueError(f"多余的符号: {self.tokens[self.position]}")
+        return result
+
+    def _peek(self) -> Optional[str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def _take(self) -> str:
+        token = self._peek()
+        if token is None:
+            raise ValueError("表达式不完整")
+        self.position += 1
+        return token
+
+    def _expr(self) -> RoaringBitmap:
+        result = self._term()
+        while self._peek() == "|":
+            self._take()
+            result = result | self._term()
+        return result
+
+    def _term(self) -> RoaringBitmap:
+        result = self._factor()
+        while self._peek() == "&":
+            self._take()
+            result = result & self._factor()
+        return result
+
+    def _factor(self) -> RoaringBitmap:
+        token = self._take()
+        if token.isdigit():
+            return self.lookup(int(token))
+        if token not in ("!", "("):
+            raise ValueError(f"意外的符号: {token}")
+
+        self.depth += 1
+        if self.depth > MAX_EXPRESSION_DEPTH:
+            raise ValueError(f"嵌套层数超过 {MAX_EXPRESSION_DEPTH}")
+        try:
+            if token == "!":
+                return self.universe - self._factor()
+            result = self._expr()
+            if self._take() != ")":
+                raise ValueError("括号不匹配")
+            return result
+        finally:
+            self.depth -= 1
+
+
+# ============ 记录关联索引 ============
+
+class RecordRelationIndex:
+    """记录与标签、参与者的内存位图索引"""
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at: Optional[float] = None
+        self.all_records = RoaringBitmap()
+        self.tags: Dict[int, RoaringBitmap] = {}
+        self.participants: Dict[int, RoaringBitmap] = {}
+        # 反向映射，用于更新/删除记录时定位所在位图
+        self._record_tags: Dict[int, List[int]] = {}
+        self._record_participants: Dict[int, List[int]] = {}
+        # 进行中的全量重建，以及重建期间发生、需要在替换后重放的增量变更
+        self._refreshing: Optional[asyncio.Task] = None
+        self._pending_changes: Optional[List[Tuple[Callable, tuple]]] = None
+
+    async def ensure_loaded(self) -> None:
+        """
+        确保索引可用
+        - 尚未加载时等待首次加载（并发的请求共用同一次加载）
+        - 超过有效期时启动后台重建，本次直接使用当前索引（本进程的变更已增量同步）
+        """
+        with self._lock:
+            loaded_at = self._loaded_at
+        if loaded_at is None:
+            await asyncio.shield(self.refresh())
+        elif time.monotonic() - loaded_at > self.ttl:
+            self.refresh()
+
+    def refresh(self) -> asyncio.Task:
+        """启动后台全量重建，已在重建时返回进行中的任务"""
+        loop = asyncio.get_running_loop()
+        task = self._refreshing
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = self._refreshing = loop.create_task(self._rebuild())
+            # 后台重建失败已记录日志，不再作为未取回的异常报告
+            task.add_done_callback(lambda done: done.cancelled() or done.exception())
+        return task
+
+    async def _rebuild(self) -> None:
+        """从数据库全量重建（三条查询），构建完成后替换当前索引"""
+        untrack_queries()
+        with self._lock:
+            self._pending_changes = []
+        try:
+            async with AsyncSessionLocal() as db:
+                record_ids = (await db.scalars(select(Record.id))).all()
+                tag_rows = (await db.execute(select(record_tags.c.record_id, record_tags.c.tag_id))).all()
+                participant_rows = (await db.execute(
+                    select(record_participants.c.record_id, record_participants.c.participant_id)
+                )).all()
+            await run_in_threadpool(self._build, record_ids, tag_rows, participant_rows)
+        except Exception:
+            logger.exception("重建记录关联索引失败")
+            raise
+        finally:
+            with self._lock:
+                self._pending_changes = None
+
+    def _build(self, record_ids: Sequence[int], tag_rows: Sequence[tuple], participant_rows: Sequence[tuple]) -> None:
+        """由查询结果构建位图并替换当前索引，随后重放构建期间的增量变更（在线程池中执行）"""
+        all_records = RoaringBitmap(record_ids)
+        tags: Dict[int, RoaringBitmap] = {}
+        record_tag_map: Dict[int, List[int]] = {}
+        for record_id, tag_id in tag_rows:
+            tags.setdefault(tag_id, RoaringBitmap()).add(record_id)
+            record_tag_map.setdefault(record_id, []).append(tag_id)
+        participants: Dict[int, RoaringBitmap] = {}
+        record_participant_map: Dict[int, List[int]] = {}
+        for record_id, participant_id in participant_rows:
+            participants.setdefault(participant_id, RoaringBitmap()).add(record_id)
+            record_participant_map.setdefault(record_id, []).append(participant_id)
+
+        with self._lock:
+            self.all_records = all_records
+            self.tags = tags
+            self.participants = participants
+            self._record_tags = record_tag_map
+            self._record_participants = record_participant_map
+            self._loaded_at = time.monotonic()
+            changes, self._pending_changes = self._pending_changes or [], None
+            for change, args in changes:
+                change(*args)
+
+    def _defer_change(self, change: Callable, *args) -> None:
+        """重建期间记录增量变更（调用方持有锁），替换索引后重放"""
+        if self._pending_changes is not None:
+            self._pending_changes.append((change, args))
+
+    def set_record_relations(self, record_id: int, tag_ids: Iterable[int], participant_ids: Iterable[int]) -> None:
+        """记录的标签/参与者变更后同步位图（未加载时无需处理）"""
+        tag_ids, participant_ids = list(tag_ids), list(participant_ids)
+        with self._lock:
+            self._defer_change(self.set_record_relations, record_id, tag_ids, participant_ids)
+            if self._loaded_at is None:
+                return
+            self._remove_relations(record_id)
+            self.all_records.add(record_id)
+            self._record_tags[record_id] = tag_ids
+            for tag_id in tag_ids:
+                self.tags.setdefault(tag_id, RoaringBitmap()).add(record_id)
+            self._record_participants[record_id] = participant_ids
+            for participant_id in participant_ids:
+                self.participants.setdefault(participant_id, RoaringBitmap()).add(record_id)
+
+    def remove_record(self, record_id: int) -> None:
+        """记录删除后从位图中移除"""
+        with self._lock:
+            self._defer_change(self.remove_record, record_id)
+            if self._loaded_at is None:
+                return
+            self._remove_relations(record_id)
+            self.all_records.discard(record_id)
+
+    def remove_tag(self, tag_id: int) -> None:
+        """标签删除后移除其位图"""
+        with self._lock:
+            self._defer_change(self.remove_tag, tag_id)
+            bitmap = self.tags.pop(tag_id, None)
+            for record_id in bitmap or ():
+                self._record_tags[record_id].remove(tag_id)
+
+    def remove_participant(self, participant_id: int) -> None:
+        """参与者删除后移除其位图"""
+        with self._lock:
+            self._defer_change(self.remove_participant, participant_id)
+            bitmap = self.participants.pop(participant_id, None)
+            for record_id in bitmap or ():
+                self._record_participants[record_id].remove(participant_id)
+
+    def _remove_relations(self, record_id: int) -> None:
+        for tag_id in self._record_tags.pop(record_id, []):
+            bitmap = self.tags.get(tag_id)
+            if bitmap is not None:
+                bitmap.discard(record_id)
+        for participant_id in self._record_participants.pop(record_id, []):
+            bitmap = self.participants.get(participant_id)
+            if bitmap is not None:
+                bitmap.discard(record_id)
+
+    def intersection_counts(self, kind: str, records: RoaringBitmap) -> Dict[int, int]:
+        """统计给定记录集合中每个标签/参与者关联的记录数，不含计数为 0 的项（需先 ensure_loaded）"""
+        with self._lock:
+            bitmaps = self.tags if kind == "tags" else self.participants
+            counts = {key: len(bitmap & records) for key, bitmap in bitmaps.items()}
+        return {key: count for key, count in counts.items() if count}
+
+    def evaluate(self, expression: str, kind: str) -> RoaringBitmap:
+        """
+        计算布尔表达式命中的记录ID位图（需先 ensure_loaded）
+        - kind 为 "tags" 或 "participants"
+        - 表达式无效时抛出 400
+        """
+        with self._lock:
+            bitmaps = self.tags if kind == "tags" else self.participants
+            empty = RoaringBitmap()
+            try:
+                return _ExpressionParser(
+                    _tokenize(expression), lambda key: bitmaps.get(key, empty), self.all_records
+                ).parse()
+            except ValueError as e:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"无效的筛选表达式 '{expression}': {e}"
+                )
+
+
+# 全局记录关联索引实例
+relation_index = RecordRelationIndex(ttl=settings.RELATION_INDEX_TTL)
@@ -0,0 +1,113 @@
+"""
+图片内容寻址存储
+上传的图片按 SHA-256 摘要存放，内容相同的图片只保存一份：
+- 存储键为 blobs/{摘要前2位}/{摘要3-4位}/{摘要}{扩展名}，两级分片避免单目录文件过多，文件存放在配置的存储后端中
+- image_blobs.ref_count 记录引用该内容的记录图片数，最后一个引用删除时才删除文件及衍生图
+- 缩略图等衍生图按内容生成一次，所有引用该内容的图片共用
+"""
+from pathlib import Path
+from typing import Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.record import ImageBlob, RecordImage
+from app.services.storage import get_storage
+from app.services.uploads import StoredUpload
+
+# 内容寻址存储的键前缀
+BLOB_PREFIX = "blobs"
+# 上传暂存目录（本地存储时与存储目录同一文件系统，保证存入是原子重命名）
+BLOB_STAGING_DIR = Path(settings.UPLOAD_DIR) / "staging"
+
+
+def blob_key(content_hash: str, extension: str) -> str:
+    """内容对应的存储键"""
+    return f"{BLOB_PREFIX}/{content_hash[:2]}/{content_hash[2:4]}/{content_hash}{extension}"
+
+
+async def acquire_blob(db: AsyncSession, stored: StoredUpload, extension: str) -> ImageBlob:
+    """
+    为新上传的内容增加一个引用（不提交事务）
+    - 内容已存在：引用数加一，删除暂存文件，复用已有文件与衍生图
+    - 内容不存在：新建内容行后将暂存文件存入存储后端
+    """
+    content_hash = stored.sha256
+    try:
+        blob = await _increment(db, content_hash)
+        if blob is None:
+            created = await _create(db, stored, extension)
+            if created is not None:
+                return created
+            # 并发上传了相同内容，对方已先插入
+            blob = await _increment(db, content_hash)
+    except BaseException:
+        await stored.discard()
+        raise
+    await stored.discard()
+    return blob
+
+
+async def _create(db: AsyncSession, stored: StoredUpload, extension: str) -> Optional[ImageBlob]:
+    """
+    新建内容行并存入文件，同一内容已有内容行（包括未提交的）时返回 None
+    先插入内容行再写入文件：删除已释放文件的后台任务通过插入同一主键与本次上传互斥，
+    不会删掉本次写入的文件（见 file_cleanup.delete_released_files）
+    """
+    blob = ImageBlob(
+        content_hash=stored.sha256, file_path=blob_key(stored.sha256, extension), file_size=stored.size, ref_count=1
+    )
+    try:
+        async with db.begin_nested():
+            db.add(blob)
+    except IntegrityError:
+        return None
+    await run_in_threadpool(get_storage().put, blob.file_path, stored.path)
+    return blob
+
+
+async def _increment(db: AsyncSession, content_hash: str) -> Optional[ImageBlob]:
+    result = await db.execute(
+        update(ImageBlob)
+        .where(ImageBlob.content_hash == content_hash)
+        .values(ref_count=ImageBlob.ref_count + 1)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount == 0:
+        return None
+    return await db.get(ImageBlob, content_hash, populate_existing=True)
+
+
+async def release_blob(db: AsyncSession, content_hash: Optional[str]) -> Optional[ImageBlob]:
+    """
+    释放一个引用（不提交事务）
+    引用数归零时删除内容行并返回该内容，调用方在提交后删除其文件（见 file_cleanup.FileReleases）
+    """
+    if not content_hash:
+        return None
+
+    await db.execute(
+        update(ImageBlob)
+        .where(ImageBlob.content_hash == content_hash)
+        .values(ref_count=ImageBlob.ref_count - 1)
+        .execution_options(synchronize_session=False)
+    )
+    blob = await db.get(ImageBlob, content_hash, populate_existing=True)
+    if blob is None or blob.ref_count > 0:
+        return None
+
+    await db.delete(blob)
+    return blob
+
+
+def apply_blob_to_image(image: RecordImage, blob: ImageBlob) -> None:
+    """记录图片指向内容文件及已生成的衍生图"""
+    image.content_hash = blob.content_hash
+    image.file_path = blob.file_path
+    image.file_size = blob.file_size
+    image.thumbnail_path = blob.thumbnail_path
+    image.medium_path = blob.medium_path
+    image.width = blob.width
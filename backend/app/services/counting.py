@@ -0,0 +1,103 @@
+"""
+列表总数统计
+支持三种统计策略：精确统计、缓存统计（按筛选条件签名缓存，写操作时失效）、不统计
+"""
+import json
+import threading
+import time
+from enum import Enum
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import Select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+
+class CountStrategy(str, Enum):
+    """总数统计策略"""
+    EXACT = "exact"     # 每次精确统计
+    CACHED = "cached"   # 按筛选条件缓存统计结果
+    NONE = "none"       # 不统计总数
+
+
+class CountCache:
+    """
+    进程内总数缓存，按命名空间（数据表）分组，写操作时整组失效
+    每个命名空间有一个代数，失效时递增：统计前读取代数，写入时代数已变化说明统计期间发生了写操作，
+    结果可能已过时，不写入缓存
+    """
+
+    def __init__(self, ttl: int):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Tuple[int, float]]] = {}
+        self._generations: Dict[str, int] = {}
+
+    def get(self, namespace: str, signature: str) -> Optional[int]:
+        """读取缓存的总数，过期或不存在时返回 None"""
+        with self._lock:
+            entry = self._entries.get(namespace, {}).get(signature)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[namespace][signature]
+                return None
+            return value
+
+    def generation(self, namespace: str) -> int:
+        """命名空间当前的代数（统计前读取，写入时传给 set）"""
+        with self._lock:
+            return self._generations.get(namespace, 0)
+
+    def set(self, namespace: str, signature: str, value: int, generation: int) -> None:
+        """写入总数缓存；generation 之后命名空间已失效时丢弃该结果"""
+        with self._lock:
+            if self._generations.get(namespace, 0) != generation:
+                return
+            self._entries.setdefault(namespace, {})[signature] = (value, time.monotonic() + self.ttl)
+
+    def invalidate(self, *namespaces: str) -> None:
+        """使指定命名空间下的全部缓存失效"""
+        with self._lock:
+            for namespace in namespaces:
+                self._entries.pop(namespace, None)
+                self._generations[namespace] = self._generations.get(namespace, 0) + 1
+
+
+# 全局总数缓存实例
+count_cache = CountCache(ttl=settings.COUNT_CACHE_TTL)
+
+
+def make_count_signature(user_scope: Optional[int], **filters: Any) -> str:
+    """根据数据隔离范围与筛选条件生成缓存签名"""
+    return json.dumps({"scope": user_scope, **filters}, sort_keys=True, default=str, ensure_ascii=False)
+
+
+async def count_rows(db: AsyncSession, query: Select, id_column) -> int:
+    """对已筛选的查询做精确统计，去掉排序与预加载，只查询 COUNT(id)"""
+    return await db.scalar(query.order_by(None).with_only_columns(func.count(id_column))) or 0
+
+
+async def resolve_total(
+    db: AsyncSession,
+    query: Select,
+    id_column,
+    strategy: CountStrategy,
+    namespace: str,
+    signature: str
+) -> Optional[int]:
+    """按统计策略返回列表总数，策略为 none 时返回 None"""
+    if strategy == CountStrategy.NONE:
+        return None
+
+    if strategy == CountStrategy.CACHED:
+        cached = count_cache.get(namespace, signature)
+        if cached is not None:
+            return cached
+
+    generation = count_cache.generation(namespace)
+    total = await count_rows(db, query, id_column)
+    count_cache.set(namespace, signature, total, generation)
+    return total
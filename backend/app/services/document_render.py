@@ -0,0 +1,306 @@
+"""
+PDF / Word 文档渲染
+报告排版（分页、断行、图片编码）是 CPU 密集操作，在独立的进程池中执行，不占用事件循环与 GIL：
+- 记录按 DOCUMENT_CHUNK_SIZE 条一组分别渲染为文档片段，多组在进程池中并行
+- 全部片段完成后合并为一个文档，封面（导出时间、记录数）在合并时生成
+- 每条记录从新的一页开始；图片嵌入缩略图（最长边不超过 DOCUMENT_IMAGE_EDGE 像素），不嵌入原图
+本模块的渲染函数在工作进程中执行，只接收可序列化的参数（格式化后的记录字典与图片字节）
+"""
+import io
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Optional, Tuple
+from xml.sax.saxutils import escape
+
+from PIL import Image, ImageOps
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# 每个渲染任务（文档片段）包含的记录数
+DOCUMENT_CHUNK_SIZE = 20
+
+# 嵌入图片的最长边像素（与缩略图一致），缺少缩略图时由原图缩小
+DOCUMENT_IMAGE_EDGE = 320
+
+DOCUMENT_IMAGE_QUALITY = 85
+
+DOCX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'
+
+# 记录的属性表：(名称, 记录字典中的键)
+ATTRIBUTE_ROWS = [
+    ('类型', 'type'),
+    ('记录日期', 'record_date'),
+    ('时间段', 'time_range'),
+    ('持续时间', 'duration'),
+    ('场域', 'field'),
+    ('参与者', 'participants'),
+    ('标签', 'tags'),
+    ('状态', 'status'),
+]
+
+# 记录内容的段落：(标题, content 中的键)
+CONTENT_SECTIONS = [
+    ('描述', 'description'),
+    ('反思', 'reflection'),
+    ('备注', 'notes'),
+]
+
+# PDF 使用的中文字体（Adobe 亚洲字体包中的 CID 字体，阅读器自带，无需嵌入字体文件）
+PDF_FONT = 'STSong-Light'
+
+# Word 中文字体
+DOCX_FONT = '宋体'
+
+# 渲染任务的输入：(格式化后的记录, 图片字节列表)
+DocumentItem = Tuple[dict, List[bytes]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """获取（首次调用时创建）文档渲染进程池"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.EXPORT_RENDER_WORKERS)
+    return _pool
+
+
+def shutdown_render_pool() -> None:
+    """关闭文档渲染进程池（应用退出时调用）"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def attribute_rows(data: dict) -> List[Tuple[str, str]]:
+    """记录的属性表，与 Markdown 导出一致（空值显示为 -）"""
+    rows = []
+    for label, key in ATTRIBUTE_ROWS:
+        value = data[key]
+        if key == 'duration':
+            value = f"{value}分钟" if value else ''
+        rows.append((label, str(value) if value else '-'))
+    return rows
+
+
+def content_sections(data: dict) -> List[Tuple[str, str]]:
+    """记录内容的段落 (标题, 文本)；内容不是分段结构时整体作为一段"""
+    content = data['content_raw']
+    if isinstance(content, dict):
+        return [(title, content[key]) for title, key in CONTENT_SECTIONS if content.get(key)]
+    return [('内容', data['content'])] if data['content'] else []
+
+
+def thumbnail_jpeg(data: bytes) -> Optional[Tuple[bytes, int, int]]:
+    """将图片缩小到 DOCUMENT_IMAGE_EDGE 以内并编码为 JPEG，返回 (JPEG 字节, 宽, 高)；无法解码时返回 None"""
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode != 'RGB':
+                rgba = image.convert('RGBA')
+                image = Image.new('RGB', rgba.size, (255, 255, 255))
+                image.paste(rgba, mask=rgba.getchannel('A'))
+            image.thumbnail((DOCUMENT_IMAGE_EDGE, DOCUMENT_IMAGE_EDGE), Image.LANCZOS)
+            output = io.BytesIO()
+            image.save(output, 'JPEG', quality=DOCUMENT_IMAGE_QUALITY)
+            return output.getvalue(), image.width, image.height
+    except Exception:
+        logger.warning("导出文档时图片无法解码，已跳过")
+        return None
+
+
+# ============ PDF ============
+
+@lru_cache(maxsize=None)
+def _pdf_styles() -> dict:
+    """PDF 段落样式（每个工作进程注册一次字体）"""
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+
+    pdfmetrics.registerFont(UnicodeCIDFont(PDF_FONT))
+    body = ParagraphStyle('body', fontName=PDF_FONT, fontSize=10.5, leading=16, wordWrap='CJK')
+    return {
+        'body': body,
+        'cover': ParagraphStyle('cover', parent=body, fontSize=24, leading=32, spaceAfter=18),
+        'title': ParagraphStyle('title', parent=body, fontSize=16, leading=22, spaceAfter=10),
+        'section': ParagraphStyle('section', parent=body, fontSize=12.5, leading=18, spaceBefore=10, spaceAfter=4),
+    }
+
+
+def _pdf_text(text: str) -> str:
+    """Paragraph 使用类 XML 标记，转义文本并保留换行"""
+    return escape(text).replace('\n', '<br/>')
+
+
+def _pdf_record(data: dict, images: List[bytes]) -> list:
+    from reportlab.lib import colors
+    from reportlab.lib.units import cm
+    from reportlab.platypus import Image as PdfImage, Paragraph, Spacer, Table, TableStyle
+
+    styles = _pdf_styles()
+    flowables = [Paragraph(_pdf_text(data['title']), styles['title'])]
+
+    table = Table(
+        [[Paragraph(label, styles['body']), Paragraph(_pdf_text(value), styles['body'])]
+         for label, value in attribute_rows(data)],
+        colWidths=[3 * cm, 13 * cm],
+    )
+    table.setStyle(TableStyle([
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.HexColor('#BCAAA4')),
+        ('BACKGROUND', (0, 0), (0, -1), colors.HexColor('#F5F0E8')),
+        ('VALIGN', (0, 0), (-1, -1), 'TOP'),
+    ]))
+    flowables.append(table)
+
+    for title, text in content_sections(data):
+        flowables.append(Paragraph(title, styles['section']))
+        flowables.append(Paragraph(_pdf_text(text), styles['body']))
+
+    thumbnails = [thumbnail for thumbnail in map(thumbnail_jpeg, images) if thumbnail]
+    if thumbnails:
+        flowables.append(Paragraph('图片', styles['section']))
+        # 每行 4 张，按比例缩放到 3.8cm 见方以内
+        cells = []
+        for jpeg, width, height in thumbnails:
+            scale = 3.8 * cm / max(width, height)
+            cells.append(PdfImage(io.BytesIO(jpeg), width=width * scale, height=height * scale))
+        rows = [cells[index:index + 4] for index in range(0, len(cells), 4)]
+        rows[-1] += [''] * (4 - len(rows[-1]))
+        flowables.append(Spacer(1, 4))
+        flowables.append(Table(rows, colWidths=[4 * cm] * 4, hAlign='LEFT'))
+
+    return flowables
+
+
+def _build_pdf(target, flowables: list) -> None:
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.units import cm
+    from reportlab.platypus import SimpleDocTemplate
+
+    document = SimpleDocTemplate(
+        target, pagesize=A4, leftMargin=2 * cm, rightMargin=2 * cm, topMargin=2 * cm, bottomMargin=2 * cm,
+        title='田野记录导出',
+    )
+    document.build(flowables)
+
+
+def render_pdf_part(items: List[DocumentItem], target_path: str) -> None:
+    """将一组记录渲染为 PDF 片段（每条记录一页起）"""
+    from reportlab.platypus import PageBreak
+
+    flowables = []
+    for index, (data, images) in enumerate(items):
+        if index:
+            flowables.append(PageBreak())
+        flowables.extend(_pdf_record(data, images))
+    _build_pdf(target_path, flowables)
+
+
+def merge_pdf(cover: dict, part_paths: List[str], target_path: str) -> None:
+    """生成封面并依次合并 PDF 片段"""
+    from pypdf import PdfWriter
+    from reportlab.platypus import Paragraph
+
+    styles = _pdf_styles()
+    cover_pdf = io.BytesIO()
+    _build_pdf(cover_pdf, [
+        Paragraph('田野记录导出', styles['cover']),
+        Paragraph(f"导出时间：{cover['export_time']}", styles['body']),
+        Paragraph(f"共 {cover['total_count']} 条记录", styles['body']),
+    ])
+
+    writer = PdfWriter()
+    writer.append(cover_pdf)
+    for path in part_paths:
+        writer.append(path)
+    with open(target_path, 'wb') as output:
+        writer.write(output)
+
+
+# ============ Word ============
+
+def _new_docx():
+    """新建 Word 文档，正文与标题样式使用中文字体"""
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    document = Document()
+    for name in ('Normal', 'Title', 'Heading 2', 'Heading 3'):
+        style = document.styles[name]
+        style.font.name = DOCX_FONT
+        style.element.get_or_add_rPr().get_or_add_rFonts().set(qn('w:eastAsia'), DOCX_FONT)
+    return document
+
+
+def _docx_record(document, data: dict, images: List[bytes]) -> None:
+    from docx.shared import Cm
+
+    document.add_heading(data['title'], level=2)
+
+    rows = attribute_rows(data)
+    table = document.add_table(rows=len(rows), cols=2)
+    table.style = 'Table Grid'
+    for row, (label, value) in zip(table.rows, rows):
+        row.cells[0].text = label
+        row.cells[1].text = value
+        row.cells[0].width = Cm(3)
+        row.cells[1].width = Cm(13)
+
+    for title, text in content_sections(data):
+        document.add_heading(title, level=3)
+        document.add_paragraph(text)
+
+    thumbnails = [thumbnail for thumbnail in map(thumbnail_jpeg, images) if thumbnail]
+    if thumbnails:
+        document.add_heading('图片', level=3)
+        paragraph = document.add_paragraph()
+        for jpeg, width, height in thumbnails:
+            size = {'width': Cm(3.8)} if width >= height else {'height': Cm(3.8)}
+            paragraph.add_run().add_picture(io.BytesIO(jpeg), **size)
+            paragraph.add_run(' ')
+
+
+def render_docx_part(items: List[DocumentItem], target_path: str) -> None:
+    """将一组记录渲染为 Word 片段（每条记录一页起）"""
+    document = _new_docx()
+    for index, (data, images) in enumerate(items):
+        if index:
+            document.add_page_break()
+        _docx_record(document, data, images)
+    document.save(target_path)
+
+
+def merge_docx(cover: dict, part_paths: List[str], target_path: str) -> None:
+    """
+    生成封面并依次合并 Word 片段
+    片段正文逐段移入目标文档，图片按内容重新加入目标文档并改写引用；图形编号重新分配，避免重复
+    """
+    from docx import Document
+    from docx.oxml.ns import qn
+
+    document = _new_docx()
+    document.add_heading('田野记录导出', level=0)
+    document.add_paragraph(f"导出时间：{cover['export_time']}")
+    document.add_paragraph(f"共 {cover['total_count']} 条记录")
+
+    body = document.element.body
+    for path in part_paths:
+        document.add_page_break()
+        part = Document(path)
+        for element in list(part.element.body):
+            if element.tag == qn('w:sectPr'):
+                continue
+            for blip in element.iter(qn('a:blip')):
+                image_part = part.part.related_parts[blip.get(qn('r:embed'))]
+                rId, _ = document.part.get_or_add_image(io.BytesIO(image_part.blob))
+                blip.set(qn('r:embed'), rId)
+            body.sectPr.addprevious(element)
+
+    for number, doc_pr in enumerate(body.iter(qn('wp:docPr')), start=1):
+        doc_pr.set('id', str(number))
+    document.save(target_path)
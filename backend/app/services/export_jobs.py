@@ -0,0 +1,313 @@
+"""
+后台导出任务
+大批量导出在请求中同步执行会长时间占用工作进程，并可能被前置代理超时中断，改为后台任务：
+- 提交后立即返回任务，由进程内的导出工作协程（EXPORT_WORKERS 个）依次执行；
+  协程只负责异步查询与调度，每批记录的格式化、序列化与写文件在线程池中进行，
+  PDF / Word 排版在独立的渲染进程池中进行，导出期间事件循环仍可及时处理请求
+- 客户端轮询任务获取进度（已处理记录数 / 总数），完成后下载导出文件（支持 Range 断点续传）
+- 导出文件存入导出文件存储（本地为 EXPORT_DIR，不在公开的上传目录下；对象存储为 exports/ 前缀），
+  只能通过需要登录的下载接口获取，保留 EXPORT_RETENTION_SECONDS 秒；
+  期间同一用户以相同格式、相同记录范围再次导出且数据版本未变时直接复用，
+  排队或执行中的相同任务也直接返回，不重复导出
+- 任务认领通过条件更新完成，多进程部署时同一任务只会被一个进程执行；
+  执行期间定期更新心跳（progress_at），合并文档、上传等长时间步骤也不会被误判为中断，
+  执行结果只在任务仍为执行中时写入，已被标记为中断的任务不会再被改回完成
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import secrets
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, delete, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.export_job import ExportJob, ExportJobStatus
+from app.models.field import Field
+from app.models.participant import Participant
+from app.models.record import Record, RecordImage, record_participants, record_tags
+from app.models.tag import Tag
+from app.models.user import User
+from app.services.record_export import (
+    EXPORT_FORMATS,
+    IMAGE_EXPORT_FORMATS,
+    export_owner_id,
+    record_conditions,
+    temp_export_path,
+    write_export_file,
+)
+from app.services.storage import delete_keys, get_export_storage
+
+logger = logging.getLogger(__name__)
+
+# 每次清理的过期任务数
+PURGE_BATCH_SIZE = 500
+
+ACTIVE_STATUSES = (ExportJobStatus.PENDING, ExportJobStatus.RUNNING)
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def export_fingerprint(user_id: int, export_format: str, record_ids: Optional[List[int]]) -> str:
+    """导出内容标识：同一用户、格式与记录范围的导出内容相同"""
+    scope = ",".join(str(record_id) for record_id in record_ids) if record_ids is not None else "*"
+    return hashlib.sha256(f"{user_id}:{export_format}:{scope}".encode()).hexdigest()
+
+
+async def export_data_version(db: AsyncSession, conditions: list, with_images: bool) -> str:
+    """
+    导出范围内数据的版本：记录的数量、ID、版本号与更新时间，场域、参与者、标签的最近更新时间
+    （名称等随记录导出），以及范围内参与者/标签关联的数量与ID之和；
+    包含图片的格式再加上图片的数量与最大ID。任一变化都会得到新的版本
+    记录每次修改（包括只修改参与者/标签关联）都会增加版本号；删除参与者/标签时只删除关联行，
+    记录版本号与更新时间都不变，由关联的数量与ID之和体现
+    """
+    parts = list((await db.execute(
+        select(func.count(Record.id), func.sum(Record.id), func.sum(Record.version), func.max(Record.updated_at))
+        .where(*conditions)
+    )).one())
+    for model in (Field, Participant, Tag):
+        parts.append(await db.scalar(select(func.max(model.updated_at))))
+    for table, column in ((record_participants, record_participants.c.participant_id), (record_tags, record_tags.c.tag_id)):
+        parts.extend((await db.execute(
+            select(func.count(), func.sum(column))
+            .select_from(table)
+            .join(Record, table.c.record_id == Record.id)
+            .where(*conditions)
+        )).one())
+    if with_images:
+        parts.extend((await db.execute(
+            select(func.count(RecordImage.id), func.max(RecordImage.id))
+            .join(Record, RecordImage.record_id == Record.id)
+            .where(*conditions)
+        )).one())
+    return hashlib.sha256(repr(parts).encode()).hexdigest()
+
+
+async def submit_export_job(
+    db: AsyncSession,
+    user: User,
+    export_format: str,
+    record_ids: Optional[List[int]],
+) -> ExportJob:
+    """提交导出任务：有可复用的任务（已完成且文件仍在，或排队/执行中）时直接返回，否则创建并排队"""
+    if record_ids is not None:
+        record_ids = sorted(set(record_ids))
+    conditions = record_conditions(record_ids, export_owner_id(user))
+    fingerprint = export_fingerprint(user.id, export_format, record_ids)
+    data_version = await export_data_version(db, conditions, export_format in IMAGE_EXPORT_FORMATS)
+
+    existing = await db.scalar(
+        select(ExportJob)
+        .where(
+            ExportJob.fingerprint == fingerprint,
+            ExportJob.data_version == data_version,
+            or_(
+                ExportJob.status.in_(ACTIVE_STATUSES),
+                and_(
+                    ExportJob.status == ExportJobStatus.COMPLETED,
+                    ExportJob.finished_at >= _now() - timedelta(seconds=settings.EXPORT_RETENTION_SECONDS),
+                ),
+            ),
+        )
+        .order_by(ExportJob.id.desc())
+        .limit(1)
+    )
+    if existing is not None:
+        if existing.status != ExportJobStatus.COMPLETED:
+            return existing
+        if await run_in_threadpool(get_export_storage().exists, existing.file_key):
+            return existing
+
+    job = ExportJob(
+        user_id=user.id,
+        format=export_format,
+        record_ids=record_ids,
+        fingerprint=fingerprint,
+        data_version=data_version,
+        status=ExportJobStatus.PENDING,
+        processed_count=0,
+        total_count=await db.scalar(select(func.count(Record.id)).where(*conditions)),
+    )
+    db.add(job)
+    await db.commit()
+
+    enqueue_export_job(job.id)
+    return job
+
+
+def _heartbeat_interval() -> float:
+    """心跳间隔：中断判定时间的三分之一"""
+    return max(1, settings.EXPORT_STALE_SECONDS / 3)
+
+
+async def _update_running_job(job_id: int, **values) -> bool:
+    """更新执行中的任务，任务已不在执行中（如被标记为中断）时不更新并返回 False"""
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == ExportJobStatus.RUNNING)
+            .values(**values)
+        )
+        await db.commit()
+    return result.rowcount > 0
+
+
+async def _heartbeat(job_id: int) -> None:
+    """定期更新任务心跳，直到被取消"""
+    while True:
+        await asyncio.sleep(_heartbeat_interval())
+        try:
+            await _update_running_job(job_id, progress_at=_now())
+        except Exception:
+            logger.exception("导出任务 %d 更新心跳失败", job_id)
+
+
+async def run_export_job(job_id: int) -> None:
+    """执行导出任务（仅当任务仍在排队时认领执行），导出文件生成后存入存储后端"""
+    async with AsyncSessionLocal() as db:
+        now = _now()
+        claimed = await db.execute(
+            update(ExportJob)
+            .where(ExportJob.id == job_id, ExportJob.status == ExportJobStatus.PENDING)
+            .values(status=ExportJobStatus.RUNNING, started_at=now, progress_at=now)
+        )
+        await db.commit()
+        if claimed.rowcount == 0:
+            return
+        job = await db.get(ExportJob, job_id)
+        user = await db.get(User, job.user_id)
+        export_format, record_ids, total_count = job.format, job.record_ids, job.total_count
+
+    suffix, _ = EXPORT_FORMATS[export_format]
+    processed = 0
+
+    async def report_progress(count: int) -> None:
+        nonlocal processed
+        processed += count
+        await _update_running_job(job_id, processed_count=processed, progress_at=_now())
+
+    # 存储键带随机部分，不能被按任务ID猜到
+    key = f"{job_id}-{secrets.token_urlsafe(16)}{suffix}"
+    path = temp_export_path(suffix)
+    heartbeat = asyncio.get_running_loop().create_task(_heartbeat(job_id))
+    try:
+        conditions = record_conditions(record_ids, export_owner_id(user))
+        await write_export_file(export_format, conditions, total_count, path, report_progress)
+        file_size = (await run_in_threadpool(os.stat, path)).st_size
+        await run_in_threadpool(get_export_storage().put, key, path)
+    except asyncio.CancelledError:
+        # 服务退出：恢复为排队状态，下次启动后重新执行
+        await _update_running_job(job_id, status=ExportJobStatus.PENDING, processed_count=0)
+        raise
+    except Exception:
+        logger.exception("导出任务 %d 执行失败", job_id)
+        await _update_running_job(job_id, status=ExportJobStatus.FAILED, error="导出失败，请重试", finished_at=_now())
+        return
+    finally:
+        heartbeat.cancel()
+        path.unlink(missing_ok=True)
+
+    completed = await _update_running_job(
+        job_id,
+        status=ExportJobStatus.COMPLETED,
+        processed_count=processed,
+        file_key=key,
+        file_size=file_size,
+        finished_at=_now(),
+    )
+    if not completed:
+        # 任务已被标记为中断（或已删除），导出文件不会再被引用
+        logger.warning("导出任务 %d 已不在执行中，丢弃导出文件", job_id)
+        await run_in_threadpool(delete_keys, [key], get_export_storage())
+
+
+async def clean_export_jobs() -> None:
+    """
+    清理导出任务
+    - 超过 EXPORT_STALE_SECONDS 没有进度更新的执行中任务（进程崩溃等）标记为失败
+    - 删除完成超过 EXPORT_RETENTION_SECONDS 的任务及其导出文件
+    """
+    now = _now()
+    async with AsyncSessionLocal() as db:
+        await db.execute(
+            update(ExportJob)
+            .where(
+                ExportJob.status == ExportJobStatus.RUNNING,
+                ExportJob.progress_at < now - timedelta(seconds=settings.EXPORT_STALE_SECONDS),
+            )
+            .values(status=ExportJobStatus.FAILED, error="导出中断，请重新提交", finished_at=now)
+        )
+        expired = (await db.execute(
+            select(ExportJob.id, ExportJob.file_key)
+            .where(ExportJob.finished_at < now - timedelta(seconds=settings.EXPORT_RETENTION_SECONDS))
+            .limit(PURGE_BATCH_SIZE)
+        )).all()
+        if expired:
+            await db.execute(delete(ExportJob).where(ExportJob.id.in_([job_id for job_id, _ in expired])))
+        await db.commit()
+
+    if expired:
+        try:
+            await run_in_threadpool(delete_keys, [key for _, key in expired], get_export_storage())
+        except Exception:
+            logger.exception("删除过期导出文件失败")
+
+
+_queue: Optional[asyncio.Queue] = None
+_workers: List[asyncio.Task] = []
+
+
+async def _work(queue: asyncio.Queue) -> None:
+    while True:
+        job_id = await queue.get()
+        try:
+            await run_export_job(job_id)
+            await clean_export_jobs()
+        except Exception:
+            logger.exception("导出任务 %d 处理失败", job_id)
+        finally:
+            queue.task_done()
+
+
+def _get_queue() -> asyncio.Queue:
+    """获取任务队列，首次调用时启动导出工作协程"""
+    global _queue
+    if _queue is None:
+        _queue = asyncio.Queue()
+        loop = asyncio.get_running_loop()
+        _workers.extend(loop.create_task(_work(_queue)) for _ in range(max(1, settings.EXPORT_WORKERS)))
+    return _queue
+
+
+def enqueue_export_job(job_id: int) -> None:
+    _get_queue().put_nowait(job_id)
+
+
+async def start_export_workers() -> None:
+    """启动导出工作协程，清理过期任务并继续执行上次退出时仍在排队的任务"""
+    queue = _get_queue()
+    await clean_export_jobs()
+    async with AsyncSessionLocal() as db:
+        pending = (await db.scalars(
+            select(ExportJob.id).where(ExportJob.status == ExportJobStatus.PENDING).order_by(ExportJob.id)
+        )).all()
+    for job_id in pending:
+        queue.put_nowait(job_id)
+
+
+async def stop_export_workers() -> None:
+    """停止导出工作协程（应用退出时调用），执行中的任务恢复为排队状态"""
+    global _queue
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
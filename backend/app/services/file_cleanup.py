@@ -0,0 +1,222 @@
+"""
+图片文件清理
+- 删除图片时事务中只修改数据库，文件在提交成功后由后台任务删除：
+  提交失败时文件仍在，删除接口也不必等待逐个删除文件
+- 定期清理孤儿文件：分批对比存储中的文件与 image_blobs / record_images 的引用，
+  删除超过保留期仍未被引用的文件（进程崩溃、上传中断、后台删除失败等遗留），
+  同时清理上传暂存目录中的过期临时文件
+"""
+import asyncio
+import logging
+import time
+from itertools import islice
+from pathlib import PurePosixPath
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from fastapi import BackgroundTasks
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.record import ImageBlob, RecordImage
+from app.services.blob_store import BLOB_PREFIX, BLOB_STAGING_DIR
+from app.services.image_cache import image_cache, image_source_key
+from app.services.storage import delete_keys, get_storage
+
+logger = logging.getLogger(__name__)
+
+# 内容寻址存储之前按记录存放图片的键前缀（records/{record_id}/...）
+LEGACY_PREFIX = "records"
+
+# 每批清理之间的间隔（秒），避免长时间占用存储与数据库
+SWEEP_BATCH_PAUSE = 0.1
+
+
+class FileReleases:
+    """事务中释放的图片文件，提交成功后通过 schedule 交给后台任务删除"""
+
+    def __init__(self):
+        self.blobs: Dict[str, List[str]] = {}  # 引用归零的内容摘要 -> 存储键
+        self.keys: List[str] = []              # 历史图片（无内容摘要）的存储键
+        self.cache_keys: List[str] = []        # 需要清除的按需缩放缓存
+
+    def add_blob(self, blob: ImageBlob) -> None:
+        self.blobs[blob.content_hash] = [
+            key for key in (blob.file_path, blob.thumbnail_path, blob.medium_path) if key
+        ]
+
+    def add_image(self, image: RecordImage) -> None:
+        self.keys.extend(key for key in (image.file_path, image.thumbnail_path, image.medium_path) if key)
+        self.cache_keys.append(image_source_key(None, image.id))
+
+    def schedule(self, background_tasks: BackgroundTasks) -> None:
+        if self.blobs or self.keys:
+            background_tasks.add_task(delete_released_files, self.blobs, self.keys, self.cache_keys)
+
+
+async def delete_released_files(blobs: Dict[str, List[str]], keys: List[str], cache_keys: List[str]) -> None:
+    """
+    删除已释放的文件（后台任务）
+    - 每个内容在单独的事务中插入同一主键的占位行：插入成功说明没有被重新上传，
+      并发上传的内容行插入会等待本事务结束（上传先插入内容行再写入文件），文件删除后回滚事务撤销占位行；
+      插入失败说明该内容已被重新上传（包括尚未提交的），保留文件
+    - 删除失败只记录日志，遗留文件由孤儿文件清理处理
+    """
+    cache_keys = list(cache_keys)
+    async with AsyncSessionLocal() as db:
+        for content_hash, blob_keys in blobs.items():
+            db.add(ImageBlob(content_hash=content_hash, file_path=blob_keys[0], file_size=0, ref_count=0))
+            try:
+                await db.flush()
+            except IntegrityError:
+                await db.rollback()
+                continue
+            try:
+                await run_in_threadpool(delete_keys, blob_keys)
+            except Exception:
+                logger.exception("删除图片文件失败，将由孤儿文件清理处理")
+            finally:
+                await db.rollback()
+            cache_keys.append(content_hash)
+
+    try:
+        await run_in_threadpool(delete_keys, keys)
+    except Exception:
+        logger.exception("删除图片文件失败，将由孤儿文件清理处理")
+    for cache_key in cache_keys:
+        await run_in_threadpool(image_cache.discard, cache_key)
+
+
+def _next_batch(files: Iterator[Tuple[str, float]], size: int) -> List[Tuple[str, float]]:
+    return list(islice(files, size))
+
+
+def _owner(key: str) -> Tuple[Optional[str], Optional[int]]:
+    """由存储键得出 (内容摘要, 历史图片的记录ID)，用于按索引查询引用"""
+    parts = PurePosixPath(key).parts
+    if parts[0] == BLOB_PREFIX:
+        # blobs/aa/bb/{摘要}{扩展名} 或 {摘要}_{衍生图}.jpg
+        return PurePosixPath(key).stem.split("_")[0], None
+    if parts[0] == LEGACY_PREFIX and len(parts) > 2 and parts[1].isdigit():
+        return None, int(parts[1])
+    return None, None
+
+
+async def _referenced_keys(db, keys: List[str]) -> Set[str]:
+    """一批存储键中仍被数据库引用的键（按内容摘要 / 记录ID走索引查询，不扫描全表）"""
+    hashes, record_ids = set(), set()
+    for key in keys:
+        content_hash, record_id = _owner(key)
+        if content_hash:
+            hashes.add(content_hash)
+        if record_id is not None:
+            record_ids.add(record_id)
+
+    rows = []
+    if hashes:
+        rows += (await db.execute(
+            select(ImageBlob.file_path, ImageBlob.thumbnail_path, ImageBlob.medium_path)
+            .where(ImageBlob.content_hash.in_(hashes))
+        )).all()
+    conditions = []
+    if hashes:
+        conditions.append(RecordImage.content_hash.in_(hashes))
+    if record_ids:
+        conditions.append(RecordImage.record_id.in_(record_ids))
+    if conditions:
+        rows += (await db.execute(
+            select(RecordImage.file_path, RecordImage.thumbnail_path, RecordImage.medium_path)
+            .where(or_(*conditions))
+        )).all()
+
+    return {key for row in rows for key in row if key}
+
+
+def _clean_staging(cutoff: float, dry_run: bool) -> int:
+    """删除上传暂存目录中的过期临时文件（上传中断或进程崩溃遗留）"""
+    removed = 0
+    if not BLOB_STAGING_DIR.exists():
+        return removed
+    for path in BLOB_STAGING_DIR.iterdir():
+        try:
+            if path.is_file() and path.stat().st_mtime < cutoff:
+                if not dry_run:
+                    path.unlink(missing_ok=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+async def sweep_orphan_files(
+    batch_size: int = settings.ORPHAN_SWEEP_BATCH_SIZE,
+    grace_seconds: int = settings.ORPHAN_GRACE_SECONDS,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    """
+    清理孤儿文件，返回 {scanned: 扫描文件数, orphaned: 孤儿文件数, staging: 过期暂存文件数}
+    - 每批列出 batch_size 个文件并查询引用，内存与单次查询规模与文件总数无关
+    - 修改时间在 grace_seconds 之内的文件不处理（可能是尚未提交的上传）
+    - dry_run 只统计不删除
+    """
+    storage = get_storage()
+    cutoff = time.time() - grace_seconds
+    counts = {"scanned": 0, "orphaned": 0, "staging": 0}
+
+    for prefix in (BLOB_PREFIX, LEGACY_PREFIX):
+        files = storage.iter_files(prefix)
+        while True:
+            batch = await run_in_threadpool(_next_batch, files, batch_size)
+            if not batch:
+                break
+            counts["scanned"] += len(batch)
+
+            candidates = [key for key, modified in batch if modified < cutoff]
+            if candidates:
+                async with AsyncSessionLocal() as db:
+                    referenced = await _referenced_keys(db, candidates)
+                orphans = [key for key in candidates if key not in referenced]
+                counts["orphaned"] += len(orphans)
+                if orphans and not dry_run:
+                    await run_in_threadpool(delete_keys, orphans)
+            await asyncio.sleep(SWEEP_BATCH_PAUSE)
+
+    counts["staging"] = await run_in_threadpool(_clean_staging, cutoff, dry_run)
+    return counts
+
+
+async def _sweep_periodically() -> None:
+    while True:
+        await asyncio.sleep(settings.ORPHAN_SWEEP_INTERVAL)
+        try:
+            counts = await sweep_orphan_files()
+            logger.info(
+                "孤儿文件清理完成：扫描 %d 个文件，删除 %d 个孤儿文件、%d 个过期暂存文件",
+                counts["scanned"], counts["orphaned"], counts["staging"]
+            )
+        except Exception:
+            logger.exception("孤儿文件清理失败")
+
+
+_sweeper: Optional[asyncio.Task] = None
+
+
+def start_orphan_sweeper() -> None:
+    """启动定期清理任务（ORPHAN_SWEEP_INTERVAL 为 0 时不启动）"""
+    global _sweeper
+    if settings.ORPHAN_SWEEP_INTERVAL > 0 and _sweeper is None:
+        _sweeper = asyncio.get_running_loop().create_task(_sweep_periodically())
+
+
+async def stop_orphan_sweeper() -> None:
+    """停止定期清理任务（应用退出时调用）"""
+    global _sweeper
+    if _sweeper is not None:
+        _sweeper.cancel()
+        try:
+            await _sweeper
+        except asyncio.CancelledError:
+            pass
+        _sweeper = None
@@ -0,0 +1,242 @@
+"""
+文件下载响应
+为图片等静态内容生成缓存友好的响应：
+- ETag 由内容摘要得出，If-None-Match 命中时返回 304
+- 支持单段 HTTP Range（断点续传、视频/大图分段加载），If-Range 不匹配时返回完整内容
+- URL 中携带内容版本时返回 Cache-Control: immutable，浏览器与 CDN 可长期缓存
+- 可选交由前置代理发送文件（nginx X-Accel-Redirect / Apache、lighttpd X-Sendfile），
+  Python 只负责查库与鉴权，文件字节由代理零拷贝发送
+- 文件在对象存储中时重定向到临时下载 URL，由对象存储处理 Range 与传输
+"""
+import os
+import re
+from pathlib import Path
+from typing import Optional, Tuple
+from urllib.parse import quote
+
+from fastapi import Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, RedirectResponse, Response, StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+from app.core.config import settings
+from app.services.storage import StorageBackend, get_storage
+
+# 长期缓存（一年），仅用于 URL 中带有内容版本的请求
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# 其余请求每次向服务端校验 ETag
+REVALIDATE_CACHE_CONTROL = "public, no-cache"
+# 仅限当前用户的内容（如导出文件），不允许共享缓存保存
+PRIVATE_CACHE_CONTROL = "private, no-cache"
+
+RANGE_CHUNK_SIZE = 64 * 1024
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def content_etag(content_hash: Optional[str], suffix: str = "") -> Optional[str]:
+    """由内容摘要生成强 ETag，摘要缺失（历史数据）时返回 None 由文件信息兜底"""
+    if not content_hash:
+        return None
+    return f'"{content_hash}{"-" + suffix if suffix else ""}"'
+
+
+def stat_etag(stat: os.stat_result) -> str:
+    """按文件修改时间与大小生成弱 ETag"""
+    return f'W/"{int(stat.st_mtime)}-{stat.st_size}"'
+
+
+def etag_matches(header: Optional[str], etag: str) -> bool:
+    """If-None-Match 是否命中（弱比较）"""
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == target for tag in header.split(","))
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    解析单段 Range 请求头，返回闭区间 (start, end)
+    - 多段或格式无法识别时返回 None（按规范忽略 Range，返回完整内容）
+    - 区间无法满足时抛出 ValueError
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        # bytes=-N：最后 N 个字节
+        length = int(last)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def content_disposition(filename: str, attachment: bool = False) -> str:
+    """inline 展示（attachment 为真时作为附件下载），同时提供原始文件名（兼容中文）"""
+    return f"{'attachment' if attachment else 'inline'}; filename*=UTF-8''{quote(filename)}"
+
+
+def cache_control(immutable: bool, private: bool) -> str:
+    """按缓存策略生成 Cache-Control 响应头"""
+    if private:
+        return PRIVATE_CACHE_CONTROL
+    return IMMUTABLE_CACHE_CONTROL if immutable else REVALIDATE_CACHE_CONTROL
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """
+    发送结束后关闭内容生成器的流式响应
+    客户端中途断开时 Starlette 直接取消发送，生成器停在 yield 处，其中的 finally
+    （关闭文件、删除临时文件、释放数据库会话与游标）要等垃圾回收时才执行；这里在响应结束时立即关闭
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            aclose = getattr(self.body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+
+async def _read_range(path: Path, start: int, end: int):
+    """分块读取文件的指定区间"""
+    handle = await run_in_threadpool(open, path, "rb")
+    try:
+        await run_in_threadpool(handle.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await run_in_threadpool(handle.read, min(RANGE_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await run_in_threadpool(handle.close)
+
+
+def _offload_headers(path: Path) -> Optional[dict]:
+    """交由前置代理发送文件时的响应头，未启用时返回 None"""
+    mode = settings.FILE_DELIVERY_MODE
+    if mode == "x-accel":
+        relative = Path(os.path.relpath(path.resolve(), Path(settings.X_ACCEL_ROOT).resolve())).as_posix()
+        return {"X-Accel-Redirect": quote(settings.X_ACCEL_PREFIX.rstrip("/") + "/" + relative)}
+    if mode == "x-sendfile":
+        return {"X-Sendfile": str(path.resolve())}
+    return None
+
+
+async def file_response(
+    request: Request,
+    path: Path,
+    media_type: str,
+    filename: str,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+    private: bool = False,
+    attachment: bool = False,
+) -> Response:
+    """
+    生成文件下载响应
+    - etag 为空时按文件修改时间与大小生成弱 ETag
+    - immutable 为真时允许客户端长期缓存（调用方需保证该 URL 的内容不会再变化）
+    - private 为真时只允许客户端缓存；attachment 为真时作为附件下载
+    """
+    stat = await run_in_threadpool(os.stat, path)
+    etag = etag or stat_etag(stat)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control(immutable, private),
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": content_disposition(filename, attachment),
+    }
+
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+            key: value for key, value in headers.items() if key != "Content-Disposition"
+        })
+
+    offload = _offload_headers(path)
+    if offload is not None:
+        # 代理自行处理 Range 与发送文件内容
+        return Response(media_type=media_type, headers={**headers, **offload})
+
+    size = stat.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    # If-Range 只能与强 ETag 比较，不一致说明客户端手中的片段已过期，返回完整内容
+    if range_header and (not if_range or (not etag.startswith("W/") and if_range.strip() == etag)):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(
+                status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+                headers={"Content-Range": f"bytes */{size}", "ETag": etag}
+            )
+        if byte_range is not None:
+            start, end = byte_range
+            return ClosingStreamingResponse(
+                _read_range(path, start, end),
+                status_code=status.HTTP_206_PARTIAL_CONTENT,
+                media_type=media_type,
+                headers={
+                    **headers,
+                    "Content-Range": f"bytes {start}-{end}/{size}",
+                    "Content-Length": str(end - start + 1),
+                },
+            )
+
+    return FileResponse(path=str(path), media_type=media_type, headers=headers, stat_result=stat)
+
+
+async def storage_response(
+    request: Request,
+    key: str,
+    media_type: str,
+    filename: str,
+    etag: Optional[str] = None,
+    immutable: bool = False,
+    private: bool = False,
+    attachment: bool = False,
+    storage: Optional[StorageBackend] = None,
+) -> Response:
+    """
+    生成存储中文件的下载响应（默认为当前存储后端），文件不存在时抛出 FileNotFoundError
+    - 本地存储：同 file_response
+    - 对象存储：ETag 命中时返回 304，否则 307 重定向到临时下载 URL；
+      重定向本身可缓存临时 URL 有效期的一半，期间浏览器直接复用对象存储的响应缓存
+    """
+    storage = storage or get_storage()
+    path = storage.local_path(key)
+    if path is not None:
+        return await file_response(
+            request, path, media_type, filename,
+            etag=etag, immutable=immutable, private=private, attachment=attachment
+        )
+
+    if etag and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={
+            "ETag": etag,
+            "Cache-Control": cache_control(immutable, private),
+        })
+
+    url = await run_in_threadpool(
+        storage.presigned_url, key, media_type, content_disposition(filename, attachment)
+    )
+    return RedirectResponse(
+        url,
+        status_code=status.HTTP_307_TEMPORARY_REDIRECT,
+        headers={"Cache-Control": f"private, max-age={settings.S3_PRESIGN_EXPIRES // 2}"}
+    )
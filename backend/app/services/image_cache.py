@@ -0,0 +1,211 @@
+"""
+按需生成的图片尺寸/格式缓存
+GET /records/{id}/images/{image_id}/file?w=640&format=webp 首次请求时在进程池中缩放并转码，
+结果按 (图片内容, 宽度, 格式) 缓存到磁盘，内容相同的图片共用缓存：
+- 请求宽度向上取整到固定档位，并以原图宽度为上限，避免任意宽度各占一份缓存
+- 缓存总大小有上限，超出时按最近最少使用（LRU）淘汰
+- 同一衍生图的并发请求合并为一次生成
+- 启动时扫描缓存目录恢复索引，按文件修改时间近似最近使用顺序
+- get 返回的文件在 release 之前被固定，本进程不会在发送期间将其淘汰
+- 缓存始终在本地磁盘；原图在对象存储中时生成前先下载到临时文件
+"""
+import asyncio
+import threading
+from collections import OrderedDict
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from PIL import Image
+
+from app.core.config import settings
+from app.services.image_variants import get_image_pool, load_oriented_image, reset_image_pool, save_atomic
+from app.services.storage import get_storage
+
+# 输出格式 -> (Pillow 格式名, MIME 类型)
+IMAGE_FORMATS = {
+    "webp": ("WEBP", "image/webp"),
+    "jpeg": ("JPEG", "image/jpeg"),
+}
+
+# 可请求的宽度范围（像素）
+MIN_IMAGE_WIDTH = 16
+MAX_IMAGE_WIDTH = 2560
+
+# 实际生成的宽度档位（像素），请求宽度向上取整到最近的档位
+IMAGE_WIDTH_BUCKETS = (160, 320, 480, 640, 960, 1280, 1920, 2560)
+
+IMAGE_QUALITY = 80
+
+CacheKey = Tuple[str, int, str]
+
+
+def render_resized(source_path: str, target_path: str, width: int, image_format: str) -> None:
+    """
+    将原图缩放到指定宽度（不放大）并转码保存
+    在进程池的工作进程中执行
+    """
+    pil_format, _ = IMAGE_FORMATS[image_format]
+    image = load_oriented_image(source_path, keep_alpha=image_format == "webp")
+    if image.width > width:
+        image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+
+    options = {"quality": IMAGE_QUALITY, "method": 4} if pil_format == "WEBP" else {
+        "quality": IMAGE_QUALITY, "optimize": True, "progressive": True
+    }
+    save_atomic(image, Path(target_path), pil_format, **options)
+
+
+def resolve_image_width(width: Optional[int], source_width: Optional[int]) -> int:
+    """
+    请求宽度 -> 实际生成的宽度：向上取整到宽度档位（未指定时为最大宽度），不超过原图宽度
+    原图宽度未知（尚未生成衍生图的图片）时只按档位取整
+    """
+    bucket = next(
+        (bucket for bucket in IMAGE_WIDTH_BUCKETS if bucket >= (width or MAX_IMAGE_WIDTH)), MAX_IMAGE_WIDTH
+    )
+    return min(bucket, source_width) if source_width else bucket
+
+
+def image_source_key(content_hash: Optional[str], image_id: int) -> str:
+    """缓存键中的原图标识：按内容摘要（内容相同的图片共用缓存），历史图片没有摘要时按图片ID"""
+    return content_hash or f"image{image_id}"
+
+
+class ImageVariantCache:
+    """磁盘上的衍生图 LRU 缓存（进程内维护索引）"""
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[CacheKey, int]" = OrderedDict()  # key -> 文件大小
+        self._total_bytes = 0
+        self._pending: Dict[CacheKey, asyncio.Future] = {}
+        self._pins: Dict[Path, int] = {}  # 发送中的文件 -> 引用数，淘汰时跳过
+        self._loaded = False
+
+    def path_for(self, key: CacheKey) -> Path:
+        """缓存文件路径"""
+        source_key, width, image_format = key
+        return self.directory / f"{source_key}-{width}.{image_format}"
+
+    def _load(self) -> None:
+        """扫描缓存目录恢复索引（需持有锁）"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        files = []
+        for path in self.directory.iterdir():
+            try:
+                source_key, width = path.stem.rsplit("-", 1)
+                key = (source_key, int(width), path.suffix.lstrip("."))
+                stat = path.stat()
+            except (ValueError, OSError):
+                continue
+            if key[2] in IMAGE_FORMATS:
+                files.append((stat.st_mtime, key, stat.st_size))
+
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _lookup(self, key: CacheKey) -> Optional[Path]:
+        """命中时标记为最近使用、固定并返回文件路径"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if key not in self._entries:
+                return None
+            path = self.path_for(key)
+            if not path.exists():
+                # 文件被其他进程淘汰或手动清理
+                self._total_bytes -= self._entries.pop(key)
+                return None
+            self._entries.move_to_end(key)
+            self._pins[path] = self._pins.get(path, 0) + 1
+            return path
+
+    def release(self, path: Path) -> None:
+        """解除 get 返回文件的固定（响应发送完成后调用）"""
+        with self._lock:
+            count = self._pins.pop(path, 0) - 1
+            if count > 0:
+                self._pins[path] = count
+
+    def _store(self, key: CacheKey) -> Path:
+        """登记新生成的文件，超出容量时淘汰最久未使用的条目（跳过发送中的文件）"""
+        path = self.path_for(key)
+        size = path.stat().st_size
+        evicted = []
+        with self._lock:
+            self._total_bytes += size - self._entries.pop(key, 0)
+            self._entries[key] = size
+            for old_key in list(self._entries):
+                if self._total_bytes <= self.max_bytes:
+                    break
+                old_path = self.path_for(old_key)
+                if old_key == key or old_path in self._pins:
+                    continue
+                self._total_bytes -= self._entries.pop(old_key)
+                evicted.append(old_path)
+
+        for old_path in evicted:
+            old_path.unlink(missing_ok=True)
+        return path
+
+    async def get(self, source_key: str, storage_key: str, width: int, image_format: str) -> Path:
+        """
+        获取衍生图文件路径，未缓存时生成（同一衍生图只生成一次）
+        source_key 标识原图内容（见 image_source_key），storage_key 为原图的存储键
+        返回的文件被固定，调用方用完后需调用 release
+        原图不存在时抛出 FileNotFoundError，无法解码（含像素数超出上限）时抛出 OSError，
+        图片处理进程异常退出时抛出 BrokenProcessPool（进程池随后重建）
+        """
+        key = (source_key, width, image_format)
+        loop = asyncio.get_running_loop()
+
+        while True:
+            path = await loop.run_in_executor(None, self._lookup, key)
+            if path is not None:
+                return path
+
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = loop.create_task(self._generate(key, storage_key))
+                self._pending[key] = pending
+                pending.add_done_callback(lambda _: self._pending.pop(key, None))
+            # 单个请求取消时不影响其他等待同一衍生图的请求；
+            # 生成后重新查找并固定（期间可能已被其他请求淘汰，此时重新生成）
+            await asyncio.shield(pending)
+
+    async def _generate(self, key: CacheKey, storage_key: str) -> Path:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._render, key, storage_key)
+        return await loop.run_in_executor(None, self._store, key)
+
+    def _render(self, key: CacheKey, storage_key: str) -> None:
+        """读取原图（对象存储时下载到临时文件）并在进程池中生成，阻塞调用"""
+        _, width, image_format = key
+        pool = get_image_pool()
+        with get_storage().readable(storage_key) as source:
+            try:
+                pool.submit(render_resized, str(source), str(self.path_for(key)), width, image_format).result()
+            except Image.DecompressionBombError as e:
+                raise OSError(str(e)) from e
+            except BrokenProcessPool:
+                reset_image_pool(pool)
+                raise
+
+    def discard(self, source_key: str) -> None:
+        """删除某个原图的全部缓存衍生图（原图文件删除时调用）"""
+        with self._lock:
+            keys = [key for key in self._entries if key[0] == source_key]
+            for key in keys:
+                self._total_bytes -= self._entries.pop(key)
+
+        for path in self.directory.glob(f"{source_key}-*"):
+            path.unlink(missing_ok=True)
+
+
+# 全局衍生图缓存实例
+image_cache = ImageVariantCache(settings.IMAGE_CACHE_DIR, settings.IMAGE_CACHE_MAX_BYTES)
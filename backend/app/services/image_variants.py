@@ -0,0 +1,173 @@
+"""
+记录图片衍生图
+上传完成后在后台进程池中为原图生成缩略图（画廊列表）与中等尺寸图（预览）：
+- 按 EXIF 方向信息旋转到正确朝向
+- 不写入任何元数据（EXIF、GPS 等），避免泄露拍摄位置
+- 统一重新编码为渐进式 JPEG，弱网下可先显示低清轮廓
+图片解码与缩放是 CPU 密集操作，放在独立进程中执行，不占用事件循环与 GIL；
+原图不在本地磁盘（对象存储）时先下载到临时文件，生成结果再上传
+"""
+import asyncio
+import logging
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path, PurePosixPath
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from PIL import Image, ImageOps
+from sqlalchemy import update
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.models.record import ImageBlob, RecordImage
+from app.services.storage import delete_keys, get_storage
+
+logger = logging.getLogger(__name__)
+
+# 衍生图名称 -> 最长边像素
+VARIANT_SIZES = {
+    "thumbnail": 320,
+    "medium": 1280,
+}
+
+VARIANT_QUALITY = 85
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def get_image_pool() -> ProcessPoolExecutor:
+    """获取（首次调用时创建）图片处理进程池"""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS)
+    return _pool
+
+
+def reset_image_pool(pool: Executor) -> None:
+    """
+    工作进程异常退出（BrokenProcessPool）后丢弃该进程池，下次使用时重新创建
+    只在 pool 仍为当前进程池时丢弃，避免并发调用丢弃已重新创建的进程池
+    """
+    global _pool
+    if _pool is pool:
+        _pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def shutdown_image_pool() -> None:
+    """关闭图片处理进程池（应用退出时调用）"""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=True, cancel_futures=True)
+        _pool = None
+
+
+def variant_key(source_key: str, variant: str) -> str:
+    """衍生图存储键：与原图同目录，文件名追加衍生图名称"""
+    source = PurePosixPath(source_key)
+    return str(source.with_name(f"{source.stem}_{variant}.jpg"))
+
+
+def load_oriented_image(source_path: str, keep_alpha: bool = False) -> Image.Image:
+    """
+    读取原图并按 EXIF 方向旋转，统一转换为 RGB（keep_alpha 时保留透明通道为 RGBA）
+    返回的是新图像对象，不携带原图的 EXIF 等元数据
+    """
+    with Image.open(source_path) as original:
+        image = ImageOps.exif_transpose(original)
+        has_alpha = image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info)
+        if has_alpha and keep_alpha:
+            return image.convert("RGBA")
+        if has_alpha:
+            # JPEG 不支持透明通道，铺白色背景
+            rgba = image.convert("RGBA")
+            flattened = Image.new("RGB", rgba.size, (255, 255, 255))
+            flattened.paste(rgba, mask=rgba.getchannel("A"))
+            return flattened
+        return image.convert("RGB")
+
+
+def save_atomic(image: Image.Image, target: Path, image_format: str, **options) -> None:
+    """先写临时文件再重命名，读取方不会看到写了一半的图片"""
+    temp_path = target.with_name(f".{target.name}.tmp")
+    image.save(temp_path, image_format, **options)
+    os.replace(temp_path, target)
+
+
+def render_variants(source_path: str, targets: Dict[str, str]) -> int:
+    """
+    生成全部衍生图，targets 为 {衍生图名称: 本地文件路径}，返回按方向旋转后的原图宽度
+    在进程池的工作进程中执行，只接收可序列化的参数
+    """
+    image = load_oriented_image(source_path)
+    for variant, max_edge in VARIANT_SIZES.items():
+        resized = image.copy()
+        resized.thumbnail((max_edge, max_edge), Image.LANCZOS)
+        save_atomic(resized, Path(targets[variant]), "JPEG", quality=VARIANT_QUALITY, optimize=True, progressive=True)
+    return image.width
+
+
+def render_stored_variants(pool: Executor, source_key: str) -> Tuple[Dict[str, str], int]:
+    """
+    为存储中的原图生成全部衍生图并存入存储，返回 ({衍生图名称: 存储键}, 原图宽度)
+    阻塞调用：在线程中执行读写存储，解码与缩放交给进程池
+    """
+    storage = get_storage()
+    keys = {variant: variant_key(source_key, variant) for variant in VARIANT_SIZES}
+    with storage.readable(source_key) as source, ExitStack() as stack:
+        targets = {variant: str(stack.enter_context(storage.writable(key))) for variant, key in keys.items()}
+        width = pool.submit(render_variants, str(source), targets).result()
+    return keys, width
+
+
+async def build_variants(source_key: str) -> Tuple[Dict[str, str], int]:
+    """在进程池中生成衍生图，返回衍生图存储键与原图宽度"""
+    return await run_in_threadpool(render_stored_variants, get_image_pool(), source_key)
+
+
+async def generate_blob_variants(content_hash: str) -> None:
+    """
+    为图片内容生成衍生图，并回写到内容及引用它的全部记录图片（上传接口返回后作为后台任务执行）
+    生成失败只记录日志，接口会继续返回原图
+    """
+    async with AsyncSessionLocal() as db:
+        blob = await db.get(ImageBlob, content_hash)
+        if blob is None or (blob.thumbnail_path and blob.medium_path):
+            return
+
+        try:
+            keys, width = await build_variants(blob.file_path)
+        except Exception:
+            logger.exception("生成图片内容 %s 的衍生图失败", content_hash)
+            return
+
+        # 生成期间最后一个引用可能已被删除
+        if await db.get(ImageBlob, content_hash, populate_existing=True) is None:
+            await run_in_threadpool(delete_keys, keys.values())
+            return
+
+        blob.thumbnail_path = keys["thumbnail"]
+        blob.medium_path = keys["medium"]
+        blob.width = width
+        await db.execute(
+            update(RecordImage)
+            .where(RecordImage.content_hash == content_hash)
+            .values(thumbnail_path=keys["thumbnail"], medium_path=keys["medium"], width=width)
+        )
+        await db.commit()
+
+
+async def generate_blobs_variants(content_hashes: List[str]) -> None:
+    """
+    为多个图片内容并行生成衍生图（批量上传后作为后台任务执行）
+    同时处理的数量与进程池大小一致，避免大量会话同时占用数据库连接等待进程池
+    """
+    semaphore = asyncio.Semaphore(settings.IMAGE_WORKERS)
+
+    async def generate(content_hash: str) -> None:
+        async with semaphore:
+            await generate_blob_variants(content_hash)
+
+    await asyncio.gather(*(generate(content_hash) for content_hash in content_hashes))
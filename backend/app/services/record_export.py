@@ -0,0 +1,763 @@
+"""
+记录导出
+各导出格式的生成逻辑，供导出接口（边生成边发送）与后台导出任务（生成文件后下载）共用：
+- 记录经服务端游标分批加载，内存占用与导出总数无关
+- json / csv / markdown / zip 为字节流生成器，xlsx 按批写入文件，
+  pdf / docx 在进程池中按组并行渲染后合并为文件（document_render）
+- 可传入进度回调，每处理完一批记录调用一次
+- 每批记录的格式化、序列化（以及压缩、写文件）在线程池中进行，事件循环只负责查询与发送
+"""
+import asyncio
+import codecs
+import concurrent.futures
+import csv
+import io
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+import textwrap
+from collections import deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+import xlsxwriter
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.query_budget import queries_untracked, query_scope
+from app.models.record import Record
+from app.models.user import User, UserRole
+from app.services.document_render import (
+    DOCUMENT_CHUNK_SIZE,
+    DOCX_MEDIA_TYPE,
+    DocumentItem,
+    get_render_pool,
+    merge_docx,
+    merge_pdf,
+    render_docx_part,
+    render_pdf_part,
+)
+from app.services.record_query import record_detail_options
+from app.services.storage import get_storage
+from app.services.zip_stream import ZipStream
+
+logger = logging.getLogger(__name__)
+
+# 进度回调：参数为本批处理完的记录数
+ProgressCallback = Callable[[int], Awaitable[None]]
+
+# 流式导出每批加载的记录数
+EXPORT_BATCH_SIZE = 200
+
+# 每批加载的查询预算：记录（JOIN 场域）、参与者、标签、图片各一条查询，
+# 每条记录（含其参与者、标签、图片）平均不超过 EXPORT_ROWS_PER_RECORD 行
+EXPORT_BATCH_QUERIES = 4
+EXPORT_ROWS_PER_RECORD = 30
+
+# 读取图片、导出文件时每次读取的字节数
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# CSV 表头
+CSV_HEADERS = ['ID', '标题', '类型', '记录日期', '时间段', '持续时间(分钟)', '场域', '参与者', '标签', '内容', '状态', '创建时间', '更新时间']
+
+# XLSX 记录工作表的列：(表头, 单元格类型, 列宽)
+XLSX_RECORD_COLUMNS = [
+    ('ID', 'number', 8),
+    ('标题', 'string', 30),
+    ('类型', 'string', 10),
+    ('记录日期', 'datetime', 17),
+    ('时间段', 'string', 14),
+    ('持续时间(分钟)', 'number', 14),
+    ('场域', 'string', 30),
+    ('参与者', 'string', 24),
+    ('标签', 'string', 24),
+    ('内容', 'string', 60),
+    ('状态', 'string', 8),
+    ('创建时间', 'datetime', 17),
+    ('更新时间', 'datetime', 17),
+]
+
+# XLSX 参与者与标签工作表的列（每条记录的每个参与者/标签一行）
+XLSX_RELATION_COLUMNS = [
+    ('记录ID', 'number', 8),
+    ('记录标题', 'string', 30),
+    ('类别', 'string', 8),
+    ('名称', 'string', 24),
+]
+
+# Excel 单元格最多容纳的字符数，超出部分 xlsxwriter 会截断
+XLSX_MAX_CELL_CHARS = 32767
+
+# 超长文本所在单元格末尾的提示，完整内容分段写入超长内容工作表
+XLSX_OVERFLOW_NOTE = '…（超出 Excel 单元格长度上限，完整内容见「超长内容」工作表）'
+
+# XLSX 超长内容工作表的列（超长文本按单元格上限分段，每段一行）
+XLSX_OVERFLOW_COLUMNS = [
+    ('记录ID', 'number', 8),
+    ('列', 'string', 10),
+    ('分段', 'number', 6),
+    ('内容', 'string', 100),
+]
+
+XLSX_MEDIA_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 导出格式 -> (文件扩展名, Content-Type)
+EXPORT_FORMATS = {
+    'json': ('.json', 'application/json'),
+    'csv': ('.csv', 'text/csv; charset=utf-8'),
+    'xlsx': ('.xlsx', XLSX_MEDIA_TYPE),
+    'markdown': ('.md', 'text/markdown; charset=utf-8'),
+    'zip': ('.zip', 'application/zip'),
+    'pdf': ('.pdf', 'application/pdf'),
+    'docx': ('.docx', DOCX_MEDIA_TYPE),
+}
+
+# 包含图片的导出格式（需要加载记录图片，图片变化时缓存的导出文件失效）
+IMAGE_EXPORT_FORMATS = {'zip', 'pdf', 'docx'}
+
+# 文档导出格式 -> (片段渲染函数, 合并函数)，均在进程池中执行
+DOCUMENT_RENDERERS = {
+    'pdf': (render_pdf_part, merge_pdf),
+    'docx': (render_docx_part, merge_docx),
+}
+
+# 压缩包内文件名中不允许的字符（路径分隔符、Windows 保留字符、控制字符）
+_UNSAFE_NAME_PATTERN = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def get_type_label(type_value: str) -> str:
+    """获取类型中文标签"""
+    labels = {
+        'field_note': '田野笔记',
+        'interview': '访谈记录',
+        'observation': '观察记录',
+        'other': '其他'
+    }
+    return labels.get(type_value, type_value)
+
+
+def get_status_label(status_value: str) -> str:
+    """获取状态中文标签"""
+    labels = {
+        'draft': '草稿',
+        'completed': '已完成',
+        'archived': '已归档'
+    }
+    return labels.get(status_value, status_value)
+
+
+def format_record_for_export(record: Record) -> dict:
+    """格式化记录用于导出"""
+    # 场域信息
+    field_info = ""
+    if record.field:
+        parts = [record.field.region, record.field.location]
+        if record.field.sub_field:
+            parts.append(record.field.sub_field)
+        field_info = " - ".join(parts)
+    if record.specific_location:
+        field_info = f"{field_info} ({record.specific_location})" if field_info else record.specific_location
+
+    # 参与者
+    participants = ", ".join([p.name_or_code for p in record.participants]) if record.participants else ""
+
+    # 标签
+    tags = ", ".join([t.name for t in record.tags]) if record.tags else ""
+
+    # 内容
+    content = record.content or {}
+    content_text = ""
+    if isinstance(content, dict):
+        if content.get('description'):
+            content_text += f"描述：{content['description']}\n"
+        if content.get('reflection'):
+            content_text += f"反思：{content['reflection']}\n"
+        if content.get('notes'):
+            content_text += f"备注：{content['notes']}\n"
+    content_text = content_text.strip() or str(content)
+
+    return {
+        'id': record.id,
+        'title': record.title,
+        'type': get_type_label(record.type.value),
+        'type_value': record.type.value,
+        'record_date': record.record_date.strftime('%Y-%m-%d %H:%M') if record.record_date else '',
+        'time_range': record.time_range or '',
+        'duration': record.duration or 0,
+        'field': field_info,
+        'participants': participants,
+        'tags': tags,
+        'content': content_text,
+        'content_raw': content,
+        'status': get_status_label(record.status.value),
+        'status_value': record.status.value,
+        'created_at': record.created_at.strftime('%Y-%m-%d %H:%M') if record.created_at else '',
+        'updated_at': record.updated_at.strftime('%Y-%m-%d %H:%M') if record.updated_at else '',
+    }
+
+
+def format_record_markdown(record: Record, data: dict) -> List[str]:
+    """记录的 Markdown 段落（不含分隔线）"""
+    content = record.content or {}
+
+    md_lines = [
+        f"## {data['title']}",
+        f"",
+        f"| 属性 | 值 |",
+        f"|------|-----|",
+        f"| 类型 | {data['type']} |",
+        f"| 记录日期 | {data['record_date']} |",
+        f"| 时间段 | {data['time_range'] or '-'} |",
+        f"| 持续时间 | {data['duration']}分钟 |" if data['duration'] else f"| 持续时间 | - |",
+        f"| 场域 | {data['field'] or '-'} |",
+        f"| 参与者 | {data['participants'] or '-'} |",
+        f"| 标签 | {data['tags'] or '-'} |",
+        f"| 状态 | {data['status']} |",
+        f""
+    ]
+
+    # 内容部分
+    if isinstance(content, dict):
+        if content.get('description'):
+            md_lines.extend([
+                f"### 描述",
+                f"",
+                content['description'],
+                f""
+            ])
+        if content.get('reflection'):
+            md_lines.extend([
+                f"### 反思",
+                f"",
+                content['reflection'],
+                f""
+            ])
+        if content.get('notes'):
+            md_lines.extend([
+                f"### 备注",
+                f"",
+                content['notes'],
+                f""
+            ])
+
+    return md_lines
+
+
+def export_owner_id(user: User) -> Optional[int]:
+    """数据隔离：研究者只能导出自己的记录（返回其用户ID），管理员可导出全部（返回 None）"""
+    return None if user.role == UserRole.ADMIN else user.id
+
+
+def record_conditions(record_ids: Optional[List[int]], owner_id: Optional[int]) -> list:
+    """导出记录的筛选条件：owner_id 不为空时只导出其创建的记录，record_ids 不为空时只导出指定记录"""
+    conditions = []
+    if owner_id is not None:
+        conditions.append(Record.created_by == owner_id)
+    if record_ids is not None:
+        conditions.append(Record.id.in_(record_ids))
+    return conditions
+
+
+async def iter_export_records(
+    conditions: list,
+    with_images: bool = False,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[List[Record]]:
+    """
+    按批加载导出的记录（含场域、参与者、标签，with_images 时含图片），顺序同其他导出格式
+    - 记录ID通过服务端游标（yield_per）按 EXPORT_BATCH_SIZE 分批读取，不一次取回全部结果
+    - 游标占用一个连接，详情在另一个会话中按批加载（游标未读完时同一连接不能执行其他查询）
+    - 每批处理完后从会话中移除，会话中只保留当前一批对象，内存占用与导出总数无关
+    - 查询次数随导出数量增长，不计入接口的查询预算；每批单独检查预算（见 EXPORT_BATCH_QUERIES）
+    """
+    query = (
+        select(Record.id)
+        .where(*conditions)
+        .order_by(Record.record_date.desc(), Record.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    options = record_detail_options()
+    if with_images:
+        options.append(selectinload(Record.images))
+
+    async with AsyncSessionLocal() as cursor_db, AsyncSessionLocal() as db:
+        with queries_untracked():
+            result = await cursor_db.stream_scalars(query)
+        async for batch_ids in result.partitions():
+            with query_scope("export.batch", EXPORT_BATCH_QUERIES, EXPORT_ROWS_PER_RECORD * len(batch_ids)):
+                records = (await db.scalars(
+                    select(Record).options(*options).where(Record.id.in_(batch_ids))
+                )).all()
+                # 结束只读事务归还连接，处理本批（如发送图片）期间不占用详情会话的连接
+                await db.commit()
+            records_by_id = {record.id: record for record in records}
+            batch = [records_by_id[record_id] for record_id in batch_ids if record_id in records_by_id]
+            yield batch
+            db.expunge_all()
+            if progress is not None:
+                await progress(len(batch))
+
+
+@asynccontextmanager
+async def export_batches(
+    conditions: list,
+    with_images: bool = False,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[AsyncIterator[List[Record]]]:
+    """
+    iter_export_records 的上下文管理器形式
+    退出时关闭生成器：调用方中途停止迭代（客户端断开、写入失败）时也立即释放两个会话与服务端游标，
+    不依赖垃圾回收
+    """
+    batches = iter_export_records(conditions, with_images, progress)
+    try:
+        yield batches
+    finally:
+        await batches.aclose()
+
+
+def json_record_items(records: List[Record]) -> List[bytes]:
+    """一批记录各自在 records 数组中的 JSON 片段（已缩进，不含分隔符）"""
+    items = []
+    for record in records:
+        item = json.dumps(format_record_for_export(record), ensure_ascii=False, indent=2)
+        items.append(textwrap.indent(item, '    ').encode('utf-8'))
+    return items
+
+
+async def json_export_stream(conditions: list, total_count: int, progress: Optional[ProgressCallback] = None):
+    """
+    逐批查询并序列化记录（每批一次线程池调用），每条记录输出一个数据块
+    输出与整体 json.dumps(indent=2) 的格式一致：记录单独序列化后缩进到 records 数组中
+    """
+    header = {
+        'export_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_count': total_count,
+    }
+    # 去掉头部对象末尾的 "\n}"，接着输出 records 数组
+    yield json.dumps(header, ensure_ascii=False, indent=2)[:-2].encode('utf-8') + b',\n  "records": ['
+
+    separator = b'\n'
+    async with export_batches(conditions, progress=progress) as batches:
+        async for records in batches:
+            for item in await run_in_threadpool(json_record_items, records):
+                yield separator + item
+                separator = b',\n'
+
+    yield b'\n  ]\n}' if separator != b'\n' else b']\n}'
+
+
+def csv_row(data: dict) -> list:
+    """CSV 的一行，列顺序同 CSV_HEADERS；内容中的换行替换为空格，保持一条记录一行"""
+    return [
+        data['id'],
+        data['title'],
+        data['type'],
+        data['record_date'],
+        data['time_range'],
+        data['duration'],
+        data['field'],
+        data['participants'],
+        data['tags'],
+        data['content'].replace('\n', ' '),
+        data['status'],
+        data['created_at'],
+        data['updated_at'],
+    ]
+
+
+async def csv_export_stream(conditions: list, progress: Optional[ProgressCallback] = None):
+    """
+    逐批生成CSV导出内容
+    由 csv.writer 负责转义（文本列加引号、引号加倍），数值列不加引号；
+    以 UTF-8 BOM 开头，Excel 可直接识别中文
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC, lineterminator='\n')
+
+    def write_rows(rows) -> bytes:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        return buffer.getvalue().encode('utf-8')
+
+    def write_records(records: List[Record]) -> bytes:
+        return write_rows(csv_row(format_record_for_export(record)) for record in records)
+
+    yield codecs.BOM_UTF8 + write_rows([CSV_HEADERS])
+
+    async with export_batches(conditions, progress=progress) as batches:
+        async for records in batches:
+            yield await run_in_threadpool(write_records, records)
+
+
+def xlsx_record_rows(record: Record) -> Tuple[list, List[list]]:
+    """记录在 XLSX 中的一行（日期为 datetime、时长为数值）及其参与者/标签行"""
+    data = format_record_for_export(record)
+    row = [
+        data['id'],
+        data['title'],
+        data['type'],
+        record.record_date,
+        data['time_range'],
+        data['duration'],
+        data['field'],
+        data['participants'],
+        data['tags'],
+        data['content'],
+        data['status'],
+        record.created_at,
+        record.updated_at,
+    ]
+    relations = [[record.id, record.title, '参与者', p.name_or_code] for p in record.participants]
+    relations += [[record.id, record.title, '标签', t.name] for t in record.tags]
+    return row, relations
+
+
+class XlsxExportWriter:
+    """
+    逐批写入 XLSX 文件（xlsxwriter constant_memory 模式）
+    每个工作表按行顺序写入临时文件，内存中只保留当前行；关闭时组装成 XLSX
+    方法均为阻塞调用，通过 run_in_threadpool 调用
+    """
+
+    def __init__(self, path: Path):
+        self.workbook = xlsxwriter.Workbook(str(path), {
+            'constant_memory': True,
+            'remove_timezone': True,        # Excel 日期不带时区
+            'strings_to_formulas': False,   # 以 = 开头的文本按文本写入，不作为公式执行
+            'strings_to_urls': False,
+        })
+        self.header_format = self.workbook.add_format({'bold': True})
+        self.datetime_format = self.workbook.add_format({'num_format': 'yyyy-mm-dd hh:mm'})
+        self.records = self._add_sheet('田野记录', XLSX_RECORD_COLUMNS)
+        self.relations = self._add_sheet('参与者与标签', XLSX_RELATION_COLUMNS)
+        self.overflow = None        # 超长内容工作表，首次遇到超长文本时创建
+        self.rows = {self.records: 1, self.relations: 1}
+
+    def _add_sheet(self, name: str, columns: list):
+        sheet = self.workbook.add_worksheet(name)
+        for index, (header, _, width) in enumerate(columns):
+            sheet.set_column(index, index, width)
+            sheet.write_string(0, index, header, self.header_format)
+        sheet.freeze_panes(1, 0)
+        return sheet
+
+    def _write_row(self, sheet, columns: list, values: list) -> None:
+        row = self.rows[sheet]
+        for index, ((header, kind, _), value) in enumerate(zip(columns, values)):
+            if value is None or value == '':
+                continue
+            if kind == 'number':
+                sheet.write_number(row, index, value)
+            elif kind == 'datetime':
+                sheet.write_datetime(row, index, value, self.datetime_format)
+            else:
+                if len(value) > XLSX_MAX_CELL_CHARS:
+                    self._write_overflow(values[0], header, value)
+                    value = value[:XLSX_MAX_CELL_CHARS - len(XLSX_OVERFLOW_NOTE)] + XLSX_OVERFLOW_NOTE
+                sheet.write_string(row, index, value)
+        self.rows[sheet] = row + 1
+
+    def _write_overflow(self, record_id: int, header: str, text: str) -> None:
+        """超过单元格上限的文本按上限分段写入超长内容工作表，避免被 Excel 截断"""
+        if self.overflow is None:
+            self.overflow = self._add_sheet('超长内容', XLSX_OVERFLOW_COLUMNS)
+            self.rows[self.overflow] = 1
+        for part, start in enumerate(range(0, len(text), XLSX_MAX_CELL_CHARS), start=1):
+            chunk = text[start:start + XLSX_MAX_CELL_CHARS]
+            self._write_row(self.overflow, XLSX_OVERFLOW_COLUMNS, [record_id, header, part, chunk])
+        logger.info("记录 %s 的%s超出 Excel 单元格长度上限（%d 字符），已分段写入超长内容工作表",
+                    record_id, header, len(text))
+
+    def write_records(self, records: List[Record]) -> None:
+        """写入一批记录及其参与者/标签行"""
+        relations = []
+        for record in records:
+            row, record_relations = xlsx_record_rows(record)
+            self._write_row(self.records, XLSX_RECORD_COLUMNS, row)
+            relations.extend(record_relations)
+        for values in relations:
+            self._write_row(self.relations, XLSX_RELATION_COLUMNS, values)
+
+    def close(self) -> None:
+        sheets = [(self.records, XLSX_RECORD_COLUMNS), (self.relations, XLSX_RELATION_COLUMNS)]
+        if self.overflow is not None:
+            sheets.append((self.overflow, XLSX_OVERFLOW_COLUMNS))
+        for sheet, columns in sheets:
+            sheet.autofilter(0, 0, max(self.rows[sheet] - 1, 1), len(columns) - 1)
+        self.workbook.close()
+
+
+async def build_xlsx_export(conditions: list, path: Path, progress: Optional[ProgressCallback] = None) -> None:
+    """按批查询记录并写入 XLSX 文件"""
+    writer = await run_in_threadpool(XlsxExportWriter, path)
+    try:
+        async with export_batches(conditions, progress=progress) as batches:
+            async for records in batches:
+                await run_in_threadpool(writer.write_records, records)
+    finally:
+        await run_in_threadpool(writer.close)
+
+
+def temp_export_path(suffix: str) -> Path:
+    """导出文件的临时路径（由 stream_export_file 发送后删除）"""
+    fd, path = tempfile.mkstemp(prefix="export-", suffix=suffix)
+    os.close(fd)
+    return Path(path)
+
+
+async def stream_export_file(path: Path):
+    """分块发送导出文件，发送结束（或客户端断开）后删除"""
+    try:
+        handle = await run_in_threadpool(open, path, 'rb')
+        try:
+            while True:
+                chunk = await run_in_threadpool(handle.read, EXPORT_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            await run_in_threadpool(handle.close)
+    finally:
+        await run_in_threadpool(path.unlink, True)
+
+
+def markdown_records_chunk(records: List[Record]) -> bytes:
+    """一批记录的 Markdown 段落，每条记录以分隔线结尾"""
+    chunks = []
+    for record in records:
+        md_lines = format_record_markdown(record, format_record_for_export(record))
+        md_lines.extend([f"---", f""])
+        chunks.append('\n' + '\n'.join(md_lines))
+    return ''.join(chunks).encode('utf-8')
+
+
+async def markdown_export_stream(conditions: list, total_count: int, progress: Optional[ProgressCallback] = None):
+    """逐批生成Markdown导出内容，每批记录一个数据块"""
+    md_lines = [
+        f"# 田野记录导出",
+        f"",
+        f"导出时间：{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+        f"",
+        f"共 {total_count} 条记录",
+        f"",
+        f"---",
+        f""
+    ]
+    yield '\n'.join(md_lines).encode('utf-8')
+
+    async with export_batches(conditions, progress=progress) as batches:
+        async for records in batches:
+            if records:
+                yield await run_in_threadpool(markdown_records_chunk, records)
+
+
+def zip_entry_name(value: str, max_length: int = 60) -> str:
+    """压缩包内的文件/目录名：替换路径分隔符等非法字符并截断"""
+    name = _UNSAFE_NAME_PATTERN.sub("_", value).strip(" .")
+    return name[:max_length] or "_"
+
+
+def zip_record_files(archive: ZipStream, folder: str, record: Record) -> bytes:
+    """写入记录的 record.json 与 record.md，返回生成的 ZIP 字节"""
+    data = format_record_for_export(record)
+    return archive.write(
+        f"{folder}/record.json", json.dumps(data, ensure_ascii=False, indent=2).encode('utf-8')
+    ) + archive.write(
+        f"{folder}/record.md", '\n'.join(format_record_markdown(record, data)).encode('utf-8')
+    )
+
+
+def zip_copy_chunk(archive: ZipStream, entry, handle) -> Optional[bytes]:
+    """从图片读取一块写入条目，返回生成的 ZIP 字节；读完时返回 None"""
+    chunk = handle.read(EXPORT_CHUNK_SIZE)
+    if not chunk:
+        return None
+    return archive.write_chunk(entry, chunk)
+
+
+async def zip_export_stream(conditions: list, progress: Optional[ProgressCallback] = None):
+    """
+    逐条写出记录目录（record.json、record.md 与原图），边生成边发送
+    - 使用独立的数据库会话（iter_export_records）：响应体在接口函数返回后才开始生成
+    - 图片按 EXPORT_CHUNK_SIZE 分块读取，本地存储与对象存储均不整张读入内存
+    - 图片文件缺失时跳过并记录日志
+    - 序列化、压缩与图片读取在线程池中进行
+    """
+    storage = get_storage()
+    archive = ZipStream()
+    total_count = 0
+    image_count = 0
+
+    async with export_batches(conditions, with_images=True, progress=progress) as batches:
+        async for records in batches:
+            for record in records:
+                folder = f"{record.id:05d}_{zip_entry_name(record.title)}"
+                total_count += 1
+
+                yield await run_in_threadpool(zip_record_files, archive, folder, record)
+
+                images = sorted(record.images, key=lambda image: (image.sort_order or 0, image.id))
+                for index, image in enumerate(images, start=1):
+                    try:
+                        handle = await run_in_threadpool(storage.open, image.file_path)
+                    except FileNotFoundError:
+                        logger.warning("导出时图片文件缺失，已跳过: %s", image.file_path)
+                        continue
+                    try:
+                        name = f"{folder}/images/{index:02d}_{zip_entry_name(image.original_filename, 100)}"
+                        with archive.open(name, image.file_size) as entry:
+                            while True:
+                                chunk = await run_in_threadpool(zip_copy_chunk, archive, entry, handle)
+                                if chunk is None:
+                                    break
+                                yield chunk
+                        yield archive.drain()
+                        image_count += 1
+                    finally:
+                        await run_in_threadpool(handle.close)
+
+    export_info = {
+        'export_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_count': total_count,
+        'image_count': image_count,
+    }
+    yield archive.write('export_info.json', json.dumps(export_info, ensure_ascii=False, indent=2).encode('utf-8'))
+    yield archive.close()
+
+
+def _read_file(storage, key: str) -> bytes:
+    with storage.open(key) as handle:
+        return handle.read()
+
+
+async def document_item(record: Record) -> DocumentItem:
+    """文档渲染的输入：格式化后的记录与图片（优先使用缩略图，尚未生成时使用原图，由渲染进程缩小）"""
+    storage = get_storage()
+    images = []
+    for image in sorted(record.images, key=lambda image: (image.sort_order or 0, image.id)):
+        key = image.thumbnail_path or image.file_path
+        try:
+            images.append(await run_in_threadpool(_read_file, storage, key))
+        except FileNotFoundError:
+            logger.warning("导出时图片文件缺失，已跳过: %s", key)
+    return format_record_for_export(record), images
+
+
+async def build_document_export(
+    export_format: str,
+    conditions: list,
+    total_count: int,
+    path: Path,
+    progress: Optional[ProgressCallback] = None,
+) -> None:
+    """
+    生成 PDF / Word 导出文件
+    - 记录按 DOCUMENT_CHUNK_SIZE 条一组提交到渲染进程池并行渲染为片段文件，事件循环只负责查询与读取图片
+    - 进行中的渲染任务不超过进程数的两倍，内存中只保留这些组的记录与缩略图
+    - 片段按顺序完成后报告进度，全部完成后在进程池中合并
+    - 失败或取消时先等待正在执行的渲染任务结束，再删除片段目录
+    """
+    render_part, merge = DOCUMENT_RENDERERS[export_format]
+    suffix, _ = EXPORT_FORMATS[export_format]
+    pool = get_render_pool()
+    max_pending = max(1, settings.EXPORT_RENDER_WORKERS) * 2
+    cover = {
+        'export_time': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'total_count': total_count,
+    }
+
+    part_dir = Path(await run_in_threadpool(tempfile.mkdtemp, None, "export-"))
+    part_paths: List[str] = []
+    pending = deque()
+
+    async def wait_oldest() -> None:
+        future, count = pending[0]
+        await asyncio.wrap_future(future)
+        pending.popleft()
+        if progress is not None:
+            await progress(count)
+
+    def submit(items: List[DocumentItem]) -> None:
+        part_path = str(part_dir / f"{len(part_paths):05d}{suffix}")
+        part_paths.append(part_path)
+        pending.append((pool.submit(render_part, items, part_path), len(items)))
+
+    try:
+        items: List[DocumentItem] = []
+        async with export_batches(conditions, with_images=True) as batches:
+            async for records in batches:
+                for record in records:
+                    items.append(await document_item(record))
+                    if len(items) >= DOCUMENT_CHUNK_SIZE:
+                        submit(items)
+                        items = []
+                        while len(pending) >= max_pending:
+                            await wait_oldest()
+        if items:
+            submit(items)
+        while pending:
+            await wait_oldest()
+        # 合并任务同样登记在 pending 中，失败或取消时等待其结束后再清理
+        pending.append((pool.submit(merge, cover, part_paths, str(path)), 0))
+        await asyncio.wrap_future(pending[0][0])
+    finally:
+        # cancel 只能取消尚未开始的任务，等待正在执行的渲染结束后再删除片段目录
+        futures = [future for future, _ in pending]
+        for future in futures:
+            future.cancel()
+        await run_in_threadpool(concurrent.futures.wait, futures)
+        await run_in_threadpool(shutil.rmtree, part_dir, True)
+
+
+def export_stream(
+    export_format: str,
+    conditions: list,
+    total_count: int,
+    progress: Optional[ProgressCallback] = None,
+) -> AsyncIterator[bytes]:
+    """边生成边输出的导出格式对应的字节流（xlsx、pdf、docx 需要整体生成，使用 write_export_file）"""
+    if export_format == 'json':
+        return json_export_stream(conditions, total_count, progress)
+    if export_format == 'csv':
+        return csv_export_stream(conditions, progress)
+    if export_format == 'markdown':
+        return markdown_export_stream(conditions, total_count, progress)
+    if export_format == 'zip':
+        return zip_export_stream(conditions, progress)
+    raise ValueError(f"不支持流式生成的导出格式: {export_format}")
+
+
+async def write_export_file(
+    export_format: str,
+    conditions: list,
+    total_count: int,
+    path: Path,
+    progress: Optional[ProgressCallback] = None,
+) -> None:
+    """生成导出文件（后台导出任务，以及需要整体生成的格式）"""
+    if export_format == 'xlsx':
+        await build_xlsx_export(conditions, path, progress)
+        return
+    if export_format in DOCUMENT_RENDERERS:
+        await build_document_export(export_format, conditions, total_count, path, progress)
+        return
+
+    handle = await run_in_threadpool(open, path, 'wb')
+    stream = export_stream(export_format, conditions, total_count, progress)
+    try:
+        async for chunk in stream:
+            if chunk:
+                await run_in_threadpool(handle.write, chunk)
+    finally:
+        await stream.aclose()
+        await run_in_threadpool(handle.close)
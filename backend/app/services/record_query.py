@@ -0,0 +1,282 @@
+"""
+记录查询构建
+统一处理记录列表的筛选条件、数据隔离与游标分页
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import Select, and_, false, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, load_only, raiseload, selectinload
+
+from app.models.user import User, UserRole
+from app.models.record import Record, RecordType, RecordStatus
+from app.models.participant import Participant
+from app.models.tag import Tag
+from app.schemas.record import (
+    RecordFilters, RECORD_LIST_COLUMN_FIELDS, RECORD_LIST_RELATION_FIELDS,
+    DEFAULT_RECORD_LIST_FIELDS, RECORD_FACET_FIELDS, FacetBucket
+)
+from app.services.bitmap_index import RoaringBitmap, relation_index
+from app.services.counting import make_count_signature
+from app.services.search import apply_search_filter
+
+
+def parse_id_list(value: Optional[str]) -> list:
+    """解析逗号分隔的ID列表，忽略无效的ID格式"""
+    if not value:
+        return []
+    try:
+        return [int(item.strip()) for item in value.split(',') if item.strip()]
+    except ValueError:
+        return []
+
+
+async def apply_record_filters(
+    db: AsyncSession, query: Select, filters: RecordFilters, current_user: User, record_id: Optional[int] = None
+) -> Select:
+    """
+    为记录查询添加数据隔离与筛选条件
+    - 传入 record_id 时只判断该条记录是否符合条件（用于增量维护查询结果）
+    - 使用标签/参与者布尔表达式时按需加载内存位图索引
+    """
+    if record_id is not None:
+        query = query.filter(Record.id == record_id)
+
+    # 数据隔离：研究者只能看到自己的记录，管理员可以看到所有记录
+    if current_user.role != UserRole.ADMIN:
+        query = query.filter(Record.created_by == current_user.id)
+
+    # 类型筛选
+    if filters.type:
+        query = query.filter(Record.type == RecordType(filters.type.value))
+
+    # 状态筛选
+    if filters.status:
+        query = query.filter(Record.status == RecordStatus(filters.status.value))
+
+    # 创建者筛选
+    if filters.created_by:
+        query = query.filter(Record.created_by == filters.created_by)
+
+    # 全文检索（标题及内容）
+    if filters.search:
+        query = apply_search_filter(query, filters.search)
+
+    # 日期范围筛选
+    if filters.start_date:
+        query = query.filter(Record.record_date >= filters.start_date)
+    if filters.end_date:
+        query = query.filter(Record.record_date <= filters.end_date)
+
+    # 场域筛选
+    if filters.field_id:
+        query = query.filter(Record.field_id == filters.field_id)
+
+    # 参与者筛选（需要关联查询）
+    if filters.participant_ids:
+        query = query.filter(Record.participants.any(Participant.id.in_(filters.participant_ids)))
+
+    # 标签筛选（需要关联查询）
+    if filters.tag_ids:
+        query = query.filter(Record.tags.any(Tag.id.in_(filters.tag_ids)))
+
+    # 标签/参与者布尔表达式：在内存位图中求出记录ID集合后交给主查询
+    for expression, kind in ((filters.tag_expr, "tags"), (filters.participant_expr, "participants")):
+        if expression:
+            await relation_index.ensure_loaded()
+            record_ids = relation_index.evaluate(expression, kind)
+            if record_id is not None:
+                if record_id not in record_ids:
+                    query = query.filter(false())
+            else:
+                query = query.filter(Record.id.in_(list(record_ids)) if record_ids else false())
+
+    return query
+
+
+def record_count_signature(filters: RecordFilters, current_user: User) -> str:
+    """记录总数缓存签名：数据隔离范围 + 全部筛选条件"""
+    user_scope = None if current_user.role == UserRole.ADMIN else current_user.id
+    return make_count_signature(user_scope, **filters.model_dump(mode="json"))
+
+
+# ============ 字段投影 ============
+
+def parse_record_fields(fields: Optional[str]) -> List[str]:
+    """解析 fields 参数，为空时使用默认精简字段，"*" 表示全部字段"""
+    if not fields:
+        return list(DEFAULT_RECORD_LIST_FIELDS)
+
+    allowed = RECORD_LIST_COLUMN_FIELDS + RECORD_LIST_RELATION_FIELDS
+    if fields.strip() == "*":
+        return list(allowed)
+
+    selected = []
+    for name in (item.strip() for item in fields.split(',')):
+        if not name or name == "id":
+            continue
+        if name not in allowed:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的字段: {name}。可选字段: {', '.join(allowed)}"
+            )
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+
+def apply_record_projection(query: Select, selected: List[str]) -> Select:
+    """只加载请求的列与关联，其余列和关联禁止加载（访问时直接报错而不是逐行补查）"""
+    columns = {"id", "record_date"}  # 排序与游标所需
+    columns.update(name for name in selected if name in RECORD_LIST_COLUMN_FIELDS)
+    if "field" in selected:
+        columns.add("field_id")
+
+    options = [load_only(*(getattr(Record, name) for name in sorted(columns)), raiseload=True)]
+    if "field" in selected:
+        options.append(joinedload(Record.field))
+    # 多对多关联使用 IN 批量加载（每个关联一条查询），避免 JOIN 造成的行数相乘
+    if "participants" in selected:
+        options.append(selectinload(Record.participants))
+    if "tags" in selected:
+        options.append(selectinload(Record.tags))
+    options.append(raiseload("*"))
+
+    return query.options(*options)
+
+
+def record_detail_options() -> list:
+    """记录详情/导出的加载选项：场域随主查询 JOIN（多对一不会放大行数），参与者与标签各一条 IN 查询"""
+    return [
+        joinedload(Record.field),
+        selectinload(Record.participants),
+        selectinload(Record.tags),
+    ]
+
+
+async def load_record_detail(db: AsyncSession, record_id: int) -> Optional[Record]:
+    """加载记录详情（含场域、参与者、标签），会覆盖会话中已有对象的状态"""
+    return await db.scalar(
+        select(Record)
+        .options(*record_detail_options())
+        .where(Record.id == record_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def project_record(record: Record, selected: List[str]) -> Dict[str, Any]:
+    """按请求字段提取记录数据"""
+    data = {"id": record.id}
+    for name in selected:
+        data[name] = getattr(record, name)
+    return data
+
+
+# ============ 分面统计 ============
+
+def parse_record_facets(facets: Optional[str]) -> List[str]:
+    """解析 facets 参数"""
+    if not facets:
+        return []
+
+    selected = []
+    for name in (item.strip() for item in facets.split(',')):
+        if not name:
+            continue
+        if name not in RECORD_FACET_FIELDS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"不支持的分面字段: {name}。可选字段: {', '.join(RECORD_FACET_FIELDS)}"
+            )
+        if name not in selected:
+            selected.append(name)
+    return selected
+
+
+def _facet_value(value: Any) -> Any:
+    return value.value if isinstance(value, (RecordType, RecordStatus)) else value
+
+
+def _sorted_buckets(counts: Dict[Any, int]) -> List[FacetBucket]:
+    """按记录数倒序排列分面统计项"""
+    return [
+        FacetBucket(value=value, count=count)
+        for value, count in sorted(counts.items(), key=lambda item: (-item[1], str(item[0])))
+    ]
+
+
+async def compute_record_facets(
+    db: AsyncSession, query: Select, facets: List[str]
+) -> Dict[str, List[FacetBucket]]:
+    """
+    统计筛选结果中各分面取值的记录数（query 为已应用筛选条件、未分页的查询）
+    - 记录列分面：一条 GROUP BY 查询同时统计所有请求的列，再在内存中按列汇总
+    - 标签/参与者分面：一条查询取出命中记录ID，与内存位图索引求交集计数
+    """
+    query = query.order_by(None)
+    result: Dict[str, List[FacetBucket]] = {}
+
+    columns = [name for name in facets if name in ("type", "status", "field_id")]
+    if columns:
+        counts: Dict[str, Dict[Any, int]] = {name: {} for name in columns}
+        group_by = [getattr(Record, name) for name in columns]
+        rows = await db.execute(query.with_only_columns(*group_by, func.count(Record.id)).group_by(*group_by))
+        for row in rows:
+            *values, count = row
+            for name, value in zip(columns, values):
+                value = _facet_value(value)
+                counts[name][value] = counts[name].get(value, 0) + count
+        for name in columns:
+            result[name] = _sorted_buckets(counts[name])
+
+    relations = [name for name in facets if name in ("tag_ids", "participant_ids")]
+    if relations:
+        matched = RoaringBitmap(await db.scalars(query.with_only_columns(Record.id)))
+        await relation_index.ensure_loaded()
+        for name in relations:
+            kind = "tags" if name == "tag_ids" else "participants"
+            result[name] = _sorted_buckets(relation_index.intersection_counts(kind, matched))
+
+    # 按请求顺序返回
+    return {name: result[name] for name in facets}
+
+
+# ============ 游标分页 ============
+
+def encode_cursor(record_date: datetime, record_id: int) -> str:
+    """将排序键 (record_date, id) 编码为不透明游标"""
+    payload = json.dumps({"d": record_date.isoformat(), "id": record_id}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """解析游标，返回排序键 (record_date, id)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(payload["d"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="无效的分页游标"
+        )
+
+
+def apply_record_cursor(query: Select, cursor: str) -> Select:
+    """按 (record_date DESC, id DESC) 定位到游标之后的记录"""
+    record_date, record_id = decode_cursor(cursor)
+    return query.filter(
+        or_(
+            Record.record_date < record_date,
+            and_(Record.record_date == record_date, Record.id < record_id)
+        )
+    )
+
+
+def order_records_by_date(query: Select) -> Select:
+    """按记录日期倒序，ID作为稳定的次级排序键"""
+    return query.order_by(Record.record_date.desc(), Record.id.desc())
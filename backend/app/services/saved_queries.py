@@ -0,0 +1,136 @@
+"""
+保存的查询
+维护每个保存查询的命中记录ID缓存（saved_query_records）：
+- 创建查询或修改筛选条件时全量重建（一条 INSERT ... SELECT）
+- 记录创建/更新/删除时只判断该条记录是否命中，增量增删缓存行
+- 删除标签/参与者等影响多条记录的变更，将相关查询标记为待重建，下次打开时重建
+"""
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import Select, String, and_, cast, delete, insert, literal, or_, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+
+from app.models.user import User, UserRole
+from app.models.record import Record
+from app.models.saved_query import SavedQuery, saved_query_records
+from app.schemas.record import RecordFilters
+from app.services.record_query import apply_record_filters, decode_cursor
+
+# 增量维护时每条 INSERT ... SELECT 合并判断的查询数（SQLite 复合查询最多 500 个分支）
+SAVED_QUERY_MATCH_BATCH = 100
+
+
+def saved_query_filters(saved_query: SavedQuery) -> RecordFilters:
+    """保存的筛选条件"""
+    return RecordFilters.model_validate(saved_query.filters or {})
+
+
+async def rebuild_saved_query(db: AsyncSession, saved_query: SavedQuery, owner: User) -> None:
+    """按所属用户（owner）的数据权限全量重建查询结果缓存（不提交事务）"""
+    await db.execute(
+        delete(saved_query_records).where(saved_query_records.c.saved_query_id == saved_query.id)
+    )
+    matched = await apply_record_filters(
+        db,
+        select(literal(saved_query.id), Record.id, Record.record_date),
+        saved_query_filters(saved_query),
+        owner
+    )
+    await db.execute(
+        insert(saved_query_records).from_select(
+            ["saved_query_id", "record_id", "record_date"], matched
+        )
+    )
+    saved_query.is_stale = False
+    saved_query.refreshed_at = datetime.now(timezone.utc)
+
+
+async def refresh_saved_queries_for_record(db: AsyncSession, record_id: int, created_by: int) -> None:
+    """
+    记录创建或更新后，增量维护可见该记录的查询结果缓存（不提交事务）
+    - 候选查询为记录创建者本人及管理员保存的查询
+    - 各候选查询按主键定位的判断查询以 UNION ALL 合并，命中结果由一条 INSERT ... SELECT 写入
+    """
+    candidates = (await db.scalars(
+        select(SavedQuery)
+        .join(SavedQuery.owner)
+        .options(contains_eager(SavedQuery.owner))
+        .where(
+            SavedQuery.is_stale.is_(False),
+            or_(SavedQuery.user_id == created_by, User.role == UserRole.ADMIN)
+        )
+    )).all()
+    if not candidates:
+        return
+
+    await db.execute(
+        delete(saved_query_records).where(and_(
+            saved_query_records.c.record_id == record_id,
+            saved_query_records.c.saved_query_id.in_([saved_query.id for saved_query in candidates])
+        ))
+    )
+    matches = [
+        await apply_record_filters(
+            db, select(literal(saved_query.id), Record.id, Record.record_date),
+            saved_query_filters(saved_query), saved_query.owner, record_id=record_id
+        )
+        for saved_query in candidates
+    ]
+    for start in range(0, len(matches), SAVED_QUERY_MATCH_BATCH):
+        batch = matches[start:start + SAVED_QUERY_MATCH_BATCH]
+        await db.execute(
+            insert(saved_query_records).from_select(
+                ["saved_query_id", "record_id", "record_date"],
+                union_all(*batch) if len(batch) > 1 else batch[0]
+            )
+        )
+
+
+async def remove_record_from_saved_queries(db: AsyncSession, record_id: int) -> None:
+    """记录删除时移除其在各查询结果缓存中的行（不提交事务）"""
+    await db.execute(delete(saved_query_records).where(saved_query_records.c.record_id == record_id))
+
+
+def saved_filter_is_set(name: str):
+    """保存的筛选条件中该项已设置（不是 null、空列表或空字符串），以 JSON 文本判断"""
+    value = cast(SavedQuery.filters[name], String)
+    return and_(value.isnot(None), value.notin_(["null", "[]", '""']))
+
+
+async def mark_saved_queries_stale(db: AsyncSession, *filter_names: str) -> None:
+    """将使用了指定筛选条件的查询标记为待重建（一条 UPDATE，不提交事务）"""
+    await db.execute(
+        update(SavedQuery)
+        .where(
+            SavedQuery.is_stale.is_(False),
+            or_(*(saved_filter_is_set(name) for name in filter_names))
+        )
+        .values(is_stale=True)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def saved_query_records_query(saved_query: SavedQuery, cursor: Optional[str] = None) -> Select:
+    """
+    打开查询：按 (记录日期, ID) 倒序读取缓存的命中记录
+    排序与游标条件都落在 ix_saved_query_records_query_date 索引上
+    """
+    query = (
+        select(Record)
+        .join(saved_query_records, saved_query_records.c.record_id == Record.id)
+        .where(saved_query_records.c.saved_query_id == saved_query.id)
+    )
+    if cursor:
+        record_date, record_id = decode_cursor(cursor)
+        query = query.where(
+            or_(
+                saved_query_records.c.record_date < record_date,
+                and_(
+                    saved_query_records.c.record_date == record_date,
+                    saved_query_records.c.record_id < record_id
+                )
+            )
+        )
+    return query.order_by(saved_query_records.c.record_date.desc(), saved_query_records.c.record_id.desc())
@@ -0,0 +1,201 @@
+"""
+记录全文检索
+基于 MySQL 8.0 内置的 ngram 全文解析器建立倒排索引：
+- 中文按 ngram_token_size 切分，无需额外分词词典；建议设为 1（单字），单字检索词也能命中索引，
+  多字检索词按短语匹配相邻的单字
+- 非 MySQL 数据库（如测试使用的 SQLite）没有全文索引，退化为在检索表中做子串匹配
+- 检索文本覆盖记录标题及 content 中的全部文本字段（访谈问答、描述、反思、笔记等）
+- 记录创建、更新、删除时同步维护 record_search_index 表
+
+注意：ngram 解析器会丢弃包含停用词的词元，建议在 MySQL 中设置
+innodb_ft_enable_stopword=OFF 后再创建全文索引。
+"""
+import html
+import re
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import Select, delete, or_, select
+from sqlalchemy.dialects.mysql import match
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.database import async_engine
+from app.models.record import Record, RecordSearchIndex
+
+# 全文索引与 MATCH ... AGAINST 仅 MySQL 支持
+FULLTEXT_SEARCH = async_engine.dialect.name == "mysql"
+
+# 布尔检索模式下需要剔除的字符（短语内仅双引号会破坏语法）
+_UNSAFE_CHARS = re.compile(r'["\x00]')
+
+
+def extract_content_text(content: Any) -> str:
+    """递归提取 content 中的全部文本值（兼容访谈、田野笔记、观察记录等内容结构）"""
+    parts: List[str] = []
+
+    def walk(value: Any) -> None:
+        if isinstance(value, str):
+            text = value.strip()
+            if text:
+                parts.append(text)
+        elif isinstance(value, dict):
+            for item in value.values():
+                walk(item)
+        elif isinstance(value, (list, tuple)):
+            for item in value:
+                walk(item)
+
+    walk(content)
+    return "\n".join(parts)
+
+
+def build_search_body(record: Record) -> str:
+    """生成记录的检索正文"""
+    parts = [extract_content_text(record.content or {})]
+    if record.specific_location:
+        parts.append(record.specific_location)
+    return "\n".join(part for part in parts if part)
+
+
+def make_record_search_index(record: Record) -> RecordSearchIndex:
+    """生成记录的检索索引行（同步会话的脚本直接 merge 该对象）"""
+    return RecordSearchIndex(
+        record_id=record.id,
+        title=record.title,
+        body=build_search_body(record)
+    )
+
+
+async def sync_record_search_index(db: AsyncSession, record: Record) -> None:
+    """写入或更新记录的检索索引（需在记录 flush 获得ID后调用，随记录一起提交）"""
+    await db.merge(make_record_search_index(record))
+
+
+async def remove_record_search_index(db: AsyncSession, record_id: int) -> None:
+    """删除记录的检索索引"""
+    await db.execute(
+        delete(RecordSearchIndex).where(RecordSearchIndex.record_id == record_id)
+    )
+
+
+def split_search_terms(search: str) -> List[str]:
+    """将搜索关键词按空白切分为检索词，去掉会破坏检索语法的字符"""
+    terms = []
+    for raw in search.split():
+        term = _UNSAFE_CHARS.sub("", raw).strip()
+        if term and re.search(r"\w", term):
+            terms.append(term)
+    return terms
+
+
+def build_boolean_query(terms: List[str]) -> str:
+    """生成布尔模式检索串：每个检索词作为必须出现的短语"""
+    return " ".join(f'+"{term}"' for term in terms)
+
+
+def search_match(terms: List[str]):
+    """全文检索匹配表达式，同时可作为相关度得分"""
+    return match(
+        RecordSearchIndex.title, RecordSearchIndex.body,
+        against=build_boolean_query(terms)
+    ).in_boolean_mode()
+
+
+def indexed_terms(terms: List[str]) -> List[str]:
+    """可以命中全文索引的检索词（长度不小于 ngram 词元长度；不支持全文索引的数据库上为空）"""
+    if not FULLTEXT_SEARCH:
+        return []
+    return [term for term in terms if len(term) >= settings.SEARCH_NGRAM_TOKEN_SIZE]
+
+
+def relevance_score(search: str):
+    """全文检索相关度得分表达式（InnoDB 的 TF-IDF 评分），无可索引检索词时返回 None"""
+    terms = indexed_terms(split_search_terms(search))
+    if not terms:
+        return None
+    return search_match(terms)
+
+
+def apply_search_filter(query: Select, search: str) -> Select:
+    """为记录查询添加全文检索条件"""
+    terms = split_search_terms(search)
+    if not terms:
+        return query
+
+    query = query.join(RecordSearchIndex, RecordSearchIndex.record_id == Record.id)
+
+    # 长度不足 ngram 词元的检索词（ngram_token_size 为 1 时没有）无法命中全文索引，
+    # 退化为在检索表中做子串匹配；检索词中的 % _ 按字面匹配
+    long_terms = indexed_terms(terms)
+    short_terms = [term for term in terms if term not in long_terms]
+
+    if long_terms:
+        query = query.filter(search_match(long_terms))
+    for term in short_terms:
+        query = query.filter(
+            or_(
+                RecordSearchIndex.title.contains(term, autoescape=True),
+                RecordSearchIndex.body.contains(term, autoescape=True)
+            )
+        )
+
+    return query
+
+
+# ============ 关键词高亮 ============
+
+def make_highlights(
+    text: str,
+    terms: List[str],
+    max_snippets: int = 3,
+    radius: int = 30
+) -> List[str]:
+    """
+    生成关键词上下文摘要
+    - 每个摘要为命中位置前后 radius 个字符，重叠的片段会合并
+    - 文本已做 HTML 转义，命中的关键词以 <mark> 标记
+    """
+    if not text or not terms:
+        return []
+
+    pattern = re.compile("|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)), re.IGNORECASE)
+
+    # 合并相互重叠的命中窗口
+    windows: List[List[int]] = []
+    for hit in pattern.finditer(text):
+        start, end = max(0, hit.start() - radius), min(len(text), hit.end() + radius)
+        if windows and start <= windows[-1][1]:
+            windows[-1][1] = max(windows[-1][1], end)
+        else:
+            if len(windows) == max_snippets:
+                break
+            windows.append([start, end])
+
+    snippets = []
+    for start, end in windows:
+        fragment = " ".join(text[start:end].split())
+        marked = pattern.sub(lambda m: f"\x00{m.group(0)}\x01", fragment)
+        marked = html.escape(marked).replace("\x00", "<mark>").replace("\x01", "</mark>")
+        prefix = "…" if start > 0 else ""
+        suffix = "…" if end < len(text) else ""
+        snippets.append(f"{prefix}{marked}{suffix}")
+
+    return snippets
+
+
+async def load_record_highlights(db: AsyncSession, record_ids: Iterable[int], search: str) -> Dict[int, List[str]]:
+    """为当前页记录批量生成高亮摘要（一次查询读取检索文本）"""
+    terms = split_search_terms(search)
+    ids = list(record_ids)
+    if not terms or not ids:
+        return {}
+
+    rows = await db.execute(
+        select(RecordSearchIndex.record_id, RecordSearchIndex.title, RecordSearchIndex.body)
+        .where(RecordSearchIndex.record_id.in_(ids))
+    )
+
+    return {
+        record_id: make_highlights(f"{title}\n{body}", terms)
+        for record_id, title, body in rows
+    }
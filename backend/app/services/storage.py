@@ -0,0 +1,302 @@
+"""
+文件存储后端
+图片及其衍生图通过存储键（如 blobs/40/de/40de...jpg）访问，数据库中保存的是存储键，实际存放位置由 STORAGE_BACKEND 决定：
+- local: 本地磁盘，存储键即 UPLOAD_DIR 下的相对路径（内容寻址的两级分片目录，单个目录不会过大）
+- s3: S3 兼容对象存储（AWS S3、MinIO、Ceph RGW 等），S3_ENDPOINT_URL 可指向自建服务或本地测试服务
+切换后端时执行 scripts/migrate_storage.py 复制文件即可，数据库无需修改
+导出文件使用单独的存储（get_export_storage）：本地存储位于 EXPORT_DIR（不在公开的上传目录下），
+对象存储位于 exports/ 前缀下，只能通过导出任务的下载接口获取
+后端方法均为阻塞调用，异步代码中通过 run_in_threadpool 调用
+"""
+import mimetypes
+import os
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from pathlib import Path, PurePosixPath
+from typing import IO, Iterable, Iterator, Optional, Tuple
+
+from app.core.config import settings
+
+
+def _temp_path(suffix: str) -> Path:
+    """创建本地临时文件，用于下载/上传对象存储中的文件"""
+    fd, temp_path = tempfile.mkstemp(prefix=".storage-", suffix=suffix)
+    os.close(fd)
+    return Path(temp_path)
+
+
+class StorageBackend(ABC):
+    """存储后端接口"""
+
+    name: str
+
+    @abstractmethod
+    def put(self, key: str, source: Path) -> None:
+        """将本地文件存入指定键（已存在时覆盖），源文件随后被移走或删除"""
+
+    @abstractmethod
+    def fetch(self, key: str, target: Path) -> None:
+        """下载到本地文件，不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    def open(self, key: str) -> IO[bytes]:
+        """以二进制流打开文件分块读取（调用方负责关闭），不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    def size(self, key: str) -> Optional[int]:
+        """文件大小（字节），不存在时返回 None"""
+
+    @abstractmethod
+    def delete(self, key: str) -> None:
+        """删除文件，不存在时忽略"""
+
+    @abstractmethod
+    def iter_files(self, prefix: str = "") -> Iterator[Tuple[str, float]]:
+        """列出前缀下的全部文件，返回 (存储键, 修改时间戳)"""
+
+    def local_path(self, key: str) -> Optional[Path]:
+        """文件在本地磁盘上的路径，非本地存储返回 None"""
+        return None
+
+    def presigned_url(self, key: str, media_type: str, disposition: str) -> Optional[str]:
+        """客户端可直接下载的临时 URL（响应使用指定的 Content-Type 与 Content-Disposition），不支持时返回 None"""
+        return None
+
+    def exists(self, key: str) -> bool:
+        return self.size(key) is not None
+
+    @contextmanager
+    def readable(self, key: str) -> Iterator[Path]:
+        """以本地文件读取：本地存储直接返回文件路径，其他后端下载到临时文件并在用完后删除"""
+        path = self.local_path(key)
+        if path is not None:
+            if not path.exists():
+                raise FileNotFoundError(key)
+            yield path
+            return
+
+        temp_path = _temp_path(PurePosixPath(key).suffix)
+        try:
+            self.fetch(key, temp_path)
+            yield temp_path
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+    @contextmanager
+    def writable(self, key: str) -> Iterator[Path]:
+        """
+        以本地文件写入：本地存储直接返回目标路径（写入方需自行保证原子写入），
+        其他后端返回临时文件，正常退出时上传
+        """
+        path = self.local_path(key)
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            yield path
+            return
+
+        temp_path = _temp_path(PurePosixPath(key).suffix)
+        try:
+            yield temp_path
+            self.put(key, temp_path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+
+class LocalStorage(StorageBackend):
+    """本地磁盘存储"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+
+    def local_path(self, key: str) -> Path:
+        return self.root / PurePosixPath(key)
+
+    def put(self, key: str, source: Path) -> None:
+        target = self.local_path(key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        # 同一文件系统内为原子重命名
+        shutil.move(str(source), str(target))
+
+    def fetch(self, key: str, target: Path) -> None:
+        shutil.copyfile(self.local_path(key), target)
+
+    def open(self, key: str) -> IO[bytes]:
+        return open(self.local_path(key), "rb")
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.local_path(key).stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key: str) -> None:
+        self.local_path(key).unlink(missing_ok=True)
+
+    def iter_files(self, prefix: str = "") -> Iterator[Tuple[str, float]]:
+        base = self.local_path(prefix) if prefix else self.root
+        for directory, _, filenames in os.walk(base):
+            for filename in filenames:
+                path = Path(directory) / filename
+                try:
+                    modified = path.stat().st_mtime
+                except FileNotFoundError:
+                    continue
+                yield path.relative_to(self.root).as_posix(), modified
+
+
+class S3Storage(StorageBackend):
+    """S3 兼容对象存储（需要安装 boto3）"""
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: Optional[str] = None,
+        access_key_id: Optional[str] = None,
+        secret_access_key: Optional[str] = None,
+        presign_expires: int = 3600,
+    ):
+        import boto3
+        from botocore.exceptions import ClientError
+
+        self.bucket = bucket
+        self.prefix = prefix.strip("/") + "/" if prefix.strip("/") else ""
+        self.presign_expires = presign_expires
+        self._client_error = ClientError
+        # boto3 客户端是线程安全的，可在线程池中共用
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url or None,
+            region_name=region or None,
+            aws_access_key_id=access_key_id or None,
+            aws_secret_access_key=secret_access_key or None,
+        )
+
+    def _object_key(self, key: str) -> str:
+        return self.prefix + key
+
+    def _is_not_found(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put(self, key: str, source: Path) -> None:
+        content_type = mimetypes.guess_type(key)[0] or "application/octet-stream"
+        self.client.upload_file(
+            str(source), self.bucket, self._object_key(key), ExtraArgs={"ContentType": content_type}
+        )
+        source.unlink(missing_ok=True)
+
+    def fetch(self, key: str, target: Path) -> None:
+        try:
+            self.client.download_file(self.bucket, self._object_key(key), str(target))
+        except self._client_error as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def open(self, key: str) -> IO[bytes]:
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._object_key(key))["Body"]
+        except self._client_error as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(key) from e
+            raise
+
+    def size(self, key: str) -> Optional[int]:
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._object_key(key))["ContentLength"]
+        except self._client_error as e:
+            if self._is_not_found(e):
+                return None
+            raise
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=self._object_key(key))
+
+    def iter_files(self, prefix: str = "") -> Iterator[Tuple[str, float]]:
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._object_key(prefix)):
+            for item in page.get("Contents", []):
+                yield item["Key"][len(self.prefix):], item["LastModified"].timestamp()
+
+    def presigned_url(self, key: str, media_type: str, disposition: str) -> str:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self._object_key(key),
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": disposition,
+            },
+            ExpiresIn=self.presign_expires,
+        )
+
+
+# 对象存储中导出文件的键前缀
+EXPORT_PREFIX = "exports"
+
+
+def _create_s3_storage(prefix: str) -> S3Storage:
+    return S3Storage(
+        bucket=settings.S3_BUCKET,
+        prefix=prefix,
+        endpoint_url=settings.S3_ENDPOINT_URL,
+        region=settings.S3_REGION,
+        access_key_id=settings.S3_ACCESS_KEY_ID,
+        secret_access_key=settings.S3_SECRET_ACCESS_KEY,
+        presign_expires=settings.S3_PRESIGN_EXPIRES,
+    )
+
+
+def create_storage(backend: Optional[str] = None) -> StorageBackend:
+    """按名称创建存储后端，默认使用 STORAGE_BACKEND 配置"""
+    backend = backend or settings.STORAGE_BACKEND
+    if backend == "local":
+        return LocalStorage(settings.UPLOAD_DIR)
+    if backend == "s3":
+        return _create_s3_storage(settings.S3_PREFIX)
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+def create_export_storage(backend: Optional[str] = None) -> StorageBackend:
+    """创建导出文件的存储后端：本地为 EXPORT_DIR 目录，对象存储为桶内 exports/ 前缀"""
+    backend = backend or settings.STORAGE_BACKEND
+    if backend == "local":
+        return LocalStorage(settings.EXPORT_DIR)
+    if backend == "s3":
+        return _create_s3_storage("/".join(part for part in (settings.S3_PREFIX.strip("/"), EXPORT_PREFIX) if part))
+    raise ValueError(f"未知的存储后端: {backend}")
+
+
+_storage: Optional[StorageBackend] = None
+_export_storage: Optional[StorageBackend] = None
+
+
+def get_storage() -> StorageBackend:
+    """获取（首次调用时创建）当前配置的存储后端"""
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def get_export_storage() -> StorageBackend:
+    """获取（首次调用时创建）导出文件的存储后端"""
+    global _export_storage
+    if _export_storage is None:
+        _export_storage = create_export_storage()
+    return _export_storage
+
+
+def delete_keys(keys: Iterable[Optional[str]], storage: Optional[StorageBackend] = None) -> None:
+    """删除多个存储键对应的文件（忽略空值），默认为当前存储后端，阻塞调用"""
+    storage = storage or get_storage()
+    for key in keys:
+        if key:
+            storage.delete(key)
@@ -0,0 +1,92 @@
+"""
+文件上传存储
+上传文件按块流式写入暂存目录下的临时文件：
+- 边写边累计大小，超过上限立即中止并删除临时文件，不会把整个文件读入内存
+- 边写边计算 SHA-256 内容摘要，摘要计算与写盘一起在线程池中执行（hashlib 处理大块数据时释放 GIL），
+  批量上传时多个文件可并行处理
+- 写完后再原子重命名为最终文件名，读取方不会看到写了一半的文件
+- 磁盘读写在线程池中执行，不阻塞事件循环
+"""
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.concurrency import run_in_threadpool
+
+# 每次读取/写入的块大小
+UPLOAD_CHUNK_SIZE = 64 * 1024
+
+
+class StoredUpload:
+    """已完整写入临时文件的上传内容"""
+
+    def __init__(self, path: Path, size: int, sha256: str):
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    async def discard(self) -> None:
+        """删除临时文件"""
+        await run_in_threadpool(self.path.unlink, True)
+
+
+def file_too_large(max_size: int) -> HTTPException:
+    """文件超出大小上限的错误"""
+    return HTTPException(
+        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+        detail=f"文件过大。最大允许大小: {max_size // 1024 // 1024}MB"
+    )
+
+
+def _open_temp_file(directory: Path):
+    """在暂存目录下创建临时文件"""
+    directory.mkdir(parents=True, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".upload-", suffix=".tmp")
+    return os.fdopen(fd, "wb"), Path(temp_path)
+
+
+def _discard(temp_file, temp_path: Path) -> None:
+    temp_file.close()
+    temp_path.unlink(missing_ok=True)
+
+
+def _write_chunk(temp_file, hasher, chunk: bytes) -> None:
+    hasher.update(chunk)
+    temp_file.write(chunk)
+
+
+def _commit(temp_file) -> None:
+    temp_file.flush()
+    os.fsync(temp_file.fileno())
+    temp_file.close()
+
+
+async def receive_upload(file: UploadFile, staging_dir: Path, max_size: int) -> StoredUpload:
+    """
+    将上传文件流式写入 staging_dir 下的临时文件，返回其大小与内容摘要
+    - 超过 max_size 字节时返回 413，不会留下任何文件
+    - 调用方根据摘要决定存入存储后端或 discard
+    - 本地存储时 staging_dir 需与存储目录在同一文件系统，保证存入是原子重命名
+    """
+    temp_file, temp_path = await run_in_threadpool(_open_temp_file, staging_dir)
+    hasher = hashlib.sha256()
+    size = 0
+
+    try:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_size:
+                raise file_too_large(max_size)
+            await run_in_threadpool(_write_chunk, temp_file, hasher, chunk)
+
+        await run_in_threadpool(_commit, temp_file)
+    except BaseException:
+        await run_in_threadpool(_discard, temp_file, temp_path)
+        raise
+
+    return StoredUpload(temp_path, size, hasher.hexdigest())
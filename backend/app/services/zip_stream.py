@@ -0,0 +1,87 @@
+"""
+流式 ZIP 打包
+边生成边输出 ZIP 数据，不在内存或临时文件中缓存整个压缩包：
+- 输出目标不可回退（seek），zipfile 为每个条目写入数据描述符（CRC 与大小写在数据之后）
+- 每次写入后取出已生成的字节交给调用方发送，缓冲区只保留当前数据块
+- 常驻内存只有各条目的目录信息（每个条目约数百字节），在结束时写入中央目录
+- 超过 4GB 的压缩包自动使用 ZIP64
+"""
+import io
+import time
+import zipfile
+from contextlib import contextmanager
+from typing import Iterator, IO, List, Optional
+
+
+class _ChunkSink(io.RawIOBase):
+    """收集 zipfile 写出的字节，不支持 seek/tell，zipfile 据此按流式方式写入"""
+
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ZipStream:
+    """
+    流式写入 ZIP，各方法返回本次新生成的 ZIP 字节（可能为空）
+
+    用法:
+        archive = ZipStream()
+        yield archive.write("a.json", data)
+        with archive.open("b.jpg", size) as entry:
+            for chunk in chunks:
+                yield archive.write_chunk(entry, chunk)
+        yield archive.close()
+    """
+
+    def __init__(self):
+        self._sink = _ChunkSink()
+        self._zip = zipfile.ZipFile(self._sink, "w", allowZip64=True)
+
+    def _entry_info(self, name: str, compress: bool, size: Optional[int] = None) -> zipfile.ZipInfo:
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        # 图片等已压缩的内容直接存储，避免无效的压缩开销
+        info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+        info.external_attr = 0o644 << 16
+        if size is not None:
+            # 预告大小，决定条目是否需要 ZIP64 头
+            info.file_size = size
+        return info
+
+    def write(self, name: str, data: bytes, compress: bool = True) -> bytes:
+        """写入一个完整的小文件（记录 JSON、Markdown 等）"""
+        self._zip.writestr(self._entry_info(name, compress), data)
+        return self._sink.drain()
+
+    @contextmanager
+    def open(self, name: str, size: Optional[int] = None, compress: bool = False) -> Iterator[IO[bytes]]:
+        """打开一个条目分块写入（大文件），size 为预计大小"""
+        entry = self._zip.open(self._entry_info(name, compress, size), "w", force_zip64=size is None)
+        try:
+            yield entry
+        finally:
+            entry.close()
+
+    def write_chunk(self, entry: IO[bytes], chunk: bytes) -> bytes:
+        entry.write(chunk)
+        return self._sink.drain()
+
+    def drain(self) -> bytes:
+        """取出尚未发送的字节（如 open 退出时写入的数据描述符）"""
+        return self._sink.drain()
+
+    def close(self) -> bytes:
+        """写入中央目录，返回最后的字节"""
+        self._zip.close()
+        return self._sink.drain()
@@ -9,8 +9,13 @@ import pymysql
 
 from app.core.config import settings
 from app.api.api_v1.api import api_router
-from app.core.database import engine
-from app.models import Base
+from app.core.query_budget import QueryStatsMiddleware
+from app.core.upload_limit import UploadSizeLimitMiddleware
+from app.services.image_variants import shutdown_image_pool
+from app.services.document_render import shutdown_render_pool
+from app.services.file_cleanup import start_orphan_sweeper, stop_orphan_sweeper
+from app.services.export_jobs import start_export_workers, stop_export_workers
+from app.services.bitmap_index import relation_index
 
 # 创建数据库（如果不存在）
 def create_database_if_not_exists():
@@ -38,8 +43,7 @@ def create_database_if_not_exists():
 # 创建数据库
 create_database_if_not_exists()
 
-# 创建数据库表
-Base.metadata.create_all(bind=engine)
+# 数据库表结构由 Alembic 迁移管理，启动前执行: alembic upgrade head
 
 # 创建FastAPI应用实例
 app = FastAPI(
@@ -58,6 +62,16 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 请求级数据库查询统计
+app.add_middleware(QueryStatsMiddleware)
+
+# 在读取请求体之前拒绝超大的上传请求（预留 64KB 给表单字段与 multipart 边界）
+app.add_middleware(
+    UploadSizeLimitMiddleware,
+    max_body_size=settings.MAX_FILE_SIZE + 64 * 1024,
+    path_limits={"/images/batch": settings.MAX_BATCH_UPLOAD_SIZE},
+)
+
 # 创建上传目录
 os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
 
@@ -68,6 +82,48 @@ app.mount("/uploads", StaticFiles(directory=settings.UPLOAD_DIR), name="uploads"
 app.include_router(api_router, prefix="/api/v1")
 
 
+@app.on_event("startup")
+async def start_file_sweeper():
+    """启动孤儿文件定期清理"""
+    start_orphan_sweeper()
+
+
+@app.on_event("shutdown")
+async def stop_file_sweeper():
+    """停止孤儿文件定期清理"""
+    await stop_orphan_sweeper()
+
+
+@app.on_event("startup")
+async def load_relation_index():
+    """在后台预先加载记录关联索引，首个布尔表达式筛选请求无需等待"""
+    relation_index.refresh()
+
+
+@app.on_event("startup")
+async def start_export_jobs():
+    """启动后台导出任务，继续执行上次退出时未完成的任务"""
+    await start_export_workers()
+
+
+@app.on_event("shutdown")
+async def stop_export_jobs():
+    """停止后台导出任务，执行中的任务在下次启动后重新执行"""
+    await stop_export_workers()
+
+
+@app.on_event("shutdown")
+def close_image_pool():
+    """关闭生成图片衍生图的进程池"""
+    shutdown_image_pool()
+
+
+@app.on_event("shutdown")
+def close_render_pool():
+    """关闭渲染 PDF / Word 导出的进程池"""
+    shutdown_render_pool()
+
+
 @app.get("/")
 async def root():
     """根路径 - 系统信息"""
@@ -0,0 +1,114 @@
+"""
+并发压测脚本
+模拟多个用户同时访问记录列表、记录详情与健康检查接口，统计各接口的 p50/p95/p99 延迟
+
+用法（需先启动服务）:
+    python scripts/benchmark_concurrency.py --base-url http://localhost:8000 \
+        --username admin --password admin123 --users 50 --requests 20
+"""
+import argparse
+import asyncio
+import math
+import statistics
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import httpx
+
+API_PREFIX = "/api/v1"
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """最近秩法计算百分位数"""
+    ordered = sorted(values)
+    rank = math.ceil(pct / 100 * len(ordered))
+    return ordered[max(rank, 1) - 1]
+
+
+async def login(client: httpx.AsyncClient, username: str, password: str) -> Dict[str, str]:
+    """登录并返回认证请求头"""
+    response = await client.post(
+        f"{API_PREFIX}/auth/login", data={"username": username, "password": password}
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def timed_get(
+    client: httpx.AsyncClient, name: str, url: str, headers: Dict[str, str],
+    latencies: Dict[str, List[float]], errors: Dict[str, int]
+) -> None:
+    """请求一次接口并记录耗时（毫秒）"""
+    start = time.perf_counter()
+    try:
+        response = await client.get(url, headers=headers)
+        if response.status_code >= 400:
+            errors[name] += 1
+    except httpx.HTTPError:
+        errors[name] += 1
+    latencies[name].append((time.perf_counter() - start) * 1000)
+
+
+async def simulate_user(
+    client: httpx.AsyncClient, headers: Dict[str, str], record_ids: List[int], rounds: int,
+    latencies: Dict[str, List[float]], errors: Dict[str, int]
+) -> None:
+    """单个用户依次访问列表、详情与健康检查接口"""
+    for i in range(rounds):
+        await timed_get(client, "records.list", f"{API_PREFIX}/records/?limit=20", headers, latencies, errors)
+        if record_ids:
+            record_id = record_ids[i % len(record_ids)]
+            await timed_get(client, "records.detail", f"{API_PREFIX}/records/{record_id}", headers, latencies, errors)
+        await timed_get(client, "health", "/health", {}, latencies, errors)
+
+
+async def run_benchmark(args: argparse.Namespace) -> None:
+    """登录后并发执行压测并输出各接口的延迟分布"""
+    limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=args.timeout) as client:
+        headers = await login(client, args.username, args.password)
+
+        # 预取一批记录ID用于详情请求
+        response = await client.get(f"{API_PREFIX}/records/?limit=100&fields=title&count=none", headers=headers)
+        response.raise_for_status()
+        record_ids = [item["id"] for item in response.json()["items"]]
+        if not record_ids:
+            print("⚠️  当前账号下没有记录，跳过详情接口")
+
+        latencies: Dict[str, List[float]] = defaultdict(list)
+        errors: Dict[str, int] = defaultdict(int)
+
+        print(f"🚀 {args.users} 个并发用户，每人 {args.requests} 轮请求...")
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            simulate_user(client, headers, record_ids, args.requests, latencies, errors)
+            for _ in range(args.users)
+        ))
+        elapsed = time.perf_counter() - start
+
+    total = sum(len(values) for values in latencies.values())
+    print(f"✅ 完成 {total} 个请求，用时 {elapsed:.2f}s，吞吐 {total / elapsed:.1f} req/s")
+    print(f"{'接口':<16}{'请求数':>8}{'错误':>6}{'平均':>10}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for name, values in latencies.items():
+        print(
+            f"{name:<16}{len(values):>8}{errors[name]:>6}"
+            f"{statistics.mean(values):>10.1f}{percentile(values, 50):>10.1f}"
+            f"{percentile(values, 95):>10.1f}{percentile(values, 99):>10.1f}"
+        )
+    print("（延迟单位：毫秒）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="接口并发压测")
+    parser.add_argument("--base-url", default="http://localhost:8000", help="服务地址")
+    parser.add_argument("--username", default="admin", help="登录用户名")
+    parser.add_argument("--password", default="admin123", help="登录密码")
+    parser.add_argument("--users", type=int, default=50, help="并发用户数")
+    parser.add_argument("--requests", type=int, default=20, help="每个用户的请求轮数")
+    parser.add_argument("--timeout", type=float, default=30.0, help="单个请求超时（秒）")
+    asyncio.run(run_benchmark(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
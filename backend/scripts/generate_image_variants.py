@@ -0,0 +1,110 @@
+"""
+图片衍生图补生成脚本
+为已有图片批量生成缩略图与中等尺寸图并写入原图宽度，可重复执行
+内容寻址存储中的图片按内容生成一次，结果回写到内容及引用它的全部记录图片
+
+用法:
+    python scripts/generate_image_variants.py           # 只处理尚未生成衍生图或缺少宽度的图片
+    python scripts/generate_image_variants.py --force   # 重新生成全部图片的衍生图
+"""
+import sys
+import os
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import or_, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import ImageBlob, RecordImage
+from app.services.image_variants import render_stored_variants
+
+# 每批处理的图片数
+BATCH_SIZE = 100
+
+
+def apply_variants(db, image: RecordImage, paths: dict, width: int) -> None:
+    """回写衍生图路径与原图宽度，内容寻址存储中的图片同时更新内容及引用它的全部记录图片"""
+    values = {"thumbnail_path": paths["thumbnail"], "medium_path": paths["medium"], "width": width}
+    blob = db.get(ImageBlob, image.content_hash) if image.content_hash else None
+    if blob is None or blob.file_path != image.file_path:
+        image.thumbnail_path = values["thumbnail_path"]
+        image.medium_path = values["medium_path"]
+        image.width = width
+        return
+
+    blob.thumbnail_path = values["thumbnail_path"]
+    blob.medium_path = values["medium_path"]
+    blob.width = width
+    db.execute(
+        update(RecordImage)
+        .where(RecordImage.content_hash == image.content_hash)
+        .values(**values)
+        .execution_options(synchronize_session="fetch")
+    )
+
+
+def generate_image_variants(force: bool = False):
+    """按ID顺序分批生成衍生图，每批在进程池中并行处理（线程负责读写存储）"""
+    db = SessionLocal()
+    processed = 0
+    failed = 0
+    last_id = 0
+
+    try:
+        with ProcessPoolExecutor(max_workers=settings.IMAGE_WORKERS) as pool, \
+                ThreadPoolExecutor(max_workers=settings.IMAGE_WORKERS * 2) as io_pool:
+            while True:
+                query = db.query(RecordImage).filter(RecordImage.id > last_id)
+                if not force:
+                    query = query.filter(or_(
+                        RecordImage.thumbnail_path.is_(None),
+                        RecordImage.medium_path.is_(None),
+                        RecordImage.width.is_(None)
+                    ))
+                images = query.order_by(RecordImage.id).limit(BATCH_SIZE).all()
+                if not images:
+                    break
+
+                # 同一批中内容相同的图片共用一个文件，只生成一次
+                futures = {}
+                for image in images:
+                    if image.file_path not in futures:
+                        futures[image.file_path] = (image, io_pool.submit(render_stored_variants, pool, image.file_path))
+                for image, future in futures.values():
+                    try:
+                        paths, width = future.result()
+                    except Exception as e:
+                        failed += 1
+                        print(f"   ⚠️  图片 {image.id} 处理失败: {e}")
+                        continue
+                    apply_variants(db, image, paths, width)
+
+                processed += len(images)
+                last_id = images[-1].id
+
+                db.commit()
+                # 释放已处理的对象，避免会话占用内存持续增长
+                db.expunge_all()
+                print(f"   已处理 {processed} 张图片")
+
+        print(f"✅ 衍生图生成完成，共 {processed} 张图片，失败 {failed} 张")
+
+    except Exception as e:
+        print(f"❌ 生成衍生图失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="为已有图片生成缩略图与中等尺寸图")
+    parser.add_argument("--force", action="store_true", help="重新生成全部图片的衍生图")
+    args = parser.parse_args()
+
+    print("🚀 开始生成图片衍生图...")
+    generate_image_variants(force=args.force)
@@ -7,10 +7,12 @@ import os
 # 添加项目根目录到Python路径
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from alembic import command
+from alembic.config import Config
 from sqlalchemy import create_engine
 from app.core.config import settings
 from app.core.security import get_password_hash
-from app.models import Base, User, TagCategory, Tag
+from app.models import User, TagCategory, Tag
 from app.models.user import UserRole
 from app.models.tag import TagCategoryType
 
@@ -20,8 +22,11 @@ def create_database():
     # 创建数据库引擎
     engine = create_engine(settings.DATABASE_URL)
     
-    # 创建所有表
-    Base.metadata.create_all(bind=engine)
+    # 执行 Alembic 迁移创建/升级所有表
+    backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    alembic_cfg = Config(os.path.join(backend_dir, "alembic.ini"))
+    alembic_cfg.set_main_option("script_location", os.path.join(backend_dir, "alembic"))
+    command.upgrade(alembic_cfg, "head")
     print("✅ 数据库表创建成功")
     
     return engine
@@ -0,0 +1,133 @@
+"""
+图片内容寻址存储迁移脚本
+将按记录存放的历史图片迁入内容寻址存储（存储键 blobs/...），内容相同的图片合并为一份，可重复执行
+
+每张图片的处理顺序为：复制到内容路径 -> 提交数据库 -> 删除旧文件，
+中途中断不会丢失文件，重新执行即可继续
+"""
+import sys
+import os
+import hashlib
+import shutil
+from pathlib import Path, PurePosixPath
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models import ImageBlob, RecordImage
+from app.services.blob_store import BLOB_PREFIX, blob_key
+from app.services.image_cache import image_cache, image_source_key
+from app.services.image_variants import variant_key
+from app.services.storage import delete_keys, get_storage
+
+# 每批处理的图片数
+BATCH_SIZE = 200
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """流式计算文件的 SHA-256 摘要"""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def copy_atomic(source: Path, key: str) -> None:
+    """复制到存储中（本地存储时先写临时文件再重命名，目标位置不会出现不完整的文件）"""
+    with get_storage().writable(key) as target:
+        temp_path = target.with_name(f".{target.name}.tmp")
+        shutil.copyfile(source, temp_path)
+        os.replace(temp_path, target)
+
+
+def migrate_image(db, image: RecordImage, stale_files: list) -> bool:
+    """将单张图片迁入内容寻址存储，返回是否与已有内容合并"""
+    storage = get_storage()
+    with storage.readable(image.file_path) as source:
+        content_hash = hash_file(source)
+        blob = db.get(ImageBlob, content_hash)
+        merged = blob is not None
+        if blob is None:
+            key = blob_key(content_hash, PurePosixPath(image.file_path).suffix.lower())
+            copy_atomic(source, key)
+            blob = ImageBlob(content_hash=content_hash, file_path=key, file_size=source.stat().st_size, ref_count=0)
+
+    if not merged:
+        # 已生成的衍生图一并迁移，避免重新生成
+        for name, old_key in (("thumbnail", image.thumbnail_path), ("medium", image.medium_path)):
+            if old_key and storage.exists(old_key):
+                new_key = variant_key(blob.file_path, name)
+                with storage.readable(old_key) as old_variant:
+                    copy_atomic(old_variant, new_key)
+                setattr(blob, f"{name}_path", new_key)
+        db.add(blob)
+        # 写入会话，同一批后续相同内容的图片可以查到
+        db.flush()
+
+    blob.ref_count += 1
+    stale_files.extend(path for path in (image.file_path, image.thumbnail_path, image.medium_path) if path)
+    # 按图片ID缓存的旧衍生图不再使用
+    image_cache.discard(image_source_key(None, image.id))
+
+    image.content_hash = blob.content_hash
+    image.file_path = blob.file_path
+    image.file_size = blob.file_size
+    image.filename = Path(blob.file_path).name
+    image.thumbnail_path = blob.thumbnail_path
+    image.medium_path = blob.medium_path
+    return merged
+
+
+def migrate_image_blobs():
+    """按ID顺序分批迁移尚未进入内容寻址存储的图片"""
+    db = SessionLocal()
+    storage = get_storage()
+    migrated = 0
+    merged = 0
+    missing = 0
+    last_id = 0
+
+    try:
+        while True:
+            images = db.query(RecordImage).filter(
+                RecordImage.id > last_id
+            ).order_by(RecordImage.id).limit(BATCH_SIZE).all()
+            if not images:
+                break
+            last_id = images[-1].id
+
+            stale_files = []
+            for image in images:
+                if image.file_path.startswith(f"{BLOB_PREFIX}/"):
+                    continue
+                if not storage.exists(image.file_path):
+                    missing += 1
+                    print(f"   ⚠️  图片 {image.id} 的文件不存在: {image.file_path}")
+                    continue
+                merged += migrate_image(db, image, stale_files)
+                migrated += 1
+
+            db.commit()
+            # 提交后再删除旧文件
+            delete_keys(stale_files)
+            # 释放已处理的对象，避免会话占用内存持续增长
+            db.expunge_all()
+            print(f"   已迁移 {migrated} 张图片")
+
+        print(f"✅ 迁移完成，共迁移 {migrated} 张图片，其中 {merged} 张与已有内容合并，{missing} 张文件缺失")
+
+    except Exception as e:
+        print(f"❌ 迁移图片失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("🚀 开始迁移图片到内容寻址存储...")
+    migrate_image_blobs()
@@ -0,0 +1,127 @@
+"""
+存储后端迁移脚本
+将图片及衍生图从一个存储后端并行复制到另一个（如本地磁盘 -> S3），存储键不变，数据库无需修改
+可重复执行：目标中已存在且大小一致的文件会跳过，中断后重新执行即可继续
+
+用法:
+    python scripts/migrate_storage.py --to s3                          # 本地 -> S3
+    python scripts/migrate_storage.py --to s3 --workers 16 --delete-source
+    python scripts/migrate_storage.py --from s3 --to local             # S3 -> 本地
+
+复制完成后将 STORAGE_BACKEND 改为目标后端并重启服务
+"""
+import sys
+import os
+import argparse
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models import ImageBlob, RecordImage
+from app.services.storage import StorageBackend, create_storage
+
+# 每批读取的数据库行数
+BATCH_SIZE = 500
+
+
+def iter_storage_keys(db):
+    """
+    分批列出数据库引用的全部存储键
+    内容寻址存储中的文件按内容行列出，历史图片（无内容摘要）按图片行列出，不会重复
+    """
+    last_hash = ""
+    while True:
+        blobs = db.query(ImageBlob).filter(
+            ImageBlob.content_hash > last_hash
+        ).order_by(ImageBlob.content_hash).limit(BATCH_SIZE).all()
+        if not blobs:
+            break
+        last_hash = blobs[-1].content_hash
+        keys = [key for blob in blobs for key in (blob.file_path, blob.thumbnail_path, blob.medium_path) if key]
+        db.expunge_all()
+        yield keys
+
+    last_id = 0
+    while True:
+        images = db.query(RecordImage).filter(
+            RecordImage.id > last_id,
+            RecordImage.content_hash.is_(None)
+        ).order_by(RecordImage.id).limit(BATCH_SIZE).all()
+        if not images:
+            break
+        last_id = images[-1].id
+        keys = [key for image in images for key in (image.file_path, image.thumbnail_path, image.medium_path) if key]
+        db.expunge_all()
+        yield keys
+
+
+def copy_key(source: StorageBackend, target: StorageBackend, key: str, delete_source: bool) -> str:
+    """复制单个文件，返回 copied / skipped / missing"""
+    size = source.size(key)
+    if size is None:
+        return "missing"
+
+    result = "skipped"
+    if target.size(key) != size:
+        with source.readable(key) as source_path, target.writable(key) as target_path:
+            # 先写临时文件再重命名，目标位置不会出现不完整的文件
+            temp_path = target_path.with_name(f".{target_path.name}.tmp")
+            shutil.copyfile(source_path, temp_path)
+            os.replace(temp_path, target_path)
+        result = "copied"
+
+    if delete_source:
+        source.delete(key)
+    return result
+
+
+def migrate_storage(source_name: str, target_name: str, workers: int, delete_source: bool):
+    """按批并行复制，每批等待完成后再读取下一批，内存占用与文件总数无关"""
+    source = create_storage(source_name)
+    target = create_storage(target_name)
+    db = SessionLocal()
+    counts = {"copied": 0, "skipped": 0, "missing": 0}
+    failed = 0
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for keys in iter_storage_keys(db):
+                futures = [(key, pool.submit(copy_key, source, target, key, delete_source)) for key in keys]
+                for key, future in futures:
+                    try:
+                        counts[future.result()] += 1
+                    except Exception as e:
+                        failed += 1
+                        print(f"   ⚠️  {key} 复制失败: {e}")
+                print(f"   已复制 {counts['copied']} 个文件，跳过 {counts['skipped']} 个")
+
+        print(
+            f"✅ 迁移完成，复制 {counts['copied']} 个文件，跳过 {counts['skipped']} 个（目标已存在），"
+            f"源文件缺失 {counts['missing']} 个，失败 {failed} 个"
+        )
+        if failed == 0:
+            print(f"   现在可以将 STORAGE_BACKEND 设置为 {target_name} 并重启服务")
+
+    except Exception as e:
+        print(f"❌ 迁移存储失败: {e}")
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="在存储后端之间并行复制图片文件")
+    parser.add_argument("--from", dest="source", default="local", choices=["local", "s3"], help="源存储后端")
+    parser.add_argument("--to", dest="target", required=True, choices=["local", "s3"], help="目标存储后端")
+    parser.add_argument("--workers", type=int, default=8, help="并行复制的线程数")
+    parser.add_argument("--delete-source", action="store_true", help="复制成功后删除源文件")
+    args = parser.parse_args()
+
+    if args.source == args.target:
+        parser.error("源与目标存储后端不能相同")
+
+    print(f"🚀 开始将图片从 {args.source} 迁移到 {args.target}...")
+    migrate_storage(args.source, args.target, args.workers, args.delete_source)
@@ -0,0 +1,56 @@
+"""
+全文检索索引重建脚本
+为已有记录批量生成 record_search_index，可重复执行
+"""
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.database import SessionLocal
+from app.models import Record
+from app.services.search import make_record_search_index
+
+# 每批处理的记录数
+BATCH_SIZE = 500
+
+
+def rebuild_search_index():
+    """按ID顺序分批重建全文检索索引"""
+    db = SessionLocal()
+    processed = 0
+    last_id = 0
+
+    try:
+        while True:
+            records = db.query(Record).filter(
+                Record.id > last_id
+            ).order_by(Record.id).limit(BATCH_SIZE).all()
+            if not records:
+                break
+
+            for record in records:
+                db.merge(make_record_search_index(record))
+
+            db.commit()
+            # 释放已处理的对象，避免会话占用内存持续增长
+            db.expunge_all()
+
+            processed += len(records)
+            last_id = records[-1].id
+            print(f"   已处理 {processed} 条记录")
+
+        print(f"✅ 全文检索索引重建完成，共 {processed} 条记录")
+
+    except Exception as e:
+        print(f"❌ 重建全文检索索引失败: {e}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    print("🚀 开始重建全文检索索引...")
+    rebuild_search_index()
@@ -0,0 +1,44 @@
+"""
+孤儿文件清理脚本
+删除存储中未被数据库引用的图片文件及上传暂存目录中的过期临时文件，可重复执行
+服务进程默认按 ORPHAN_SWEEP_INTERVAL 定期执行同样的清理，多进程部署时可将其设为 0 并改用定时任务执行本脚本
+
+用法:
+    python scripts/sweep_orphan_files.py --dry-run     # 只统计不删除
+    python scripts/sweep_orphan_files.py --grace 600   # 保留期改为 10 分钟
+"""
+import sys
+import os
+import argparse
+import asyncio
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.core.config import settings
+from app.services.file_cleanup import sweep_orphan_files
+
+
+def main(batch_size: int, grace_seconds: int, dry_run: bool):
+    try:
+        counts = asyncio.run(sweep_orphan_files(batch_size, grace_seconds, dry_run))
+    except Exception as e:
+        print(f"❌ 清理孤儿文件失败: {e}")
+        raise
+
+    action = "发现" if dry_run else "删除"
+    print(
+        f"✅ 清理完成，扫描 {counts['scanned']} 个文件，"
+        f"{action} {counts['orphaned']} 个孤儿文件、{counts['staging']} 个过期暂存文件"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="清理存储中未被数据库引用的图片文件")
+    parser.add_argument("--batch-size", type=int, default=settings.ORPHAN_SWEEP_BATCH_SIZE, help="每批检查的文件数")
+    parser.add_argument("--grace", type=int, default=settings.ORPHAN_GRACE_SECONDS, help="保留期（秒），修改时间在此之内的文件不清理")
+    parser.add_argument("--dry-run", action="store_true", help="只统计不删除")
+    args = parser.parse_args()
+
+    print("🚀 开始清理孤儿文件...")
+    main(args.batch_size, args.grace, args.dry_run)
@@ -0,0 +1,61 @@
+"""
+测试环境
+使用临时目录中的 SQLite 数据库与文件目录，开启 QUERY_BUDGET_ENFORCE：接口超出查询预算时请求直接失败
+环境变量需在导入 app 之前设置
+"""
+import os
+import shutil
+import tempfile
+
+TEST_DIR = tempfile.mkdtemp(prefix="fieldnotes-test-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{TEST_DIR}/test.db",
+    "SECRET_KEY": "test-secret-key",
+    "DEBUG": "False",
+    "QUERY_BUDGET_ENFORCE": "True",
+    "UPLOAD_DIR": os.path.join(TEST_DIR, "uploads"),
+    "EXPORT_DIR": os.path.join(TEST_DIR, "exports"),
+    "IMAGE_CACHE_DIR": os.path.join(TEST_DIR, "cache"),
+    "ORPHAN_SWEEP_INTERVAL": "0",
+})
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api.api_v1.api import api_router
+from app.core.database import SessionLocal, engine
+from app.models import Base
+from app.core.query_budget import QueryStatsMiddleware
+from app.core.security import get_password_hash
+from app.models.user import User, UserRole
+
+TEST_PASSWORD = "password"
+
+
+def create_test_app() -> FastAPI:
+    """与 main.app 相同的路由与查询统计中间件（main 导入时会连接 MySQL 建库）"""
+    app = FastAPI()
+    app.add_middleware(QueryStatsMiddleware)
+    app.include_router(api_router, prefix="/api/v1")
+    return app
+
+
+@pytest.fixture(scope="session")
+def client():
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        db.add(User(
+            username="admin", email="admin@example.com",
+            hashed_password=get_password_hash(TEST_PASSWORD), role=UserRole.ADMIN
+        ))
+        db.commit()
+    yield TestClient(create_test_app())
+    engine.dispose()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/v1/auth/login", data={"username": "admin", "password": TEST_PASSWORD})
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
@@ -0,0 +1,28 @@
+"""总数缓存：统计期间发生失效时不写入过时的结果"""
+import asyncio
+
+from app.services import counting
+from app.services.counting import CountCache, CountStrategy, resolve_total
+
+
+def test_count_straddling_invalidate_is_not_cached(monkeypatch):
+    cache = CountCache(ttl=300)
+    monkeypatch.setattr(counting, "count_cache", cache)
+    totals = iter([5, 6])
+
+    async def count_rows(db, query, id_column):
+        total = next(totals)
+        if total == 5:
+            # 统计进行中另一个请求写入数据并使缓存失效
+            cache.invalidate("records")
+        return total
+
+    monkeypatch.setattr(counting, "count_rows", count_rows)
+
+    async def resolve():
+        return await resolve_total(None, None, None, CountStrategy.CACHED, "records", "all")
+
+    assert asyncio.run(resolve()) == 5
+    assert cache.get("records", "all") is None
+    assert asyncio.run(resolve()) == 6
+    assert cache.get("records", "all") == 6
@@ -0,0 +1,47 @@
+"""按需缩放图片：宽度按档位取整、以原图宽度为上限，接口需要登录"""
+import io
+
+from PIL import Image
+
+
+def upload_image(client, auth_headers, width: int, height: int) -> str:
+    record_id = client.post("/api/v1/records/", json={
+        "title": "图片记录",
+        "type": "observation",
+        "record_date": "2024-06-01T09:00:00",
+        "content": {"description": "照片"},
+    }, headers=auth_headers).json()["id"]
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (width, height), (120, 80, 40)).save(buffer, "JPEG")
+    response = client.post(
+        f"/api/v1/records/{record_id}/images/batch",
+        files=[("files", ("photo.jpg", buffer.getvalue(), "image/jpeg"))],
+        headers=auth_headers,
+    )
+    image = response.json()["items"][0]["image"]
+    return f"/api/v1/records/{record_id}/images/{image['id']}/file"
+
+
+def fetch_width(client, auth_headers, url: str, w: int):
+    response = client.get(url, params={"w": w, "format": "webp"}, headers=auth_headers)
+    assert response.status_code == 200
+    return Image.open(io.BytesIO(response.content)).width, response.headers["etag"]
+
+
+def test_requested_widths_share_bucketed_cache_entries(client, auth_headers):
+    url = upload_image(client, auth_headers, 700, 350)
+
+    assert fetch_width(client, auth_headers, url, 200)[0] == 320
+    assert fetch_width(client, auth_headers, url, 300) == fetch_width(client, auth_headers, url, 200)
+
+    # 超过原图宽度的请求都使用原图宽度的同一个缓存文件
+    width, etag = fetch_width(client, auth_headers, url, 900)
+    assert width == 700
+    assert fetch_width(client, auth_headers, url, 2560) == (700, etag)
+
+
+def test_image_file_requires_login(client, auth_headers):
+    url = upload_image(client, auth_headers, 100, 100)
+    assert client.get(url).status_code == 401
+    assert client.get(url, headers=auth_headers).status_code == 200
@@ -0,0 +1,131 @@
+"""
+接口查询预算：参与者、标签较多的记录在列表、详情与导出中按 IN 查询批量加载，
+查询次数固定、返回行数随关联数线性增长（conftest 开启了 QUERY_BUDGET_ENFORCE，超出预算时请求失败）
+"""
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import AsyncSessionLocal
+from app.core.query_budget import QueryBudgetExceeded, query_scope
+from app.models.record import Record, record_participants, record_tags
+from app.services import record_export
+
+RECORD_COUNT = 20
+LINKS_PER_RECORD = 6
+# 详情测试用的记录：参与者 × 标签的乘积（144）超出详情接口的行数预算（100）
+WIDE_LINKS = 12
+
+
+@pytest.fixture(scope="module")
+def dataset(client, auth_headers):
+    participant_ids = [
+        client.post("/api/v1/participants/", json={"name_or_code": f"P{index}"}, headers=auth_headers).json()["id"]
+        for index in range(WIDE_LINKS)
+    ]
+    category_id = client.post(
+        "/api/v1/tags/categories", json={"name": "主题", "type": "theme"}, headers=auth_headers
+    ).json()["id"]
+    tag_ids = [
+        client.post("/api/v1/tags/", json={"name": f"T{index}", "category_id": category_id}, headers=auth_headers)
+        .json()["id"]
+        for index in range(WIDE_LINKS)
+    ]
+
+    def create_record(title: str, links: int) -> int:
+        response = client.post("/api/v1/records/", json={
+            "title": title,
+            "type": "interview",
+            "record_date": "2024-05-01T09:00:00",
+            "content": {"description": "访谈内容"},
+            "participant_ids": participant_ids[:links],
+            "tag_ids": tag_ids[:links],
+        }, headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return response.json()["id"]
+
+    record_ids = [create_record(f"记录{index}", LINKS_PER_RECORD) for index in range(RECORD_COUNT)]
+    wide_id = create_record("关联较多的记录", WIDE_LINKS)
+    return {"record_ids": record_ids, "wide_id": wide_id}
+
+
+@pytest.fixture
+def debug_headers(monkeypatch):
+    """调试模式下响应头返回查询次数与行数"""
+    monkeypatch.setattr(settings, "DEBUG", True)
+
+
+def query_counts(response):
+    return int(response.headers["x-db-query-count"]), int(response.headers["x-db-row-count"])
+
+
+def test_record_list_loads_relations_in_batches(client, auth_headers, dataset, debug_headers):
+    response = client.get("/api/v1/records/", params={"limit": 50, "fields": "*"}, headers=auth_headers)
+    assert response.status_code == 200
+    items = response.json()["items"]
+    # 会话内其他测试创建的记录没有参与者与标签
+    assert {*dataset["record_ids"], dataset["wide_id"]} <= {item["id"] for item in items}
+    assert all(len(item["tags"]) == len(item["participants"]) for item in items)
+
+    queries, rows = query_counts(response)
+    assert queries <= 8
+    # 每条记录：记录本身 + 参与者 + 标签，不是参与者 × 标签
+    links = RECORD_COUNT * LINKS_PER_RECORD + WIDE_LINKS
+    assert rows <= 10 + len(items) + 2 * links
+
+
+def test_record_detail_rows_grow_linearly(client, auth_headers, dataset, debug_headers):
+    response = client.get(f"/api/v1/records/{dataset['wide_id']}", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()["participants"]) == WIDE_LINKS
+    assert len(response.json()["tags"]) == WIDE_LINKS
+
+    queries, rows = query_counts(response)
+    assert queries <= 4
+    assert rows < WIDE_LINKS * WIDE_LINKS
+
+
+@pytest.mark.parametrize("export_format", ["json", "csv", "markdown", "xlsx", "zip"])
+def test_exports_stay_within_batch_budget(client, auth_headers, dataset, monkeypatch, export_format):
+    # 多批加载，每批单独检查预算
+    monkeypatch.setattr(record_export, "EXPORT_BATCH_SIZE", 8)
+    response = client.get(f"/api/v1/export/records/{export_format}", headers=auth_headers)
+    assert response.status_code == 200
+    assert response.content
+
+
+def test_cartesian_join_exceeds_row_budget(dataset):
+    """同时 JOIN 参与者与标签时行数按乘积增长，超出与详情接口相同的行数预算"""
+    async def load_joined():
+        async with AsyncSessionLocal() as db:
+            with query_scope("records.detail.joined", 4, 100) as stats:
+                await db.execute(
+                    select(Record.id, record_participants.c.participant_id, record_tags.c.tag_id)
+                    .join(record_participants, record_participants.c.record_id == Record.id)
+                    .join(record_tags, record_tags.c.record_id == Record.id)
+                    .where(Record.id == dataset["wide_id"])
+                )
+            return stats
+
+    with pytest.raises(QueryBudgetExceeded):
+        asyncio.run(load_joined())
+
+
+def test_budget_is_only_logged_when_not_enforced(dataset, monkeypatch, caplog):
+    monkeypatch.setattr(settings, "QUERY_BUDGET_ENFORCE", False)
+
+    async def load_joined():
+        async with AsyncSessionLocal() as db:
+            with query_scope("records.detail.joined", 4, 100) as stats:
+                await db.execute(
+                    select(record_participants.c.participant_id, record_tags.c.tag_id)
+                    .join(record_tags, record_tags.c.record_id == record_participants.c.record_id)
+                    .where(record_participants.c.record_id == dataset["wide_id"])
+                )
+            return stats
+
+    stats = asyncio.run(load_joined())
+    assert stats.rows == WIDE_LINKS * WIDE_LINKS
+    assert "超出预算" in caplog.text
@@ -0,0 +1,67 @@
+import asyncio
+import json
+import zipfile
+from xml.etree import ElementTree
+
+from app.models.record import Record
+from app.services import record_export
+from app.services.record_export import (
+    XLSX_MAX_CELL_CHARS, XLSX_OVERFLOW_NOTE, XLSX_RECORD_COLUMNS, XlsxExportWriter, json_export_stream,
+)
+
+SHEET_NS = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+
+
+def sheet_strings(path, index):
+    """按行返回工作表中的文本单元格（constant_memory 模式写入内联字符串）"""
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read(f'xl/worksheets/sheet{index}.xml'))
+    return [
+        [''.join(node.itertext()) for node in row.iterfind('x:c/x:is', SHEET_NS)]
+        for row in root.iterfind('x:sheetData/x:row', SHEET_NS)
+    ]
+
+
+def test_xlsx_long_text_is_split_into_overflow_sheet(tmp_path):
+    path = tmp_path / 'export.xlsx'
+    content = ''.join(chr(0x4e00 + i % 500) for i in range(XLSX_MAX_CELL_CHARS * 2 + 10))
+    row = [7, '长记录'] + [None] * (len(XLSX_RECORD_COLUMNS) - 2)
+    row[9] = content
+
+    writer = XlsxExportWriter(path)
+    writer._write_row(writer.records, XLSX_RECORD_COLUMNS, row)
+    writer.close()
+
+    records = sheet_strings(path, 1)
+    cell = records[1][1]
+    assert len(cell) == XLSX_MAX_CELL_CHARS
+    assert cell.endswith(XLSX_OVERFLOW_NOTE)
+    assert content.startswith(cell[:-len(XLSX_OVERFLOW_NOTE)])
+
+    overflow = sheet_strings(path, 3)
+    assert [values[0] for values in overflow[1:]] == ['内容'] * 3
+    assert ''.join(values[1] for values in overflow[1:]) == content
+
+
+def test_json_export_streams_one_chunk_per_record(client, auth_headers, monkeypatch):
+    monkeypatch.setattr(record_export, "EXPORT_BATCH_SIZE", 2)
+    record_ids = [
+        client.post("/api/v1/records/", json={
+            "title": f"导出记录{index}",
+            "type": "observation",
+            "record_date": "2024-06-03T09:00:00",
+            "content": {"description": "导出"},
+        }, headers=auth_headers).json()["id"]
+        for index in range(5)
+    ]
+
+    async def collect():
+        stream = json_export_stream([Record.id.in_(record_ids)], len(record_ids))
+        return [chunk async for chunk in stream]
+
+    chunks = asyncio.run(collect())
+    # 头部 + 每条记录一块 + 结尾
+    assert len(chunks) == len(record_ids) + 2
+    exported = json.loads(b"".join(chunks))
+    assert sorted(record["id"] for record in exported["records"]) == record_ids
+    assert exported["total_count"] == len(record_ids)
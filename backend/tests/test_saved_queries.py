@@ -0,0 +1,99 @@
+"""保存的查询：筛选条件引用的场域被删除后，结果缓存与记录总数缓存随之更新"""
+
+
+def test_deleting_field_refreshes_saved_query_and_counts(client, auth_headers):
+    field_id = client.post(
+        "/api/v1/fields/", json={"region": "云南", "location": "大理"}, headers=auth_headers
+    ).json()["id"]
+    response = client.post("/api/v1/records/", json={
+        "title": "场域记录",
+        "type": "observation",
+        "record_date": "2024-06-01T09:00:00",
+        "content": {"description": "观察"},
+        "field_id": field_id,
+    }, headers=auth_headers)
+    record_id = response.json()["id"]
+
+    saved_query_id = client.post(
+        "/api/v1/saved-queries/", json={"name": "大理", "filters": {"field_id": field_id}}, headers=auth_headers
+    ).json()["id"]
+
+    def open_saved_query():
+        return client.get(
+            f"/api/v1/saved-queries/{saved_query_id}/records", params={"count": "cached"}, headers=auth_headers
+        ).json()
+
+    def count_records():
+        return client.get(
+            "/api/v1/records/count", params={"field_id": field_id, "count": "cached"}, headers=auth_headers
+        ).json()
+
+    assert [item["id"] for item in open_saved_query()["items"]] == [record_id]
+    assert open_saved_query()["total"] == 1
+    cached_count = count_records()
+
+    assert client.delete(f"/api/v1/fields/{field_id}", headers=auth_headers).status_code == 200
+
+    result = open_saved_query()
+    assert result["items"] == []
+    assert result["total"] == 0
+    assert cached_count == {"total": 1}
+    assert count_records() == {"total": 0}
+
+
+def create_saved_query(client, auth_headers, name: str, filters: dict) -> int:
+    return client.post(
+        "/api/v1/saved-queries/", json={"name": name, "filters": filters}, headers=auth_headers
+    ).json()["id"]
+
+
+def saved_query_record_ids(client, auth_headers, saved_query_id: int) -> list:
+    response = client.get(f"/api/v1/saved-queries/{saved_query_id}/records", headers=auth_headers)
+    return [item["id"] for item in response.json()["items"]]
+
+
+def test_record_changes_update_all_matching_saved_queries(client, auth_headers):
+    observation = create_saved_query(client, auth_headers, "观察", {"type": "observation", "search": "增量维护"})
+    interview = create_saved_query(client, auth_headers, "访谈", {"type": "interview", "search": "增量维护"})
+    titled = create_saved_query(client, auth_headers, "标题", {"search": "增量维护"})
+
+    record_id = client.post("/api/v1/records/", json={
+        "title": "增量维护记录",
+        "type": "observation",
+        "record_date": "2024-06-02T09:00:00",
+        "content": {"description": "观察"},
+    }, headers=auth_headers).json()["id"]
+
+    assert saved_query_record_ids(client, auth_headers, observation) == [record_id]
+    assert saved_query_record_ids(client, auth_headers, interview) == []
+    assert saved_query_record_ids(client, auth_headers, titled) == [record_id]
+
+    client.put(f"/api/v1/records/{record_id}", json={"type": "interview"}, headers=auth_headers)
+
+    assert saved_query_record_ids(client, auth_headers, observation) == []
+    assert saved_query_record_ids(client, auth_headers, interview) == [record_id]
+    assert saved_query_record_ids(client, auth_headers, titled) == [record_id]
+
+
+def test_deleting_tag_marks_only_queries_using_tag_filters(client, auth_headers):
+    from app.core.database import SessionLocal
+    from app.models.saved_query import SavedQuery
+
+    category_id = client.post(
+        "/api/v1/tags/categories", json={"name": "待删除分类", "type": "theme"}, headers=auth_headers
+    ).json()["id"]
+    tag_id = client.post(
+        "/api/v1/tags/", json={"name": "待删除标签", "category_id": category_id}, headers=auth_headers
+    ).json()["id"]
+    by_tag = create_saved_query(client, auth_headers, "按标签", {"tag_ids": [tag_id]})
+    by_expr = create_saved_query(client, auth_headers, "按表达式", {"tag_expr": str(tag_id)})
+    unrelated = create_saved_query(client, auth_headers, "无标签", {"type": "observation"})
+
+    assert client.delete(f"/api/v1/tags/{tag_id}", headers=auth_headers).status_code == 200
+
+    with SessionLocal() as db:
+        stale = {
+            saved_query.id: saved_query.is_stale
+            for saved_query in db.query(SavedQuery).filter(SavedQuery.id.in_([by_tag, by_expr, unrelated]))
+        }
+    assert stale == {by_tag: True, by_expr: True, unrelated: False}
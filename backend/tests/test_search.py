@@ -0,0 +1,29 @@
+"""记录检索：SQLite 上退化为子串匹配，检索词中的 % _ 按字面匹配"""
+
+
+def create_record(client, auth_headers, title: str) -> int:
+    return client.post("/api/v1/records/", json={
+        "title": title,
+        "type": "observation",
+        "record_date": "2024-06-01T09:00:00",
+        "content": {"description": "检索测试"},
+    }, headers=auth_headers).json()["id"]
+
+
+def search(client, auth_headers, keyword: str) -> set:
+    response = client.get("/api/v1/records/", params={"search": keyword, "limit": 100}, headers=auth_headers)
+    assert response.status_code == 200
+    return {item["id"] for item in response.json()["items"]}
+
+
+def test_search_without_fulltext_index(client, auth_headers):
+    percent = create_record(client, auth_headers, "完成度100%的访谈")
+    plain = create_record(client, auth_headers, "完成度1000的访谈")
+    underscore = create_record(client, auth_headers, "编号a_b的访谈")
+    other = create_record(client, auth_headers, "编号axb的访谈")
+
+    assert search(client, auth_headers, "100%") == {percent}
+    assert search(client, auth_headers, "a_b") == {underscore}
+    assert {percent, plain} <= search(client, auth_headers, "完成度 访谈")
+    assert other not in search(client, auth_headers, "度")
+    assert {percent, plain} <= search(client, auth_headers, "度")
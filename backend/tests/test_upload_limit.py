@@ -0,0 +1,55 @@
+"""上传大小限制：声明的 Content-Length 与分块传输的实际字节数都受限"""
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.core.upload_limit import UploadSizeLimitMiddleware
+
+LIMIT = 1024 * 1024
+BOUNDARY = "limit-test-boundary"
+
+
+def multipart_body(size: int) -> bytes:
+    return (
+        f"--{BOUNDARY}\r\n"
+        'Content-Disposition: form-data; name="file"; filename="a.bin"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n"
+    ).encode() + b"x" * size + f"\r\n--{BOUNDARY}--\r\n".encode()
+
+
+@pytest.fixture(scope="module")
+def upload_client():
+    app = FastAPI()
+    app.add_middleware(UploadSizeLimitMiddleware, max_body_size=LIMIT)
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    return TestClient(app)
+
+
+def post(client, body: bytes, chunked: bool):
+    def chunks():
+        for start in range(0, len(body), 64 * 1024):
+            yield body[start:start + 64 * 1024]
+
+    return client.post(
+        "/upload",
+        content=chunks() if chunked else body,
+        headers={"content-type": f"multipart/form-data; boundary={BOUNDARY}"},
+    )
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_upload_within_limit(upload_client, chunked):
+    response = post(upload_client, multipart_body(1000), chunked)
+    assert response.status_code == 200
+    assert response.json() == {"size": 1000}
+
+
+@pytest.mark.parametrize("chunked", [False, True])
+def test_upload_over_limit_is_rejected(upload_client, chunked):
+    response = post(upload_client, multipart_body(LIMIT + 1), chunked)
+    assert response.status_code == 413
+    assert "请求过大" in response.json()["detail"]
@@ -14,20 +14,36 @@ import {
   Box,
   Alert,
   CircularProgress,
+  LinearProgress,
   Chip,
 } from '@mui/material';
 import {
   Download as DownloadIcon,
   Description as JsonIcon,
   TableChart as CsvIcon,
+  GridOn as XlsxIcon,
   Article as MarkdownIcon,
+  FolderZip as ZipIcon,
+  PictureAsPdf as PdfIcon,
+  TextSnippet as DocxIcon,
 } from '@mui/icons-material';
 import { useTranslation } from 'react-i18next';
 import axios from 'axios';
 
 const API_BASE = 'http://localhost:8000/api/v1';
 
-type ExportFormat = 'json' | 'csv' | 'markdown';
+type ExportFormat = 'json' | 'csv' | 'xlsx' | 'markdown' | 'zip' | 'pdf' | 'docx';
+
+// 导出任务进度的轮询间隔（毫秒）
+const POLL_INTERVAL = 1000;
+
+interface ExportJob {
+  id: number;
+  status: 'pending' | 'running' | 'completed' | 'failed';
+  processed_count: number;
+  total_count: number;
+  error?: string | null;
+}
 
 interface ExportDialogProps {
   open: boolean;
@@ -42,6 +58,12 @@ const getFormatOptions = (t: (key: string) => string) => [
     description: t('export.formats.csvDesc'),
     icon: <CsvIcon />,
   },
+  {
+    value: 'xlsx' as ExportFormat,
+    label: t('export.formats.xlsx'),
+    description: t('export.formats.xlsxDesc'),
+    icon: <XlsxIcon />,
+  },
   {
     value: 'json' as ExportFormat,
     label: t('export.formats.json'),
@@ -54,6 +76,24 @@ const getFormatOptions = (t: (key: string) => string) => [
     description: t('export.formats.markdownDesc'),
     icon: <MarkdownIcon />,
   },
+  {
+    value: 'pdf' as ExportFormat,
+    label: t('export.formats.pdf'),
+    description: t('export.formats.pdfDesc'),
+    icon: <PdfIcon />,
+  },
+  {
+    value: 'docx' as ExportFormat,
+    label: t('export.formats.docx'),
+    description: t('export.formats.docxDesc'),
+    icon: <DocxIcon />,
+  },
+  {
+    value: 'zip' as ExportFormat,
+    label: t('export.formats.zip'),
+    description: t('export.formats.zipDesc'),
+    icon: <ZipIcon />,
+  },
 ];
 
 const ExportDialog: React.FC<ExportDialogProps> = ({
@@ -65,24 +105,42 @@ const ExportDialog: React.FC<ExportDialogProps> = ({
   const [format, setFormat] = useState<ExportFormat>('csv');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string | null>(null);
+  const [progress, setProgress] = useState<{ processed: number; total: number } | null>(null);
   const formatOptions = getFormatOptions(t);
 
   const handleExport = async () => {
     setLoading(true);
     setError(null);
+    setProgress(null);
 
     try {
       const token = localStorage.getItem('token');
-      const params = new URLSearchParams();
-      
-      if (selectedIds.length > 0) {
-        params.append('record_ids', selectedIds.join(','));
+      const headers = { Authorization: `Bearer ${token}` };
+
+      // 提交后台导出任务，轮询进度直到完成
+      let { data: job } = await axios.post<ExportJob>(
+        `${API_BASE}/export/jobs`,
+        {
+          format,
+          record_ids: selectedIds.length > 0 ? selectedIds : null,
+        },
+        { headers }
+      );
+      while (job.status === 'pending' || job.status === 'running') {
+        setProgress({ processed: job.processed_count, total: job.total_count });
+        await new Promise((resolve) => setTimeout(resolve, POLL_INTERVAL));
+        ({ data: job } = await axios.get<ExportJob>(`${API_BASE}/export/jobs/${job.id}`, { headers }));
+      }
+      if (job.status === 'failed') {
+        setError(job.error || t('export.exportFailed'));
+        return;
       }
+      setProgress({ processed: job.total_count, total: job.total_count });
 
       const response = await axios.get(
-        `${API_BASE}/export/records/${format}?${params}`,
+        `${API_BASE}/export/jobs/${job.id}/download`,
         {
-          headers: { Authorization: `Bearer ${token}` },
+          headers,
           responseType: 'blob',
         }
       );
@@ -118,6 +176,7 @@ const ExportDialog: React.FC<ExportDialogProps> = ({
       }
     } finally {
       setLoading(false);
+      setProgress(null);
     }
   };
 
@@ -199,6 +258,18 @@ const ExportDialog: React.FC<ExportDialogProps> = ({
             ))}
           </RadioGroup>
         </FormControl>
+
+        {progress && (
+          <Box sx={{ mt: 2 }}>
+            <LinearProgress
+              variant={progress.total > 0 ? 'determinate' : 'indeterminate'}
+              value={progress.total > 0 ? (progress.processed / progress.total) * 100 : 0}
+            />
+            <Typography variant="caption" color="text.secondary">
+              {t('export.progress', { processed: progress.processed, total: progress.total })}
+            </Typography>
+          </Box>
+        )}
       </DialogContent>
       <DialogActions sx={{ px: 3, pb: 2 }}>
         <Button onClick={onClose} disabled={loading}>
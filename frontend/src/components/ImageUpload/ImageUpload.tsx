@@ -1,4 +1,4 @@
-import React, { useState, useRef, useCallback } from 'react';
+import React, { useState, useRef, useCallback, useEffect } from 'react';
 import {
   Box,
   Typography,
@@ -38,8 +38,35 @@ export interface RecordImage {
   sort_order: number;
   created_at: string;
   url: string;
+  thumbnail_url?: string | null;  // 缩略图，后台生成完成前为空
+  medium_url?: string | null;     // 中等尺寸预览图，后台生成完成前为空
 }
 
+// 图片接口需要认证，<img> 无法携带 Authorization 头：带令牌请求后以 Blob URL 显示
+const AuthImage: React.FC<React.ImgHTMLAttributes<HTMLImageElement> & { src: string }> = ({ src, ...props }) => {
+  const [objectUrl, setObjectUrl] = useState<string>();
+
+  useEffect(() => {
+    let url: string | undefined;
+    let cancelled = false;
+    const token = localStorage.getItem('token');
+    axios
+      .get(src, { responseType: 'blob', headers: { Authorization: `Bearer ${token}` } })
+      .then((response) => {
+        if (cancelled) return;
+        url = URL.createObjectURL(response.data);
+        setObjectUrl(url);
+      })
+      .catch((err) => console.error('Image load failed:', err));
+    return () => {
+      cancelled = true;
+      if (url) URL.revokeObjectURL(url);
+    };
+  }, [src]);
+
+  return objectUrl ? <img src={objectUrl} {...props} /> : null;
+};
+
 interface ImageUploadProps {
   recordId: number | null;  // 记录ID，创建模式时为null
   images: RecordImage[];
@@ -70,32 +97,41 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
     return `${(bytes / (1024 * 1024)).toFixed(1)} MB`;
   };
 
-  // 获取图片完整URL
-  const getImageUrl = (image: RecordImage): string => {
-    return `${API_BASE}${image.url}`;
+  // 获取图片完整URL（优先使用衍生图，尚未生成时回退到原图）
+  const getImageUrl = (image: RecordImage, variant?: 'thumbnail' | 'medium'): string => {
+    const variantUrl = variant === 'thumbnail' ? image.thumbnail_url : variant === 'medium' ? image.medium_url : null;
+    return `${API_BASE}${variantUrl || image.url}`;
   };
 
-  // 上传图片
-  const uploadImage = async (file: File) => {
+  // 按显示宽度请求服务端缩放的 WebP 图片（宽度取 160 的整数倍，提高服务端缓存命中率）
+  const getSizedImageUrl = (image: RecordImage, displayWidth: number): string => {
+    const pixels = displayWidth * (window.devicePixelRatio || 1);
+    const width = Math.min(2560, Math.max(160, Math.ceil(pixels / 160) * 160));
+    const separator = image.url.includes('?') ? '&' : '?';
+    return `${API_BASE}${image.url}${separator}w=${width}&format=webp`;
+  };
+
+  // 上传图片（多个文件一次请求上传，服务端逐个返回结果）
+  const uploadImages = async (files: File[]) => {
     if (!recordId) {
       setError(t('images.saveFirst'));
       return;
     }
 
-    if (images.length >= maxImages) {
+    if (images.length + files.length > maxImages) {
       setError(t('images.maxImages', { max: maxImages }));
       return;
     }
 
     // 验证文件类型
     const allowedTypes = ['image/jpeg', 'image/png', 'image/jpg', 'image/webp'];
-    if (!allowedTypes.includes(file.type)) {
+    if (files.some((file) => !allowedTypes.includes(file.type))) {
       setError(t('images.unsupportedFormat'));
       return;
     }
 
     // 验证文件大小 (5MB)
-    if (file.size > 5 * 1024 * 1024) {
+    if (files.some((file) => file.size > 5 * 1024 * 1024)) {
       setError(t('images.fileTooLarge'));
       return;
     }
@@ -107,10 +143,10 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
     try {
       const token = localStorage.getItem('token');
       const formData = new FormData();
-      formData.append('file', file);
+      files.forEach((file) => formData.append('files', file));
 
       const response = await axios.post(
-        `${API_BASE}/records/${recordId}/images`,
+        `${API_BASE}/records/${recordId}/images/batch`,
         formData,
         {
           headers: {
@@ -126,8 +162,17 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
         }
       );
 
-      // 添加新图片到列表
-      onImagesChange([...images, response.data]);
+      // 添加上传成功的图片到列表，失败的文件显示原因
+      const results: { filename: string; success: boolean; image?: RecordImage; error?: string }[] =
+        response.data.items;
+      const uploaded = results.filter((item) => item.success && item.image).map((item) => item.image as RecordImage);
+      if (uploaded.length > 0) {
+        onImagesChange([...images, ...uploaded]);
+      }
+      const failed = results.filter((item) => !item.success);
+      if (failed.length > 0) {
+        setError(failed.map((item) => `${item.filename}: ${item.error}`).join('; '));
+      }
     } catch (err: any) {
       console.error('Upload failed:', err);
       setError(err.response?.data?.detail || t('images.uploadFailed'));
@@ -159,7 +204,7 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
   const handleFileSelect = (event: React.ChangeEvent<HTMLInputElement>) => {
     const files = event.target.files;
     if (files && files.length > 0) {
-      Array.from(files).forEach((file) => uploadImage(file));
+      uploadImages(Array.from(files));
     }
     // 清空input，允许重复选择同一文件
     if (fileInputRef.current) {
@@ -187,12 +232,9 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
     if (disabled) return;
 
     const files = e.dataTransfer.files;
-    if (files && files.length > 0) {
-      Array.from(files).forEach((file) => {
-        if (file.type.startsWith('image/')) {
-          uploadImage(file);
-        }
-      });
+    const imageFiles = Array.from(files || []).filter((file) => file.type.startsWith('image/'));
+    if (imageFiles.length > 0) {
+      uploadImages(imageFiles);
     }
   }, [disabled, recordId, images]);
 
@@ -296,8 +338,8 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
                   },
                 }}
               >
-                <img
-                  src={getImageUrl(image)}
+                <AuthImage
+                  src={getImageUrl(image, 'thumbnail')}
                   alt={image.original_filename}
                   loading="lazy"
                   style={{
@@ -404,8 +446,8 @@ const ImageUpload: React.FC<ImageUploadProps> = ({
             <CloseIcon />
           </IconButton>
           {previewImage && (
-            <img
-              src={getImageUrl(previewImage)}
+            <AuthImage
+              src={getSizedImageUrl(previewImage, window.innerWidth * 0.9)}
               alt={previewImage.original_filename}
               style={{
                 maxWidth: '90vw',
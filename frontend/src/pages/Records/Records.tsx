@@ -226,6 +226,9 @@ const Records: React.FC = () => {
   const [filterField, setFilterField] = useState<Field | null>(null);
   const [filterTags, setFilterTags] = useState<Tag[]>([]);
 
+  // 分面统计：当前筛选结果中各类型/状态的记录数
+  const [facetCounts, setFacetCounts] = useState<{ [facet: string]: { [value: string]: number } }>({});
+
   // ============ 获取记录列表（支持筛选参数） ============
   const fetchRecords = useCallback(async () => {
     setLoading(true);
@@ -234,6 +237,7 @@ const Records: React.FC = () => {
       const params = new URLSearchParams({
         skip: String(page * rowsPerPage),
         limit: String(rowsPerPage),
+        facets: 'type,status',
       });
 
       // 关键词搜索
@@ -281,6 +285,16 @@ const Records: React.FC = () => {
 
       let filteredItems = response.data.items;
 
+      // 分面统计转换为 { 分面: { 取值: 数量 } }
+      const facets: { [facet: string]: { [value: string]: number } } = {};
+      Object.entries(response.data.facets || {}).forEach(([facet, buckets]) => {
+        facets[facet] = {};
+        (buckets as { value: string; count: number }[]).forEach(bucket => {
+          facets[facet][bucket.value] = bucket.count;
+        });
+      });
+      setFacetCounts(facets);
+
       // 前端额外过滤：多选类型（如果选了多个类型）
       if (filterTypes.length > 1) {
         filteredItems = filteredItems.filter((r: Record) => filterTypes.includes(r.type));
@@ -495,6 +509,19 @@ const Records: React.FC = () => {
         headers: { Authorization: `Bearer ${token}` },
       });
       const fullRecord = response.data;
+      setCurrentRecord(fullRecord);
+
+      // 列表只返回精简字段，使用完整记录填充表单内容
+      setFormData({
+        title: fullRecord.title,
+        type: fullRecord.type,
+        record_date: new Date(fullRecord.record_date),
+        time_range: fullRecord.time_range || '',
+        duration: fullRecord.duration || 0,
+        specific_location: fullRecord.specific_location || '',
+        content: fullRecord.content || { description: '', reflection: '', notes: '' },
+        status: fullRecord.status,
+      });
 
       // 设置已关联的参与者
       if (fullRecord.participants && fullRecord.participants.length > 0) {
@@ -771,6 +798,9 @@ const Records: React.FC = () => {
                         checked={selected}
                       />
                       <Chip label={option.label} size="small" color={option.color as any} sx={{ ml: 1 }} />
+                      <Box component="span" sx={{ ml: 'auto', color: 'text.secondary' }}>
+                        {facetCounts.type?.[option.value] ?? 0}
+                      </Box>
                     </li>
                   );
                 }}
@@ -817,6 +847,9 @@ const Records: React.FC = () => {
                         checked={selected}
                       />
                       {option.label}
+                      <Box component="span" sx={{ ml: 'auto', color: 'text.secondary' }}>
+                        {facetCounts.status?.[option.value] ?? 0}
+                      </Box>
                     </li>
                   );
                 }}